@@ -0,0 +1,141 @@
+"""Generator of synthetic version scripts used by the benchmarks"""
+
+from __future__ import print_function
+
+import argparse
+import random
+
+
+def release_name(prefix, index):
+    """
+    Get the name of a generated release
+
+    :param prefix: The prefix of the release names (e.g. LIBBENCH)
+    :param index:  The index of the release
+    :returns:      The release name (e.g. LIBBENCH_1_2_0)
+    """
+
+    return "{0}_1_{1}_0".format(prefix, index)
+
+
+def symbol_name(release, index):
+    """
+    Get the name of a generated symbol
+
+    :param release: The index of the release containing the symbol
+    :param index:   The index of the symbol in the release
+    :returns:       The symbol name
+    """
+
+    return "bench_symbol_{0}_{1}".format(release, index)
+
+
+def generate_map(releases=10, symbols=1000, chain_depth=0,
+                 comment_density=0.0, prefix="LIBBENCH", seed=0):
+    """
+    Generate the lines of a version script
+
+    The releases are organized in chains of dependencies, each release
+    depending on the previous one in the same chain. The first release of the
+    first chain is the base version, containing the local ``*`` wildcard.
+
+    As in the maps written by abimap, the newest releases come first.
+
+    :param releases:        The number of releases
+    :param symbols:         The number of global symbols in each release
+    :param chain_depth:     The maximum number of releases in a chain. If 0,
+                            all releases are in a single chain
+    :param comment_density: The fraction of the symbols followed by a
+                            comment line, from 0.0 to 1.0
+    :param prefix:          The prefix of the release names
+    :param seed:            The seed used to place the comments
+    :returns:               A list of lines (terminated with ``\\n``)
+    """
+
+    rng = random.Random(seed)
+    lines = ["# Synthetic map: {0} releases, {1} symbols per release,"
+             " chain depth {2}\n".format(releases, symbols, chain_depth),
+             "\n"]
+
+    for r in reversed(range(releases)):
+        name = release_name(prefix, r)
+        if chain_depth and r % chain_depth == 0:
+            previous = ""
+        elif r == 0:
+            previous = ""
+        else:
+            previous = release_name(prefix, r - 1)
+
+        lines.append(name + "\n")
+        lines.append("{\n")
+        lines.append("    global:\n")
+        for s in range(symbols):
+            lines.append("        " + symbol_name(r, s) + ";\n")
+            if comment_density and rng.random() < comment_density:
+                lines.append("        # Comment about the symbol above\n")
+        if r == 0:
+            lines.append("    local:\n")
+            lines.append("        *;\n")
+        lines.append("} " + previous + ";\n")
+        lines.append("\n")
+
+    return lines
+
+
+def generate_symbols(releases=10, symbols=1000, added=0):
+    """
+    Generate the list of symbols of a generated map, plus some new symbols
+
+    :param releases: The number of releases of the map
+    :param symbols:  The number of symbols in each release of the map
+    :param added:    The number of new symbols
+    :returns:        A list of symbol names
+    """
+
+    names = [symbol_name(r, s) for r in range(releases)
+             for s in range(symbols)]
+    names.extend(symbol_name(releases, s) for s in range(added))
+    return names
+
+
+def write_map(filename, **kwargs):
+    """
+    Write a generated version script to a file
+
+    :param filename: The path to the file
+    :param kwargs:   The arguments to ``generate_map()``
+    """
+
+    with open(filename, "w") as f:
+        f.writelines(generate_map(**kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic"
+                                     " version script")
+    parser.add_argument("-o", "--out", help="Output file (defaults to"
+                        " stdout)")
+    parser.add_argument("--releases", type=int, default=10,
+                        help="The number of releases")
+    parser.add_argument("--symbols", type=int, default=1000,
+                        help="The number of symbols per release")
+    parser.add_argument("--chain-depth", type=int, default=0,
+                        help="The maximum number of releases in a dependency"
+                        " chain (0 for a single chain)")
+    parser.add_argument("--comment-density", type=float, default=0.0,
+                        help="The fraction of symbols followed by a comment")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The seed used to place the comments")
+    args = parser.parse_args()
+
+    lines = generate_map(args.releases, args.symbols, args.chain_depth,
+                         args.comment_density, seed=args.seed)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.writelines(lines)
+    else:
+        print("".join(lines), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Benchmarks for abimap
+
+Times the main operations on synthetic version scripts (see ``mapgen.py``)
+and records the peak memory used by each of them. The results can be saved
+as a JSON baseline and compared with a later run::
+
+    $ PYTHONPATH=src python benchmarks/run.py --size medium -o baseline.json
+    $ PYTHONPATH=src python benchmarks/run.py --size medium -c baseline.json
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from mapgen import generate_map
+from mapgen import generate_symbols
+
+import abimap
+from abimap import symver
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# The sizes of the generated maps as (releases, symbols per release)
+SIZES = {"small": (10, 1000),
+         "medium": (100, 1000),
+         "large": (100, 10000)}
+
+# The number of symbols added by the update benchmark
+ADDED_SYMBOLS = 100
+
+
+class Namespace(object):
+    """
+    Empty class used as a namespace for the command line arguments
+    """
+    pass
+
+
+def run_command(options):
+    """
+    Run an abimap subcommand as called from the command line
+
+    The output is discarded.
+
+    :param options: The command line arguments
+    """
+
+    ns = Namespace()
+    ns.program = "abimap"
+    args = symver.get_arg_parser().parse_args(options, namespace=ns)
+
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            args.func(args)
+        finally:
+            sys.stdout = stdout
+
+
+def run_script(options):
+    """
+    Run abimap in a new interpreter, as done by the installed script
+
+    This includes the time to start the interpreter and import the modules.
+    The output is discarded.
+
+    :param options: The command line arguments
+    """
+
+    env = dict(os.environ)
+    path = os.path.dirname(os.path.dirname(abimap.__file__))
+    env["PYTHONPATH"] = os.pathsep.join([path, env.get("PYTHONPATH", "")])
+
+    with open(os.devnull, "w") as devnull:
+        subprocess.check_call([sys.executable, "-c",
+                               "from abimap.main import main; main()"] +
+                              options, env=env, stdout=devnull)
+
+
+def parsed_map(lines, logger=None):
+    """
+    Get a map with the given lines parsed
+    """
+
+    m = symver.Map()
+    if logger is not None:
+        m.logger = logger
+    m.parse(lines)
+    return m
+
+
+def trace_logger():
+    """
+    Get a logger enabled for debug which discards the messages, to measure
+    the cost of tracing the parser
+    """
+
+    logger = logging.getLogger("abimap.benchmarks.trace")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+    return logger
+
+
+def checked_map(lines):
+    """
+    Get a map with the given lines parsed and checked
+    """
+
+    m = parsed_map(lines)
+    m.check(log=False)
+    return m
+
+
+def benchmarks(workdir, lines):
+    """
+    Get the benchmarks to run
+
+    Each benchmark is a tuple (name, setup, operation): ``setup`` is called
+    without arguments before each run of ``operation``, which is called with
+    the value returned by ``setup``. Only ``operation`` is measured.
+
+    :param workdir: The directory where the files used are created
+    :param lines:   The lines of the map
+    :returns:       A list of benchmarks
+    """
+
+    map_file = os.path.join(workdir, "bench.map")
+    symbols_file = os.path.join(workdir, "symbols.in")
+    out_file = os.path.join(workdir, "out.map")
+
+    def remove_out():
+        if os.path.exists(out_file):
+            os.remove(out_file)
+
+    def read(_):
+        m = symver.Map()
+        m.read(map_file, log=False)
+        return m
+
+    def read_again(first):
+        # The first map is kept alive, as when many maps are loaded
+        second = read(None)
+        return (first, second)
+
+    def update(_):
+        run_command(["update", "--quiet", "--add", "-i", symbols_file,
+                     "-o", out_file, map_file])
+
+    def changed_map():
+        # A checked map with a new release appended, as done by update
+        m = checked_map(lines)
+        r = symver.Release()
+        r.name = "LIBBENCH_NEW_1_0_0"
+        r.previous = m.graph.heads[0]
+        r.add_symbols("global", ["bench_new_symbol"])
+        m.releases.append(r)
+        return m
+
+    def merge_files():
+        # Two versions of the map, each appending a release to the file
+        head = checked_map(lines).graph.heads[0]
+        files = []
+        for version in ("OURS", "THEIRS"):
+            r = symver.Release()
+            r.name = "LIBBENCH_{0}_1_0_0".format(version)
+            r.previous = head
+            r.add_symbols("global", ["bench_{0}".format(version.lower())])
+            filename = os.path.join(workdir, "{0}.map".format(version.lower()))
+            with open(filename, "w") as f:
+                f.writelines(lines)
+                f.write("\n")
+                f.writelines(r.iter_lines())
+            files.append(filename)
+        remove_out()
+        return files
+
+    def merge(files):
+        run_command(["merge", "--quiet", "-o", out_file, map_file] + files)
+
+    def new(_):
+        run_command(["new", "--quiet", "-r", "LIBNEW_1_0_0",
+                     "-i", symbols_file, "-o", out_file])
+
+    return [("parse", lambda: None, lambda _: parsed_map(lines)),
+            ("parse_trace", trace_logger,
+             lambda logger: parsed_map(lines, logger)),
+            ("read", lambda: None, read),
+            ("read_again", lambda: read(None), read_again),
+            ("check", lambda: parsed_map(lines), lambda m: m.check()),
+            ("check_parallel", lambda: parsed_map(lines),
+             lambda m: m.check(jobs=0)),
+            ("recheck", changed_map, lambda m: m.check(incremental=True)),
+            ("diff", lambda: (checked_map(lines), changed_map()),
+             lambda maps: maps[0].diff(maps[1])),
+            ("dependencies", lambda: parsed_map(lines),
+             lambda m: m.dependencies()),
+            ("str", lambda: checked_map(lines), str),
+            ("update", remove_out, update),
+            ("new", remove_out, new),
+            ("merge", merge_files, merge),
+            ("start_version", lambda: None,
+             lambda _: run_script(["version"])),
+            ("start_check", lambda: None,
+             lambda _: run_script(["check", "--quiet", map_file]))]
+
+
+def measure(setup, operation, repeat):
+    """
+    Measure the time and the peak memory used by an operation
+
+    :param setup:     The function preparing the argument of the operation
+    :param operation: The function to measure
+    :param repeat:    The number of times the time is measured
+    :returns:         A dictionary with the minimum and mean times in seconds,
+                      the peak memory, and the memory retained by the result
+                      of the operation, in bytes (or None if not available)
+    """
+
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        start = timeit.default_timer()
+        operation(arg)
+        times.append(timeit.default_timer() - start)
+
+    peak = None
+    retained = None
+    if tracemalloc is not None:
+        arg = setup()
+        tracemalloc.start()
+        try:
+            result = operation(arg)
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the result alive while measuring
+            retained = current if result is not None else 0
+        finally:
+            tracemalloc.stop()
+
+    return {"min": min(times),
+            "mean": sum(times) / len(times),
+            "peak_memory": peak,
+            "retained_memory": retained}
+
+
+def run(params, repeat=3, selected=None):
+    """
+    Run the benchmarks on a generated map
+
+    :param params:   The arguments to ``generate_map()``
+    :param repeat:   The number of times each operation is measured
+    :param selected: The names of the benchmarks to run, or None for all
+    :returns:        A dictionary with the description of the environment, the
+                     parameters and the results of each benchmark
+    """
+
+    logger = symver.Single_Logger.getLogger(symver.__name__)
+    logger.setLevel(logging.CRITICAL)
+
+    lines = generate_map(**params)
+
+    workdir = tempfile.mkdtemp(prefix="abimap-bench-")
+    try:
+        with open(os.path.join(workdir, "bench.map"), "w") as f:
+            f.writelines(lines)
+        with open(os.path.join(workdir, "symbols.in"), "w") as f:
+            f.writelines(symbol + "\n" for symbol in
+                         generate_symbols(params["releases"],
+                                          params["symbols"],
+                                          ADDED_SYMBOLS))
+
+        results = {}
+        for name, setup, operation in benchmarks(workdir, lines):
+            if selected and name not in selected:
+                continue
+            results[name] = measure(setup, operation, repeat)
+            print_result(name, results[name])
+    finally:
+        shutil.rmtree(workdir)
+
+    return {"python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "abimap": symver.__version__,
+            "params": params,
+            "repeat": repeat,
+            "results": results}
+
+
+def print_result(name, result, baseline=None):
+    """
+    Print the result of a benchmark, compared to the baseline if given
+
+    :param name:     The benchmark name
+    :param result:   The result, as returned by ``measure()``
+    :param baseline: The result of the same benchmark in the baseline
+    """
+
+    memory = ""
+    for key in ("peak_memory", "retained_memory"):
+        size = result.get(key)
+        if size is not None:
+            memory += "{0:10.1f} MiB".format(size / 1048576.0)
+        else:
+            memory += "{0:>14}".format("-")
+    line = "{0:<14}{1:10.4f} s {2:10.4f} s{3}".format(name, result["min"],
+                                                      result["mean"], memory)
+    if baseline:
+        line += "  {0:6.2f}x".format(result["min"] / baseline["min"])
+    print(line)
+
+
+def compare(current, baseline, tolerance):
+    """
+    Compare the results with a baseline
+
+    :param current:   The results of the current run
+    :param baseline:  The results loaded from the baseline
+    :param tolerance: The relative slowdown tolerated (e.g. 0.2 for 20%)
+    :returns:         The list of the names of the benchmarks which regressed
+    """
+
+    if current["params"] != baseline["params"]:
+        print("Warning: the baseline was generated with different parameters:"
+              " {0}".format(baseline["params"]), file=sys.stderr)
+
+    print("\nCompared to the baseline (time ratio):")
+    regressed = []
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        print_result(name, result, base)
+        if result["min"] > base["min"] * (1 + tolerance):
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the abimap benchmarks")
+    parser.add_argument("--size", choices=sorted(SIZES), default="small",
+                        help="The size of the generated map (small: 10k,"
+                        " medium: 100k, large: 1M symbols)")
+    parser.add_argument("--releases", type=int,
+                        help="The number of releases (overrides --size)")
+    parser.add_argument("--symbols", type=int,
+                        help="The number of symbols per release (overrides"
+                        " --size)")
+    parser.add_argument("--chain-depth", type=int, default=0,
+                        help="The maximum number of releases in a dependency"
+                        " chain (0 for a single chain)")
+    parser.add_argument("--comment-density", type=float, default=0.0,
+                        help="The fraction of symbols followed by a comment")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="The number of times each operation is measured")
+    parser.add_argument("-b", "--benchmark", action="append",
+                        help="Run only this benchmark (can be repeated)")
+    parser.add_argument("-o", "--output",
+                        help="Save the results as JSON in this file")
+    parser.add_argument("-c", "--compare",
+                        help="Compare the results with this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="The relative slowdown tolerated when comparing"
+                        " (defaults to 0.2)")
+    args = parser.parse_args()
+
+    releases, symbols = SIZES[args.size]
+    params = {"releases": args.releases or releases,
+              "symbols": args.symbols or symbols,
+              "chain_depth": args.chain_depth,
+              "comment_density": args.comment_density}
+
+    print("{0} releases, {1} symbols per release, chain depth {2},"
+          " comment density {3}".format(params["releases"], params["symbols"],
+                                        params["chain_depth"],
+                                        params["comment_density"]))
+    header = "{0:<14}{1:>12} {2:>12}{3:>14}{4:>14}"
+    print(header.format("benchmark", "min", "mean", "peak memory",
+                        "retained"))
+
+    current = run(params, args.repeat, args.benchmark)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressed = compare(current, baseline, args.tolerance)
+        if regressed:
+            print("Slower than the baseline: {0}".format(", ".join(regressed)),
+                  file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,3 +6,15 @@ from ._version import __version__
 
 __author__ = """Anderson Toshiyuki Sasaki"""
 __email__ = 'ansasaki@redhat.com'
+
+
+def batch_update(map, deltas, **kwargs):
+    """
+    Apply many symbol changes to a map, reading and writing it only once
+
+    See ``abimap.symver.batch_update()``. The ``symver`` module is imported
+    only when this is called, to keep ``import abimap`` cheap.
+    """
+
+    from .symver import batch_update as _batch_update
+    return _batch_update(map, deltas, **kwargs)
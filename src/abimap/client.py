@@ -0,0 +1,96 @@
+"""A client forwarding abimap commands to a server (see ``abimap.server``)"""
+
+import json
+import os
+import socket
+import sys
+
+# The commands which read the symbols from stdin if no input file is given
+_STDIN_COMMANDS = ("update", "new")
+
+# The options giving the input of a command instead of stdin
+_INPUT_OPTIONS = ("-i", "--in", "--from-elf", "--manifest")
+
+
+class ClientError(Exception):
+    """
+    Exception type raised when the server cannot be reached
+    """
+    pass
+
+
+def send_request(path, request):
+    """
+    Send a request to the server and wait for the response
+
+    :param path:        The path of the socket of the server
+    :param request:     The request (a dictionary)
+    :returns:           The response (a dictionary)
+    :raises ClientError: Raised if the server cannot be reached, or if the
+                         response is not valid
+    """
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b'\n')
+
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except socket.error as e:
+        raise ClientError("Could not reach the server on \'{0}\': {1}"
+                          .format(path, e))
+    finally:
+        sock.close()
+
+    try:
+        return json.loads(b''.join(chunks).decode("utf-8"))
+    except ValueError:
+        raise ClientError("Invalid response from the server on \'{0}\'"
+                          .format(path))
+
+
+def reads_stdin(argv):
+    """
+    Check if a command reads the symbols from stdin
+
+    :param argv: The arguments of the command
+    :returns:    True if the command reads stdin; False otherwise
+    """
+
+    if not argv or argv[0] not in _STDIN_COMMANDS:
+        return False
+
+    for arg in argv[1:]:
+        if arg.split("=", 1)[0] in _INPUT_OPTIONS:
+            return False
+        if arg.startswith("-i") and len(arg) > 2:
+            return False
+    return True
+
+
+def make_request(argv, program=None):
+    """
+    Make the request to run a command from the current directory
+
+    The input of the command is read from stdin if needed.
+
+    :param argv:    The arguments of the command
+    :param program: The name of the program, written in the output files
+    :returns:       The request (a dictionary)
+    """
+
+    # Allow separating the command from the client options with '--'
+    if argv and argv[0] == "--":
+        argv = argv[1:]
+
+    stdin = ""
+    if reads_stdin(argv):
+        stdin = sys.stdin.read()
+
+    return {"argv": list(argv), "cwd": os.getcwd(), "stdin": stdin,
+            "program": program}
@@ -0,0 +1,76 @@
+"""Demangling of C++ symbol names, with a cache of the demangled names"""
+
+import subprocess
+
+# The program used to demangle the names, reading one name per line
+DEMANGLER = "c++filt"
+
+
+class DemangleError(Exception):
+    """
+    Exception type raised when the names cannot be demangled
+    """
+    pass
+
+
+# Maps the mangled names to the demangled names, for the whole run
+_cache = {}
+
+
+def is_mangled(name):
+    """
+    Check if a symbol name is a mangled C++ name (Itanium C++ ABI)
+
+    :param name: The symbol name
+    :returns:    True if the name is mangled; False otherwise
+    """
+
+    return name.startswith("_Z")
+
+
+def demangle(names):
+    """
+    Demangle C++ symbol names
+
+    The names which are not mangled are returned unchanged. The demangled
+    names are cached, so each name is demangled only once per run, and all
+    the names not in the cache are given to a single demangler process.
+
+    :param names:         An iterable of symbol names
+    :returns:             A list of the demangled names, in the same order
+    :raises DemangleError: Raised if the demangler cannot be run
+    """
+
+    names = list(names)
+
+    unknown = [name for name in set(names) if
+               is_mangled(name) and name not in _cache]
+    if unknown:
+        _cache.update(zip(unknown, _run_demangler(unknown)))
+
+    return [_cache.get(name, name) for name in names]
+
+
+def _run_demangler(names):
+    """
+    Demangle the names using the external demangler
+
+    :param names:         A list of mangled names
+    :returns:             A list of the demangled names, in the same order
+    :raises DemangleError: Raised if the demangler cannot be run
+    """
+
+    try:
+        process = subprocess.Popen([DEMANGLER], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   universal_newlines=True)
+    except OSError as e:
+        raise DemangleError("Could not run \'{0}\': {1}"
+                            .format(DEMANGLER, e))
+
+    out, _ = process.communicate("".join(name + "\n" for name in names))
+    demangled = out.splitlines()
+    if process.returncode or len(demangled) != len(names):
+        raise DemangleError("\'{0}\' failed to demangle the symbols"
+                            .format(DEMANGLER))
+    return demangled
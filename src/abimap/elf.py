@@ -0,0 +1,408 @@
+"""Reader for the dynamic symbols and symbol versions of ELF files"""
+
+import mmap
+import struct
+from collections import namedtuple
+
+# Identification
+ELF_MAGIC = b'\x7fELF'
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+# The size of the identification (e_ident) and of the whole file header
+EI_NIDENT = 16
+EHDR_SIZE = {32: 52, 64: 64}
+
+# Section types
+SHT_DYNSYM = 11
+SHT_GNU_VERDEF = 0x6ffffffd
+SHT_GNU_VERSYM = 0x6fffffff
+
+# Special section indexes
+SHN_UNDEF = 0
+SHN_ABS = 0xfff1
+
+# Symbol bindings
+STB_LOCAL = 0
+STB_GLOBAL = 1
+STB_WEAK = 2
+STB_GNU_UNIQUE = 10
+
+# Symbol types
+STT_NOTYPE = 0
+STT_OBJECT = 1
+STT_FUNC = 2
+STT_SECTION = 3
+STT_FILE = 4
+
+# Symbol visibility
+STV_DEFAULT = 0
+STV_PROTECTED = 3
+
+# Symbol versioning
+VER_FLG_BASE = 0x1
+VERSYM_HIDDEN = 0x8000
+VERSYM_VERSION = 0x7fff
+
+Section = namedtuple("Section", ["name", "type", "offset", "size", "link",
+                                 "info", "entsize"])
+"""A section header"""
+
+Symbol = namedtuple("Symbol", ["name", "value", "size", "type", "bind",
+                               "visibility", "shndx", "version", "hidden"])
+"""
+A dynamic symbol
+
+``version`` is the name of the version defined in the file to which the
+symbol is bound (or ``None``); ``hidden`` is True if it is not the default
+version of the symbol (i.e. ``symbol@VERSION`` instead of
+``symbol@@VERSION``)
+"""
+
+VersionDefinition = namedtuple("VersionDefinition", ["index", "flags", "name",
+                                                     "parents"])
+"""
+A version definition from the ``.gnu.version_d`` section
+
+``parents`` is a list of the names of the versions this version depends on
+"""
+
+
+class ELFError(Exception):
+    """
+    Exception type raised when a file cannot be read as an ELF file
+    """
+    pass
+
+
+class ELFFile(object):
+    """
+    A read-only view of the dynamic symbols of an ELF file
+
+    The file is memory-mapped and the structures are decoded directly from
+    the mapped memory, so the symbol and string tables are never copied. Both
+    32 and 64 bits files, in little or big endian, are supported.
+
+    Use as a context manager to unmap the file when done::
+
+        with ELFFile("libx.so") as elf:
+            symbols = elf.exported_symbols()
+
+    Attributes:
+        filename:   The path of the file
+        bits:       The class of the file: 32 or 64
+        byteorder:  The ``struct`` byte order character: ``<`` or ``>``
+    """
+
+    def __init__(self, filename):
+        """
+        The constructor
+
+        :param filename:  The path of the ELF file
+        :raises ELFError: Raised if the file is not a valid ELF file
+        """
+
+        self.filename = filename
+        self._map = None
+
+        with open(filename, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, mmap.error) as e:
+                raise ELFError("Could not map \'{0}\': {1}".format(filename,
+                                                                   e))
+
+        try:
+            self._read_header()
+            self._sections = self._read_sections()
+        except struct.error:
+            self.close()
+            raise ELFError("\'{0}\' is truncated".format(filename))
+        except ELFError:
+            self.close()
+            raise
+
+        self._versions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Unmap the file
+        """
+
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _read_header(self):
+        m = self._map
+
+        if m[0:4] != ELF_MAGIC:
+            raise ELFError("\'{0}\' is not an ELF file".format(self.filename))
+
+        if len(m) < EI_NIDENT:
+            raise ELFError("\'{0}\' is truncated".format(self.filename))
+
+        ei_class = ord(m[4:5])
+        ei_data = ord(m[5:6])
+
+        if ei_class == ELFCLASS32:
+            self.bits = 32
+        elif ei_class == ELFCLASS64:
+            self.bits = 64
+        else:
+            raise ELFError("\'{0}\' has invalid ELF class {1}"
+                           .format(self.filename, ei_class))
+
+        if ei_data == ELFDATA2LSB:
+            self.byteorder = '<'
+        elif ei_data == ELFDATA2MSB:
+            self.byteorder = '>'
+        else:
+            raise ELFError("\'{0}\' has invalid ELF data encoding {1}"
+                           .format(self.filename, ei_data))
+
+        if len(m) < EHDR_SIZE[self.bits]:
+            raise ELFError("\'{0}\' is truncated".format(self.filename))
+
+        bo = self.byteorder
+        if self.bits == 32:
+            # e_shoff, then e_flags, e_ehsize, e_phentsize, e_phnum,
+            # e_shentsize, e_shnum, e_shstrndx
+            header = struct.unpack_from(bo + "I I HHHHHH", m, 32)
+            self._section_format = struct.Struct(bo + "IIIIIIIIII")
+            self._symbol_format = struct.Struct(bo + "IIIBBH")
+        else:
+            header = struct.unpack_from(bo + "Q I HHHHHH", m, 40)
+            self._section_format = struct.Struct(bo + "IIQQQQIIQQ")
+            self._symbol_format = struct.Struct(bo + "IBBHQQ")
+
+        self._shoff = header[0]
+        self._shentsize = header[5]
+        self._shnum = header[6]
+        self._shstrndx = header[7]
+
+    def _read_sections(self):
+        m = self._map
+        fmt = self._section_format
+
+        if not self._shoff:
+            return []
+
+        if self._shentsize < fmt.size:
+            raise ELFError("\'{0}\' has invalid section header size"
+                           .format(self.filename))
+
+        raw = []
+        for i in range(self._shnum):
+            fields = fmt.unpack_from(m, self._shoff + i * self._shentsize)
+            # (name, type, offset, size, link, info, entsize)
+            raw.append((fields[0], fields[1], fields[4], fields[5], fields[6],
+                        fields[7], fields[9]))
+
+        names_offset = None
+        if self._shstrndx < len(raw):
+            names_offset = raw[self._shstrndx][2]
+
+        sections = []
+        for name, stype, offset, size, link, info, entsize in raw:
+            if names_offset is not None:
+                name = self._string(names_offset + name)
+            else:
+                name = ''
+            sections.append(Section(name, stype, offset, size, link, info,
+                                    entsize))
+        return sections
+
+    def _string(self, offset):
+        """
+        Read a NUL terminated string from the given file offset
+
+        :param offset: The offset of the string in the file
+        :returns:      The decoded string
+        """
+
+        m = self._map
+        end = m.find(b'\0', offset)
+        if end < 0:
+            raise ELFError("\'{0}\' has an unterminated string"
+                           .format(self.filename))
+        return m[offset:end].decode("utf-8", "replace")
+
+    def sections(self):
+        """
+        Get the section headers
+
+        :returns: A list of ``Section``
+        """
+
+        return list(self._sections)
+
+    def _find_section(self, stype):
+        for section in self._sections:
+            if section.type == stype:
+                return section
+        return None
+
+    def version_definitions(self):
+        """
+        Get the versions defined in the ``.gnu.version_d`` section
+
+        :returns: A list of ``VersionDefinition``, in the order they appear in
+                  the file (the first is usually the base version, with the
+                  ``VER_FLG_BASE`` flag set)
+        :raises ELFError: Raised if the section is truncated
+        """
+
+        if self._versions is not None:
+            return list(self._versions)
+
+        versions = []
+        section = self._find_section(SHT_GNU_VERDEF)
+        if section is not None and section.link < len(self._sections):
+            m = self._map
+            bo = self.byteorder
+            strings = self._sections[section.link].offset
+            offset = section.offset
+            try:
+                # The number of entries is given in sh_info
+                for _ in range(section.info):
+                    (vd_version, vd_flags, vd_ndx, vd_cnt, vd_hash, vd_aux,
+                     vd_next) = struct.unpack_from(bo + "HHHHIII", m, offset)
+
+                    names = []
+                    aux = offset + vd_aux
+                    for _ in range(vd_cnt):
+                        vda_name, vda_next = struct.unpack_from(bo + "II", m,
+                                                                aux)
+                        names.append(self._string(strings + vda_name))
+                        aux += vda_next
+
+                    if names:
+                        versions.append(VersionDefinition(vd_ndx, vd_flags,
+                                                          names[0],
+                                                          names[1:]))
+                    if not vd_next:
+                        break
+                    offset += vd_next
+            except struct.error:
+                raise ELFError("\'{0}\' is truncated".format(self.filename))
+
+        self._versions = versions
+        return list(versions)
+
+    def symbols(self):
+        """
+        Iterate over the symbols in the ``.dynsym`` section
+
+        The first (null) symbol is skipped.
+
+        :returns: A generator of ``Symbol``
+        :raises ELFError: Raised if the section is truncated
+        """
+
+        section = self._find_section(SHT_DYNSYM)
+        if section is None or section.link >= len(self._sections):
+            return
+
+        m = self._map
+        fmt = self._symbol_format
+        entsize = section.entsize or fmt.size
+        count = section.size // entsize
+        strings = self._sections[section.link].offset
+
+        # The version index of each symbol
+        versym = self._find_section(SHT_GNU_VERSYM)
+        version_names = {}
+        if versym is not None:
+            versym_format = struct.Struct(self.byteorder + "H")
+            for version in self.version_definitions():
+                version_names[version.index] = version.name
+
+        is_32 = self.bits == 32
+        for i in range(1, count):
+            try:
+                fields = fmt.unpack_from(m, section.offset + i * entsize)
+                if versym is not None:
+                    index, = versym_format.unpack_from(m, versym.offset +
+                                                       i * 2)
+            except struct.error:
+                raise ELFError("\'{0}\' is truncated".format(self.filename))
+
+            if is_32:
+                st_name, value, size, info, other, shndx = fields
+            else:
+                st_name, info, other, shndx, value, size = fields
+
+            version = None
+            hidden = False
+            if versym is not None:
+                hidden = bool(index & VERSYM_HIDDEN)
+                version = version_names.get(index & VERSYM_VERSION)
+
+            yield Symbol(self._string(strings + st_name), value, size,
+                         info & 0xf, info >> 4, other & 0x3, shndx, version,
+                         hidden)
+
+    def exported_symbols(self):
+        """
+        Get the names of the symbols exported by the file
+
+        Exported symbols are the defined global, weak or unique symbols with
+        default or protected visibility. The absolute symbols defining the
+        version nodes are not included.
+
+        :returns: A list of the names of the exported symbols, in the order
+                  they appear in the ``.dynsym`` section
+        """
+
+        version_nodes = set(version.name for version in
+                            self.version_definitions())
+
+        exported = []
+        for symbol in self.symbols():
+            if not is_exported(symbol):
+                continue
+            if symbol.shndx == SHN_ABS and symbol.name in version_nodes:
+                continue
+            exported.append(symbol.name)
+        return exported
+
+
+def is_exported(symbol):
+    """
+    Check if a symbol is exported (visible to other objects)
+
+    :param symbol: A ``Symbol``
+    :returns:      True if the symbol is defined and visible; False otherwise
+    """
+
+    if symbol.shndx == SHN_UNDEF or not symbol.name:
+        return False
+    if symbol.bind not in (STB_GLOBAL, STB_WEAK, STB_GNU_UNIQUE):
+        return False
+    if symbol.visibility not in (STV_DEFAULT, STV_PROTECTED):
+        return False
+    if symbol.type in (STT_SECTION, STT_FILE):
+        return False
+    return True
+
+
+def read_exported_symbols(filename):
+    """
+    Get the names of the symbols exported by an ELF file
+
+    :param filename:  The path of the ELF file
+    :returns:         A list of the names of the exported symbols
+    :raises ELFError: Raised if the file is not a valid ELF file
+    """
+
+    with ELFFile(filename) as elf:
+        return elf.exported_symbols()
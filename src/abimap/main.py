@@ -1,6 +1,7 @@
 """Entrypoint used to generate the command line application"""
 
-from abimap import symver
+import os
+import sys
 
 
 def main():
@@ -10,6 +11,16 @@ def main():
         """
         pass
 
+    # Print the version without loading the commands and building the parser
+    if sys.argv[1:] == ["version"]:
+        from abimap._version import __version__
+
+        print("{0}-{1}".format(os.path.basename(sys.argv[0]), __version__))
+        return
+
+    # The commands are loaded only when needed
+    from abimap import symver
+
     ns = C()
 
     # Get the arguments parser
@@ -0,0 +1,421 @@
+"""
+A server running abimap commands requested over a Unix socket
+
+The server keeps the maps it reads in memory, so a build running abimap for
+many libraries does not start the program and parse the same maps again for
+each command. The commands are requested with ``abimap client`` (see
+``abimap.client``).
+
+Each request is a JSON object in a single line::
+
+    {"argv": ["check", "libx.map"], "cwd": "/path", "stdin": "",
+     "program": "abimap"}
+
+and is answered by a JSON object in a single line::
+
+    {"status": 0, "stdout": "...", "records": [[30, "message"]],
+     "error": null}
+
+where ``records`` are the messages logged, as (level, message). A request
+``{"stop": true}`` stops the server.
+
+The commands are run by a bounded pool of worker processes. The commands on
+the same map file are always run by the same worker, which keeps the maps it
+read (see ``MapStore``).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from . import symver
+
+# The commands which can be run by the server
+COMMANDS = ("check", "update", "new", "verify", "diff", "merge",
+            "version")
+
+# The maximum number of maps kept in memory by each worker
+MAX_MAPS = 64
+
+# The maps kept by the worker process (see _run_command())
+_maps = None
+
+
+class MapStore(object):
+    """
+    The maps read by a worker, kept while their files are not modified
+
+    The maps are kept by the real path of the file, and are read again if the
+    modification time, the size or the inode of the file changes. At most
+    ``size`` maps are kept; the least recently used are discarded.
+
+    Attributes:
+        size:   The maximum number of maps kept
+    """
+
+    def __init__(self, size=MAX_MAPS):
+        """
+        The constructor
+
+        :param size: The maximum number of maps kept
+        """
+
+        self.size = size
+        # path -> (stamp, cache_dir, level, map, records)
+        self._maps = OrderedDict()
+
+    def __len__(self):
+        return len(self._maps)
+
+    def get(self, filename, logger, cache_dir=None):
+        """
+        Get the checked map read from a file
+
+        The messages logged when the map was read, and the diagnostics found
+        when it was checked, are logged again.
+
+        :param filename:  The path to the map file
+        :param logger:    The logger used to read the map
+        :param cache_dir: The directory where the parsed maps are cached
+        :returns:         The map (a ``symver.Map``), which must not be
+                          modified
+        """
+
+        stat = os.stat(filename)
+        path = os.path.realpath(filename)
+        stamp = (stat.st_mtime, stat.st_size, stat.st_ino)
+
+        entry = self._maps.pop(path, None)
+        if entry is not None:
+            # The map is used only if the messages were kept with a level
+            # at least as verbose as the current level
+            if entry[0] == stamp and entry[1] == cache_dir and \
+                    logger.getEffectiveLevel() >= entry[2]:
+                logger.debug("Using the map \'%s\' kept in memory", filename)
+                m, records = entry[3], entry[4]
+                for level, message in records:
+                    logger.log(level, "%s", message)
+                symver.log_diagnostics(logger, m.diagnostics)
+                self._maps[path] = entry
+                return m
+
+        m = symver.Map(cache_dir=cache_dir)
+        collector = symver._RecordCollector()
+        logger.addHandler(collector)
+        try:
+            m.read(filename, log=False)
+        finally:
+            logger.removeHandler(collector)
+        symver.log_diagnostics(logger, m.diagnostics)
+
+        self._maps[path] = (stamp, cache_dir, logger.getEffectiveLevel(), m,
+                            collector.records)
+        while len(self._maps) > self.size:
+            self._maps.popitem(last=False)
+        return m
+
+    def take(self, filename, logger, cache_dir=None):
+        """
+        Get the checked map read from a file, to be modified
+
+        The map is not kept anymore.
+
+        :param filename:  The path to the map file
+        :param logger:    The logger used to read the map
+        :param cache_dir: The directory where the parsed maps are cached
+        :returns:         The map (a ``symver.Map``)
+        """
+
+        m = self.get(filename, logger, cache_dir)
+        del self._maps[os.path.realpath(filename)]
+        return m
+
+
+def _run_command(args, cwd, stdin, max_maps):
+    """
+    Run a command in a worker process, capturing the results
+
+    :param args:     The arguments of the command, parsed by argparse
+    :param cwd:      The directory where the command is run
+    :param stdin:    The text read by the command from stdin
+    :param max_maps: The maximum number of maps kept by the worker
+    :returns:        A tuple (name, records, output, error) (see
+                     ``symver._run_captured()``)
+    """
+
+    global _maps
+
+    if _maps is None:
+        _maps = MapStore(max_maps)
+
+    # The commands use the maps kept by the worker, and run in the worker
+    args.maps = _maps
+    if hasattr(args, "jobs"):
+        args.jobs = 1
+
+    level = symver.VERBOSITY_MAP[args.verbosity or "warning"] if \
+        hasattr(args, "verbosity") else logging.WARNING
+
+    def work():
+        os.chdir(cwd)
+        saved = sys.stdin
+        sys.stdin = symver.StringIO(stdin)
+        try:
+            args.func(args)
+        finally:
+            sys.stdin = saved
+
+    return symver._run_captured(args.subcommand, level, work)
+
+
+class _Connection(asyncio.Protocol):
+    """
+    A connection to the server, receiving a single request
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.data = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.data += data
+        if b'\n' in self.data:
+            line = self.data.split(b'\n', 1)[0]
+            self.data = b''
+            self.server.handle(line, self.reply)
+
+    def eof_received(self):
+        if self.data:
+            line, self.data = self.data, b''
+            self.server.handle(line, self.reply)
+        return True
+
+    def reply(self, response):
+        self.transport.write(json.dumps(response).encode("utf-8") + b'\n')
+        self.transport.close()
+
+
+class Server(object):
+    """
+    A server running the commands requested over a Unix socket
+
+    Attributes:
+        path:       The path of the socket
+        jobs:       The number of worker processes
+        max_maps:   The maximum number of maps kept by each worker
+        logger:     The logger
+    """
+
+    def __init__(self, path, jobs=None, max_maps=MAX_MAPS, logger=None):
+        """
+        The constructor
+
+        :param path:     The path of the socket
+        :param jobs:     The number of worker processes. If 0 or None, the
+                         number of processors is used
+        :param max_maps: The maximum number of maps kept by each worker
+        :param logger:   A logger object. If not provided, the module based
+                         logger will be used
+        """
+
+        self.path = path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_maps = max_maps
+        self.logger = logger or symver.Single_Logger.getLogger(symver.__name__)
+        self._parser = symver.get_arg_parser()
+        self._executors = []
+        self._next = 0
+        self._loop = None
+
+    def parse(self, request):
+        """
+        Parse the arguments of a command requested
+
+        :param request: The request (a dictionary)
+        :returns:       A tuple (args, response), where args is the parsed
+                        arguments, or None if the request is answered by
+                        response without running a command
+        """
+
+        argv = request.get("argv")
+        if not isinstance(argv, list) or not argv:
+            return None, self.error("Invalid request: missing the command")
+        if argv[0] not in COMMANDS:
+            return None, self.error("The command \'{0}\' cannot be run by"
+                                    " the server".format(argv[0]))
+
+        # The help and the errors are printed by argparse, which exits
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = symver.StringIO(), symver.StringIO()
+        try:
+            args = self._parser.parse_args([str(arg) for arg in argv],
+                                           namespace=argparse.Namespace())
+        except SystemExit as e:
+            output, message = sys.stdout.getvalue(), sys.stderr.getvalue()
+            if e.code:
+                return None, self.error(message.strip())
+            return None, {"status": 0, "stdout": output, "records": [],
+                          "error": None}
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+        args.program = request.get("program") or "abimap"
+        return args, None
+
+    def error(self, message):
+        """
+        Get the response for a failed request
+
+        :param message: The error message
+        :returns:       The response (a dictionary)
+        """
+
+        return {"status": 1, "stdout": "", "records": [], "error": message}
+
+    def _executor(self, args, cwd):
+        """
+        Choose the worker to run a command
+
+        The commands on the same map file are run by the same worker, so the
+        map is read only once.
+
+        :param args: The parsed arguments of the command
+        :param cwd:  The directory where the command is run
+        :returns:    The executor of the worker
+        """
+
+        filename = getattr(args, "file", None)
+        if isinstance(filename, list):
+            filename = filename[0] if len(filename) == 1 else None
+
+        if filename:
+            key = os.path.realpath(os.path.join(cwd, filename))
+            index = zlib.crc32(key.encode("utf-8")) % self.jobs
+        else:
+            index = self._next
+            self._next = (self._next + 1) % self.jobs
+        return self._executors[index]
+
+    def handle(self, line, reply):
+        """
+        Handle a request, calling ``reply`` with the response when done
+
+        :param line:  The request, as received
+        :param reply: The function called with the response
+        """
+
+        try:
+            request = json.loads(line.decode("utf-8"))
+            if not isinstance(request, dict):
+                raise ValueError("not an object")
+        except ValueError as e:
+            reply(self.error("Invalid request: {0}".format(e)))
+            return
+
+        if request.get("stop"):
+            self.logger.info("Stopping the server")
+            reply({"status": 0, "stdout": "", "records": [], "error": None})
+            self._loop.call_soon(self._loop.stop)
+            return
+
+        args, response = self.parse(request)
+        if args is None:
+            reply(response)
+            return
+
+        cwd = request.get("cwd") or os.getcwd()
+        self.logger.debug("Running %s in \'%s\'", request["argv"], cwd)
+
+        future = self._loop.run_in_executor(self._executor(args, cwd),
+                                            _run_command, args, cwd,
+                                            request.get("stdin") or "",
+                                            self.max_maps)
+
+        def done(future):
+            try:
+                name, records, output, error = future.result()
+            except Exception as e:
+                reply(self.error("The command failed: {0}".format(e)))
+                return
+            reply({"status": 1 if error is not None else 0,
+                   "stdout": output, "records": records, "error": error})
+
+        future.add_done_callback(done)
+
+    def _remove_stale_socket(self):
+        """
+        Remove the socket left by a server which is not running
+
+        :raises Exception: Raised if a server is running on the socket
+        """
+
+        if not os.path.exists(self.path):
+            return
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except socket.error:
+            os.remove(self.path)
+            return
+        finally:
+            probe.close()
+
+        msg = "A server is already running on \'{0}\'".format(self.path)
+        self.logger.error(msg)
+        raise Exception(msg)
+
+    def run(self):
+        """
+        Serve the requests until stopped (by a request, SIGTERM or SIGINT)
+        """
+
+        self._remove_stale_socket()
+
+        # A single process for each worker, to choose the worker by the map.
+        # The processes are started before the event loop, so they do not
+        # inherit its state
+        self._executors = [ProcessPoolExecutor(max_workers=1) for _ in
+                           range(self.jobs)]
+        for executor in self._executors:
+            executor.submit(os.getpid).result()
+
+        self._loop = asyncio.new_event_loop()
+        server = None
+        try:
+            server = self._loop.run_until_complete(
+                self._loop.create_unix_server(lambda: _Connection(self),
+                                              self.path))
+            try:
+                import signal
+                self._loop.add_signal_handler(signal.SIGTERM, self._loop.stop)
+            except (ImportError, NotImplementedError, RuntimeError,
+                    ValueError):
+                pass
+
+            self.logger.info("Serving on \'%s\' with %d workers", self.path,
+                             self.jobs)
+            try:
+                self._loop.run_forever()
+            except KeyboardInterrupt:
+                pass
+        finally:
+            if server is not None:
+                server.close()
+                self._loop.run_until_complete(server.wait_closed())
+            for executor in self._executors:
+                executor.shutdown(wait=True)
+            self._loop.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
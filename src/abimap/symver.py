@@ -1,21 +1,101 @@
 from __future__ import print_function
 
-import argparse
 import logging
 import os
 import re
-import shutil
 import sys
+import weakref
 from itertools import chain
+from itertools import compress
+from itertools import count
+from itertools import groupby
+from itertools import islice
+from operator import attrgetter
+from operator import ne
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    _intern = sys.intern
+except AttributeError:
+    def _intern(string):
+        """
+        Intern a string, encoding it in UTF-8 if it is unicode (e.g. the
+        names read from ELF files), as Python 2 only interns byte strings
+
+        :param string: The string to intern
+        :returns:      The interned native string
+        """
+
+        if isinstance(string, unicode):  # noqa: F821 (builtin in Python 2)
+            string = string.encode("utf-8")
+        return intern(string)  # noqa: F821 (builtin in Python 2)
 
 from ._version import __version__
 
+# The modules only needed by some commands (e.g. to parse the command line,
+# to read ELF files, to demangle names, or to use the cache) are imported when
+# used, to keep the start of the command line application fast
+
 VERBOSITY_MAP = {"debug": logging.DEBUG,
                  "info": logging.INFO,
                  "warning": logging.WARNING,
                  "error": logging.ERROR,
                  "quiet": logging.CRITICAL}
 
+# The available parser engines (see ``Map.parse()``)
+PARSER_ENGINES = ("fast", "legacy")
+
+# A glob pattern in a scope: words, the wildcards '*' and '?', and bracket
+# expressions (e.g. "foo_*", "_Z[!N]*")
+_PATTERN = r'(?:[\w*?]|\[[^\]\s;]*\])+'
+
+# The master regular expression used by the tokenizer. Each alternative is a
+# token type, identified by the name of the group. Words and the '*' wildcard
+# are not matched if they are part of a glob pattern
+_TOKEN_REGEX = re.compile(r'(?P<space>\s+)'
+                          r'|(?P<comment>#.*)'
+                          r'|(?P<word>\w+)(?![\w*?[])'
+                          r'|(?P<wildcard>\*)(?![\w*?[])'
+                          r'|(?P<pattern>' + _PATTERN + r')'
+                          r'|(?P<punct>[{}:;])'
+                          r'|(?P<string>"[^"\n]*")'
+                          r'|(?P<other>.)')
+
+# The regular expressions used by the legacy parser to find an identifier in a
+# scope, the start of a language block, and the parts of a symbol in a language
+# block (separated by whitespaces)
+_IDENTIFIER_REGEX = re.compile(_PATTERN)
+_EXTERN_REGEX = re.compile(r'extern(?!\w)')
+_EXTERN_SYMBOL_REGEX = re.compile(r'(?:"[^"\n]*"|[^\s;}"#]+)'
+                                  r'(?:[ \t]+(?:"[^"\n]*"|[^\s;}"#]+))*')
+_EXTERN_PART_REGEX = re.compile(r'"[^"\n]*"|\s+|[^\s"]+')
+
+# The characters which make a symbol a glob pattern
+_GLOB_CHARS = re.compile(r'[*?[]')
+
+# The special comment marking a release as released
+_RELEASED_REGEX = re.compile(r'#.\s*released', re.IGNORECASE)
+
+# Atomically replace a file (os.rename() is atomic on POSIX, but cannot
+# replace an existing file on Windows)
+_replace = getattr(os, "replace", os.rename)
+
+# The codes of the diagnostics found when checking each release of a map,
+# mapped to the group of the diagnostics returned by Map._check_release()
+_RELEASE_CODES = {"duplicate-symbol": 0,
+                  "local-wildcard": 1,
+                  "local-wildcard-not-base": 1,
+                  "base-version": 1,
+                  "global-wildcard": 1,
+                  "unknown-scope": 1}
+
+# The version of the format of the files stored in the cache directory
+CACHE_FORMAT_VERSION = 5
+
 
 ###############################################################################
 # Classes
@@ -97,6 +177,100 @@ def _natural_sort_key(s, regex=re.compile(r'(\d+)')):
             for substring in regex.split(s)]
 
 
+def _tokenize(lines, start=0, stop=None):
+    """
+    Split the lines of a version script into tokens
+
+    A single compiled regular expression is used to scan each line, so that
+    each character is visited only once.
+
+    The generated tokens are tuples in the format
+    ``(type, value, index, start, end, line)``, where ``type`` is one of:
+
+        - ``space``: A sequence of whitespaces (including line breaks)
+        - ``comment``: A comment, from ``#`` to the end of the line
+        - ``word``: An identifier made of alphanumeric characters or ``_``
+        - ``wildcard``: The ``*`` wildcard
+        - ``pattern``: A glob pattern, like ``foo_*`` (see ``is_glob()``)
+        - ``punct``: One of ``{``, ``}``, ``:`` or ``;``
+        - ``string``: A string between double quotes (e.g. ``"C++"``)
+        - ``other``: Any other (invalid) character
+
+    ``index`` is the index of the line where the token was found; ``start``
+    and ``end`` are the columns where the token starts and ends, respectively;
+    ``line`` is the line itself, used as context for the messages.
+
+    :param lines: The lines of a version script file
+    :param start: The index of the first line to split
+    :param stop:  The index of the line where to stop, or None to split until
+                  the end
+    :returns:     A generator of tokens
+    """
+
+    if start or stop is not None:
+        lines = islice(lines, start, stop)
+
+    finditer = _TOKEN_REGEX.finditer
+    for index, line in enumerate(lines, start):
+        for m in finditer(line):
+            yield (m.lastgroup, m.group(), index, m.start(), m.end(), line)
+
+
+def _trace_tokens(tokens, logger):
+    """
+    Log the tokens given to the parser, for debugging
+
+    :param tokens: The tokens, as generated by ``_tokenize()``
+    :param logger: The logger to use
+    :returns:      A generator of the same tokens
+    """
+
+    for token in tokens:
+        kind, value, index, column, end, line = token
+        if kind != 'space':
+            logger.debug(">>%s %r (line %d, column %d)", kind, value,
+                         index + 1, column)
+        yield token
+
+
+def iter_lines(chunks):
+    """
+    Split an iterable of chunks of text into lines
+
+    The chunks can be of any size and do not need to be aligned with the line
+    breaks. The line breaks are kept in the returned lines, as it is done when
+    iterating over a file object.
+
+    :param chunks: An iterable of strings
+    :returns:      A generator of lines
+    """
+
+    pending = ''
+    for chunk in chunks:
+        pending += chunk
+        if '\n' not in chunk:
+            continue
+        parts = pending.split('\n')
+        pending = parts.pop()
+        for part in parts:
+            yield part + '\n'
+    if pending:
+        yield pending
+
+
+class _RecordCollector(logging.Handler):
+    """
+    A logging handler which keeps the level and message of the records
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+
 class ParserError(Exception):
     """
     Exception type raised by the map parser
@@ -135,6 +309,164 @@ class ParserError(Exception):
         self.message = message
 
 
+class _NeedsLegacy(Exception):
+    """
+    Raised by the fast parser engine when the lines have to be parsed by the
+    legacy engine
+    """
+
+
+class _Replay(object):
+    """
+    The lines read by the fast parser engine since the end of the last release
+    parsed, from where the legacy engine resumes parsing if the fast engine
+    gives up
+
+    Attributes:
+        lines:    The lines read since the end of the last release
+        start:    The index of the first line kept
+        column:   The column where the legacy engine resumes parsing
+        releases: The releases parsed by the fast engine
+        done:     The number of releases parsed until the end of the last
+                  release
+    """
+
+    __slots__ = ("lines", "start", "column", "releases", "done")
+
+    def __init__(self):
+        self.lines = []
+        self.start = 0
+        self.column = 0
+        self.releases = []
+        self.done = 0
+
+    def record(self, lines):
+        """
+        Keep the lines as they are read
+
+        :param lines: An iterable of lines
+        :returns:     A generator of the same lines
+        """
+
+        append = self.lines.append
+        for line in lines:
+            append(line)
+            yield line
+
+    def checkpoint(self, index, column, done):
+        """
+        Drop the lines read before the end of a release
+
+        :param index:  The index of the line where the release ends
+        :param column: The column where the legacy engine would continue
+        :param done:   The number of releases parsed
+        """
+
+        del self.lines[:index - self.start]
+        self.start = index
+        self.column = column
+        self.done = done
+
+
+class Diagnostic(object):
+    """
+    A problem found when checking a map
+
+    The diagnostics are returned by ``Map.check()``. Logging them (see
+    ``log_diagnostics()``) is only one way to report them.
+
+    Attributes:
+        code:       A string identifying the kind of problem (e.g.
+                    ``"duplicate-symbol"``)
+        severity:   The severity: ``"info"``, ``"warning"`` or ``"error"``
+        message:    A description of the problem
+        release:    The name of the release involved, or ``None``
+        scope:      The name of the visibility scope involved, or ``None``
+        symbol:     The symbol involved, or ``None``
+        location:   A tuple (filename, line, column) where the problem was
+                    found. Each item can be ``None`` if not known
+    """
+
+    __slots__ = ("code", "severity", "message", "release", "scope", "symbol",
+                 "location")
+
+    def __init__(self, code, severity, message, release=None, scope=None,
+                 symbol=None, location=None):
+        """
+        The constructor
+
+        :param code:     The kind of problem
+        :param severity: The severity of the problem
+        :param message:  The description of the problem
+        :param release:  The name of the release involved
+        :param scope:    The name of the scope involved
+        :param symbol:   The symbol involved
+        :param location: A tuple (filename, line, column)
+        """
+        self.code = code
+        self.severity = severity
+        self.message = message
+        self.release = release
+        self.scope = scope
+        self.symbol = symbol
+        if location is None:
+            location = (None, None, None)
+        self.location = location
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return "Diagnostic({0!r}, {1!r}, {2!r})".format(self.code,
+                                                        self.severity,
+                                                        self.message)
+
+    def __eq__(self, other):
+        if not isinstance(other, Diagnostic):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def as_tuple(self):
+        """
+        Get the diagnostic as a tuple
+
+        :returns: A tuple (code, severity, message, release, scope, symbol,
+                  location) which can be given to the constructor
+        """
+
+        return (self.code, self.severity, self.message, self.release,
+                self.scope, self.symbol, tuple(self.location))
+
+    def as_dict(self):
+        """
+        Get the diagnostic as a dictionary, suitable to be encoded in JSON
+
+        :returns: A dictionary mapping the attribute names to their values.
+                  The location is a dictionary with the keys ``file``,
+                  ``line`` and ``column``
+        """
+
+        filename, line, column = self.location
+        return {"code": self.code,
+                "severity": self.severity,
+                "message": self.message,
+                "release": self.release,
+                "scope": self.scope,
+                "symbol": self.symbol,
+                "location": {"file": filename,
+                             "line": line,
+                             "column": column}}
+
+
 class Map(object):
     """
     A linker map (version script) representation
@@ -150,7 +482,21 @@ class Map(object):
                     ``read()``
         logger:     The logger object; can be specified in the constructor
         filename:   Holds the name (path) of the file read
-        lines:      A list containing the lines of the file
+        lines:      A list containing the lines of the file. If the file was
+                    read in streaming mode, it is loaded from the file when
+                    accessed
+        parser:     The parser engine used by ``parse()``, one of
+                    ``PARSER_ENGINES``
+        releases:   The releases contained in the map (a ``ReleaseList``,
+                    which keeps the releases indexed by name). Plain lists
+                    assigned to it are converted
+        graph:      The dependency graph of the releases (a
+                    ``DependencyGraph``). It is computed when first accessed
+                    and kept until the releases change
+        cache_dir:  The directory where the parsed maps are cached by
+                    ``read()``. If ``None``, the cache is not used
+        diagnostics: The list of ``Diagnostic`` found by the last call to
+                     ``check()``
     """
 
     # To make printable
@@ -166,28 +512,125 @@ class Map(object):
                            release))
         return content
 
+    def iter_lines(self):
+        """
+        Iterate over the lines of the map in a usable form for the linker
+
+        The lines are generated as they are consumed, so the whole content is
+        never kept in memory. Joined, the lines are the same as ``str()``.
+
+        :returns: A generator of the lines, terminated with ``\\n``
+        """
+
+        for release in self.releases:
+            if release:
+                for line in release.iter_lines():
+                    yield line
+                yield "\n"
+
+    def write(self, fp):
+        """
+        Write the map to a file object, as it would be printed by ``str()``
+
+        :param fp: The file object, opened for writing text
+        """
+
+        fp.writelines(self.iter_lines())
+
     # Constructor
-    def __init__(self, filename=None, logger=None):
+    def __init__(self, filename=None, logger=None, parser="fast",
+                 cache_dir=None):
         """
         The constructor.
 
-        :param filename: The name of the file to be read. If provided the
-                         ``read()`` method is called using this name.
-        :param logger:   A logger object. If not provided, the module based
-                         logger will be used
+        :param filename:  The name of the file to be read. If provided the
+                          ``read()`` method is called using this name.
+        :param logger:    A logger object. If not provided, the module based
+                          logger will be used
+        :param parser:    The parser engine to use: ``"fast"`` (the default)
+                          or ``"legacy"``
+        :param cache_dir: The directory where the parsed maps are cached
         """
 
         # The state
         self.init = False
         self.releases = []
+        self._graph = None
+        self._matcher = None
+        # The list of releases of the last check, and the diagnostics found
+        # for each release
+        self._checked = None
+        self._release_diagnostics = {}
+        self.diagnostics = []
         # Logging
         self.logger = Single_Logger.getLogger(__name__)
+        # The parser engine
+        if parser not in PARSER_ENGINES:
+            msg = "Unknown parser \'{0}\'".format(parser)
+            self.logger.error(msg)
+            raise Exception(msg)
+        self.parser = parser
+        self.cache_dir = cache_dir
         # From the raw file
         self.filename = ''
-        self.lines = []
+        self._lines = None
         if filename:
             self.read(filename)
 
+    @property
+    def releases(self):
+        """
+        The list of releases in the map, indexed by name
+        """
+
+        return self._releases
+
+    @releases.setter
+    def releases(self, releases):
+        if not isinstance(releases, ReleaseList):
+            releases = ReleaseList(releases)
+        self._releases = releases
+
+    @property
+    def graph(self):
+        """
+        The dependency graph of the releases
+
+        The graph is kept until the list of releases is changed (including
+        changes to the names and previous releases of the releases in the list).
+
+        :raises Exception: Raised when the dependencies cannot be solved (see
+                           ``dependencies()``)
+        """
+
+        releases = self.releases
+        cached = self._graph
+        if cached is None or cached[0] is not releases or \
+                cached[1] != releases.version:
+            graph = DependencyGraph(self._solve_dependencies())
+            self._graph = (releases, releases.version, graph)
+        return self._graph[2]
+
+    @property
+    def lines(self):
+        """
+        The lines of the file read
+
+        If the file was read in streaming mode, the lines are loaded from the
+        file on the first access.
+        """
+
+        if self._lines is None:
+            if not self.filename:
+                return []
+            with open(self.filename, "r") as f:
+                self._lines = f.readlines()
+        return self._lines
+
+    @lines.setter
+    def lines(self, lines):
+        self._lines = lines
+
     def parse(self, lines):
         """
         A simple version script parser.
@@ -207,18 +650,435 @@ class Map(object):
             3. element_closer: The parser is searching for ``:`` or ``;``
             4. previous: The parser is searching for previous release name
             5. previous_closer: The parser is searching for ``;``
+            6. language: The parser is searching for the language of a
+               language block (e.g. ``"C++"`` in ``extern "C++" {...};``)
+            7. language_opening: The parser is searching for the ``{``
+            8. language_element: The parser is searching for a symbol (which
+               ends with ``;``) or ``}``
+            9. language_closer: The parser is searching for ``;``
+
+        Two engines implement the state machine, selected by ``parser``:
+
+            - ``fast``: The lines are split in tokens by ``_tokenize()`` in a
+              single pass, and each token feeds the state machine.
+            - ``legacy``: The lines are scanned by matching regular expressions
+              against the remaining part of the line on each state transition.
+
+        The ``fast`` engine parses only the input which the ``legacy`` engine
+        parses in the same way, and leaves the rest to the ``legacy`` engine:
+        the syntax errors, the symbols in language blocks which the engines
+        would split in different parts, and the text which the
+        ``legacy`` engine skips after a ``{``, ``}``, ``:`` or ``;`` (it
+        advances to the column twice as far as the character found, e.g. in
+        releases written in a single line). Both engines give the same
+        releases, warnings and errors.
+
+        The lines are parsed as they are read. When the ``fast`` engine gives
+        up, the ``legacy`` engine parses the lines from the end of the last
+        release parsed, so that only the lines read since then are kept.
+
+        The transitions of the state machine (for ``legacy``) or the tokens
+        (for ``fast``) are logged only if the logger is enabled for the debug
+        level, which is checked once per call.
+
+        The context of the messages is taken from the lines of the tokens.
 
         :param lines: The lines of a version script file
         """
 
+        if self.parser == "fast":
+            # Keep the lines read since the end of the last release, in case
+            # the legacy engine has to parse them
+            lines = iter(lines)
+            replay = _Replay()
+            try:
+                self._parse_fast(replay.record(lines), replay=replay)
+                return
+            except _NeedsLegacy:
+                pass
+            # The legacy engine parses the lines from the end of the last
+            # release, keeping the releases parsed before
+            releases = replay.releases
+            del releases[replay.done:]
+            self._parse_legacy(chain(replay.lines, lines), replay.start,
+                               replay.column, releases)
+            return
+        self._parse_legacy(lines)
+
+    def _parse_fast(self, lines, start=0, stop=None, replay=None):
+        """
+        The tokenizer based parser engine
+
+        Only the lines from ``start`` to ``stop`` are parsed, starting
+        searching for a release name.
+
+        This engine parses only the input which the legacy engine parses in
+        the same way. When a syntax error, a symbol in a language block which
+        would be split in different parts, or some text the legacy engine
+        would skip (see ``parse()``) is found, it gives up
+        raising ``_NeedsLegacy``, and nothing is logged. Otherwise, the
+        warnings are logged when all the lines are parsed.
+
+        If ``replay`` is given, the warnings are logged as each release is
+        parsed, and the end of the release is recorded in ``replay``, so that
+        the legacy engine can continue from there.
+
+        :param lines:  The lines of a version script file
+        :param start:  The index of the first line to parse
+        :param stop:   The index of the line where to stop, or None to parse
+                       until the end
+        :param replay: A ``_Replay`` which recorded the lines given, or None
+        :returns:      The state of the parser after the last line (0 if all
+                       the releases parsed were closed)
+        :raises _NeedsLegacy: Raised when the lines have to be parsed by the
+                              legacy engine
+        """
+
         state = 0
 
-        # The list of releases parsed
-        releases = []
-        last = (0, 0)
+        # The list of releases parsed and the warnings to log
+        releases = ReleaseList()
+        warnings = []
+        last = (start, 0, '')
+
+        r = None
+        v = None
+        identifier = None
+        name_line = None
+
+        # The scope of the symbols, the language block being parsed, the parts
+        # of the current symbol in the block, and where the last part ends
+        scope = None
+        block = None
+        parts = []
+        joined = None
+
+        if replay is not None:
+            replay.releases = releases
+
+        def release_closed(index, column):
+            # The legacy engine would continue from the column 2 * c + 1
+            replay.checkpoint(index, 2 * column + 1, len(releases))
+            for warning in warnings:
+                self.logger.warning(warning)
+            del warnings[:]
+
+        tokens = _tokenize(lines, start, stop)
+        # The tokens are traced only in debug level, to keep the loop free of
+        # calls to the logger
+        if self.logger.isEnabledFor(logging.DEBUG):
+            tokens = _trace_tokens(tokens, self.logger)
+
+        # After finding a '{', '}', ':' or ';' in the column c, the legacy
+        # engine advances to the column 2 * c + 1, skipping what is in
+        # between. The lines are handed to it unless only spaces are skipped
+        for kind, value, index, column, end, line in tokens:
+            # Skip whitespaces or comments
+            if kind == 'space' or kind == 'comment':
+                # Search for the special release marker comment, which should
+                # follow the release name
+                if kind == 'comment' and state == 1 and index == name_line:
+                    if _RELEASED_REGEX.match(value):
+                        r.released = True
+                last = (index, end, line)
+                continue
+            # Searching for a release name
+            if state == 0:
+                if kind != 'word':
+                    raise _NeedsLegacy()
+                # New release found
+                # Check if a release with this name is present
+                has_duplicate = releases.find(value)
+
+                r = Release()
+                r.name = _intern(value)
+                r.line = index + 1
+                releases.append(r)
+                last = (index, end, line)
+
+                if has_duplicate:
+                    msg = "Duplicated Release identifier \'{}\'"\
+                          .format(value)
+                    # This is non-critical, only warning
+                    warnings.append(ParserError(self.filename, line, index,
+                                                end, msg))
+
+                name_line = index
+                state = 1
+            # Searching for the '{'
+            elif state == 1:
+                if value != '{' or line[column + 1:2 * column + 1].strip():
+                    raise _NeedsLegacy()
+                v = None
+                scope = None
+                last = (index, end, line)
+                state = 2
+            # Searching for an identifier or the '}'
+            elif state == 2:
+                if value == '}':
+                    if line[column + 1:2 * column + 1].strip():
+                        raise _NeedsLegacy()
+                    last = (index, end, line)
+                    state = 4
+                elif kind == 'word' and value == 'extern':
+                    # Language block found
+                    if v is None:
+                        # There was no open visibility scope
+                        v = []
+                        scope = 'global'
+                        r.symbols[scope] = v
+                        msg = "Missing visibility scope before"\
+                              " \'extern\'. Symbols considered in"\
+                              " 'global:\'"
+                        # Non-critical, only warning
+                        warnings.append(ParserError(self.filename, line,
+                                                    index, 0, msg))
+                    last = (index, end, line)
+                    state = 6
+                elif kind == 'word' or kind == 'wildcard' or \
+                        kind == 'pattern':
+                    # The legacy engine looks for the '}' in the whole line
+                    # first, and takes patterns like 'extern*' as the start
+                    # of a language block
+                    if line.find('}', column) >= 0 or \
+                            (value.startswith('extern') and
+                             _EXTERN_REGEX.match(value)):
+                        raise _NeedsLegacy()
+                    # The legacy engine stores the beginning of the line
+                    last = (index, 0, line)
+                    identifier = _intern(value)
+                    state = 3
+                else:
+                    raise _NeedsLegacy()
+            # Searching for the ';' or ':'
+            elif state == 3:
+                if line[column + 1:2 * column + 1].strip():
+                    raise _NeedsLegacy()
+                if value == ';':
+                    if v is None:
+                        # There was no open visibility scope
+                        v = []
+                        scope = 'global'
+                        r.symbols[scope] = v
+                        msg = "Missing visibility scope before"\
+                              " \'{0}\'. Symbols considered in"\
+                              " 'global:\'".format(identifier)
+                        # Non-critical, only warning
+                        warnings.append(ParserError(self.filename, last[2],
+                                                    last[0], last[1], msg))
+                    # Symbol found
+                    v.append(identifier)
+                    last = (index, end, line)
+                    state = 2
+                # The legacy engine looks for the ';' in the whole line
+                elif value == ':' and line.find(';', column) < 0:
+                    # New visibility found
+                    scope = identifier
+                    if identifier in r.symbols:
+                        v = r.symbols[identifier]
+                    else:
+                        v = []
+                        r.symbols[identifier] = v
+                    last = (index, end, line)
+                    state = 2
+                else:
+                    raise _NeedsLegacy()
+            # Searching for the previous release name or ';'
+            elif state == 4:
+                if value == ';':
+                    if line[column + 1:2 * column + 1].strip():
+                        raise _NeedsLegacy()
+                    last = (index, end, line)
+                    state = 0
+                    if replay is not None:
+                        release_closed(index, column)
+                elif kind == 'word':
+                    identifier = _intern(value)
+                    last = (index, end, line)
+                    state = 5
+                else:
+                    raise _NeedsLegacy()
+            # Searching for the ';' after the previous release name
+            elif state == 5:
+                if value != ';' or line[column + 1:2 * column + 1].strip():
+                    raise _NeedsLegacy()
+                r.previous = identifier
+                last = (index, end, line)
+                state = 0
+                if replay is not None:
+                    release_closed(index, column)
+            # Searching for the language of the block
+            elif state == 6:
+                if kind != 'string':
+                    raise _NeedsLegacy()
+                block = (scope, _intern(value[1:-1]))
+                last = (index, end, line)
+                state = 7
+            # Searching for the '{' of the language block
+            elif state == 7:
+                if value != '{':
+                    raise _NeedsLegacy()
+                r.extern.setdefault(block[0], {}).setdefault(block[1], [])
+                parts = []
+                joined = None
+                last = (index, end, line)
+                state = 8
+            # Searching for the parts of a symbol, ';' or '}'
+            elif state == 8:
+                if value == ';' or value == '}':
+                    if parts:
+                        symbol = ' '.join(parts)
+                        r.extern[block[0]][block[1]].append(_intern(symbol))
+                        parts = []
+                    elif value == ';':
+                        raise _NeedsLegacy()
+                    if value == '}':
+                        state = 9
+                elif kind == 'string':
+                    parts.append(value)
+                    joined = None
+                # The legacy engine takes the strings and the text between
+                # whitespaces, comments and strings as the parts of a symbol,
+                # and joins them with a single space
+                elif value == '"' or (kind == 'pattern' and
+                                      ('}' in value or '"' in value or
+                                       '#' in value)):
+                    raise _NeedsLegacy()
+                else:
+                    if joined == (index, column):
+                        parts[-1] += value
+                    else:
+                        parts.append(value)
+                    joined = (index, end)
+                last = (index, end, line)
+            # Searching for the ';' after the language block
+            elif state == 9:
+                if value != ';':
+                    raise _NeedsLegacy()
+                last = (index, end, line)
+                state = 2
+
+        for warning in warnings:
+            self.logger.warning(warning)
+
+        # Store the parsed releases
+        self.releases = releases
+        return state
+
+    def _parse_changes(self, lines, base):
+        """
+        Parse the lines of a version of the file read by another map, parsing
+        only the changed lines
+
+        The releases found in the lines shared with the beginning and the end
+        of the other file are copied from the other map, and only the lines
+        between them are parsed. This makes reading the versions of a map
+        cheap (e.g. when merging).
+
+        :param lines: The lines of the file
+        :param base:  The map read from the other version of the file
+        :returns:     True if the lines were parsed; False if the lines have to
+                      be parsed entirely (e.g. when the releases in the other
+                      file do not start in their own lines)
+        """
+
+        if self.parser == "legacy":
+            return False
+
+        base_lines = base.lines
+        base_releases = list(base.releases)
+        if not base_lines:
+            return False
+
+        # The lines where the releases start, which must start with the name
+        starts = []
+        for r in base_releases:
+            if r.line is None:
+                return False
+            index = r.line - 1
+            if (starts and index <= starts[-1]) or \
+                    index >= len(base_lines) or \
+                    not base_lines[index].lstrip().startswith(r.name):
+                return False
+            starts.append(index)
+        ends = starts[1:] + [len(base_lines)]
+
+        # The number of lines shared with the beginning and the end
+        limit = min(len(lines), len(base_lines))
+        prefix = next(compress(count(), map(ne, lines, base_lines)), limit)
+        suffix = next(compress(count(), map(ne, reversed(lines),
+                                            reversed(base_lines))), limit)
+        suffix = min(suffix, limit - prefix)
+
+        # The releases kept from the beginning and from the end
+        first = 0
+        while first < len(starts) and ends[first] <= prefix:
+            first += 1
+        last = len(starts)
+        while last > first and starts[last - 1] >= len(base_lines) - suffix:
+            last -= 1
+
+        shift = len(lines) - len(base_lines)
+        begin = ends[first - 1] if first else 0
+        end = starts[last] + shift if last < len(starts) else len(lines)
+
+        self.logger.debug("Parsing the lines %d to %d of \'%s\'", begin + 1,
+                          end, self.filename)
+
+        # The releases must be closed before the lines kept from the end
+        try:
+            if self._parse_fast(lines, begin, end) != 0:
+                return False
+        except _NeedsLegacy:
+            return False
+
+        releases = [r.copy() for r in base_releases[:first]]
+        releases.extend(self.releases)
+        for r in base_releases[last:]:
+            copy = r.copy()
+            copy.line = r.line + shift
+            releases.append(copy)
+        self.releases = releases
+        return True
+
+    def _parse_legacy(self, lines, start=0, column=0, releases=None):
+        """
+        The legacy parser engine
+
+        The parser starts searching for a release name in the given column of
+        the first line.
+
+        :param lines:    The lines of a version script file
+        :param start:    The index of the first line given
+        :param column:   The column where to start parsing the first line
+        :param releases: The list of releases parsed before the lines, or
+                         None
+        """
+
+        # This engine needs random access to the lines
+        if not isinstance(lines, list):
+            lines = list(lines)
+
+        # Check once if the transitions should be traced, as it is costly to
+        # call the logger for each transition even if the messages are
+        # discarded
+        trace = self.logger.isEnabledFor(logging.DEBUG)
+
+        state = 0
 
-        for index, line in enumerate(lines):
-            column = 0
+        # The list of releases parsed
+        if releases is None:
+            releases = []
+        last = (start, column)
+
+        scope = None
+        # The language block being parsed and the parts of the current symbol
+        block = None
+        parts = []
+
+        skip = column
+        for index, line in enumerate(lines, start):
+            column, skip = skip, 0
             while column < len(line):
                 try:
                     # Remove whitespaces or comments
@@ -229,11 +1089,12 @@ class Map(object):
                         continue
                     # Searching for a release name
                     if state == 0:
-                        self.logger.debug(">>Name")
+                        if trace:
+                            self.logger.debug(">>Name")
                         m = re.match(r'\w+', line[column:])
                         if m is None:
                             raise ParserError(self.filename,
-                                              lines[last[0]], last[0],
+                                              lines[last[0] - start], last[0],
                                               last[1],
                                               "Invalid Release identifier")
                         else:
@@ -244,7 +1105,8 @@ class Map(object):
                                              release.name == name]
                             column += m.end()
                             r = Release()
-                            r.name = m.group(0)
+                            r.name = _intern(m.group(0))
+                            r.line = index + 1
                             releases.append(r)
                             last = (index, column)
 
@@ -253,7 +1115,7 @@ class Map(object):
                                       .format(name)
                                 # This is non-critical, only warning
                                 self.logger.warning(ParserError(self.filename,
-                                                                lines[index],
+                                                                lines[index - start],
                                                                 index,
                                                                 column, msg))
 
@@ -271,42 +1133,68 @@ class Map(object):
                             continue
                     # Searching for the '{'
                     elif state == 1:
-                        self.logger.debug(">>Opening")
+                        if trace:
+                            self.logger.debug(">>Opening")
                         found = line.find('{', column)
                         if found < 0:
                             raise ParserError(self.filename,
-                                              lines[last[0]], last[0], last[1],
+                                              lines[last[0] - start], last[0], last[1],
                                               "Missing \'{\'")
                         else:
                             column += (found + 1)
                             v = None
+                            scope = None
                             last = (index, column)
                             state += 1
                             continue
                     elif state == 2:
-                        self.logger.debug(">>Element")
+                        if trace:
+                            self.logger.debug(">>Element")
+                        m = _EXTERN_REGEX.match(line, column)
+                        if m is not None:
+                            if trace:
+                                self.logger.debug(">>Language block")
+                            if v is None:
+                                # There was no open visibility scope
+                                v = []
+                                scope = 'global'
+                                r.symbols[scope] = v
+                                msg = "Missing visibility scope before"\
+                                      " \'extern\'. Symbols considered in"\
+                                      " 'global:\'"
+                                # Non-critical, only warning
+                                self.logger.warning(ParserError(self.filename,
+                                                                lines[index - start],
+                                                                index, 0,
+                                                                msg))
+                            column = m.end()
+                            last = (index, column)
+                            state = 6
+                            continue
                         found = line.find('}', column)
                         if found >= 0:
-                            self.logger.debug(">>Closer, jump to Previous")
+                            if trace:
+                                self.logger.debug(">>Closer, jump to Previous")
                             column += (found + 1)
                             last = (index, column)
                             state = 4
                             continue
-                        m = re.match(r'\w+|\*', line[column:])
+                        m = _IDENTIFIER_REGEX.match(line[column:])
                         if m is None:
                             raise ParserError(self.filename,
-                                              lines[last[0]], last[0], last[1],
+                                              lines[last[0] - start], last[0], last[1],
                                               "Invalid identifier")
                         else:
                             # In this case the position before the
                             # identifier is stored
                             last = (index, m.start())
                             column += m.end()
-                            identifier = m.group(0)
+                            identifier = _intern(m.group(0))
                             state += 1
                             continue
                     elif state == 3:
-                        self.logger.debug(">>Element closer")
+                        if trace:
+                            self.logger.debug(">>Element closer")
                         found = line.find(';', column)
                         if found < 0:
                             # It was not Symbol. Maybe a new visibility.
@@ -316,10 +1204,11 @@ class Map(object):
                                       .format(identifier)
                                 # In this case the current position is used
                                 raise ParserError(self.filename,
-                                                  lines[index], index,
+                                                  lines[index - start], index,
                                                   column, msg)
                             else:
                                 # New visibility found
+                                scope = identifier
                                 if identifier in r.symbols:
                                     v = r.symbols[identifier]
                                 else:
@@ -333,13 +1222,14 @@ class Map(object):
                             if v is None:
                                 # There was no open visibility scope
                                 v = []
-                                r.symbols['global'] = v
+                                scope = 'global'
+                                r.symbols[scope] = v
                                 msg = "Missing visibility scope before"\
                                       " \'{0}\'. Symbols considered in"\
                                       " 'global:\'".format(identifier)
                                 # Non-critical, only warning
                                 self.logger.warning(ParserError(self.filename,
-                                                                lines[last[0]],
+                                                                lines[last[0] - start],
                                                                 last[0], last[1],
                                                                 msg))
                             else:
@@ -355,13 +1245,15 @@ class Map(object):
                                   .format(identifier)
                             # In this case the current position is used
                             raise ParserError(self.filename,
-                                              lines[index], index,
+                                              lines[index - start], index,
                                               column, msg)
                     elif state == 4:
-                        self.logger.debug(">>Previous")
+                        if trace:
+                            self.logger.debug(">>Previous")
                         found = line.find(";", column)
                         if found == column:
-                            self.logger.debug(">>Empty previous")
+                            if trace:
+                                self.logger.debug(">>Empty previous")
                             column += (found + 1)
                             last = (index, column)
                             # Move back the state to find other releases
@@ -370,21 +1262,22 @@ class Map(object):
                         m = re.match(r'\w+', line[column:])
                         if m is None:
                             raise ParserError(self.filename,
-                                              lines[last[0]], last[0], last[1],
+                                              lines[last[0] - start], last[0], last[1],
                                               "Invalid identifier")
                         else:
                             # Found previous release identifier
                             column += m.end()
-                            identifier = m.group(0)
+                            identifier = _intern(m.group(0))
                             last = (index, column)
                             state += 1
                             continue
                     elif state == 5:
-                        self.logger.debug(">>Previous closer")
+                        if trace:
+                            self.logger.debug(">>Previous closer")
                         found = line.find(";", column)
                         if found < 0:
                             raise ParserError(self.filename,
-                                              lines[last[0]], last[0], last[1],
+                                              lines[last[0] - start], last[0], last[1],
                                               "Missing \';\'")
                         elif found == column:
                             # Found previous closer
@@ -396,9 +1289,79 @@ class Map(object):
                             continue
                         else:
                             raise ParserError(self.filename,
-                                              lines[index], index,
+                                              lines[index - start], index,
                                               column,
                                               "Unexpected character")
+                    elif state == 6:
+                        if trace:
+                            self.logger.debug(">>Language")
+                        m = re.match(r'"([^"\n]*)"', line[column:])
+                        if m is None:
+                            raise ParserError(self.filename,
+                                              lines[last[0] - start], last[0], last[1],
+                                              "Invalid language")
+                        block = (scope, _intern(m.group(1)))
+                        column += m.end()
+                        last = (index, column)
+                        state = 7
+                        continue
+                    elif state == 7:
+                        if trace:
+                            self.logger.debug(">>Language opening")
+                        if line[column] != '{':
+                            raise ParserError(self.filename,
+                                              lines[last[0] - start], last[0], last[1],
+                                              "Missing \'{\'")
+                        parts = []
+                        r.extern.setdefault(block[0], {})\
+                            .setdefault(block[1], [])
+                        column += 1
+                        last = (index, column)
+                        state = 8
+                        continue
+                    elif state == 8:
+                        if trace:
+                            self.logger.debug(">>Language element")
+                        if line[column] == ';' or line[column] == '}':
+                            if parts:
+                                symbol = ' '.join(parts)
+                                r.extern[block[0]][block[1]].append(
+                                    _intern(symbol))
+                                parts = []
+                            elif line[column] == ';':
+                                raise ParserError(self.filename,
+                                                  lines[index - start], index,
+                                                  column,
+                                                  "Invalid identifier")
+                            if line[column] == '}':
+                                state = 9
+                            column += 1
+                            last = (index, column)
+                            continue
+                        m = _EXTERN_SYMBOL_REGEX.match(line, column)
+                        if m is None:
+                            raise ParserError(self.filename,
+                                              lines[index - start], index, column,
+                                              "Invalid identifier")
+                        # The whitespaces outside of strings are replaced by
+                        # a single space
+                        parts.append(''.join(
+                            ' ' if part[0].isspace() else part for part in
+                            _EXTERN_PART_REGEX.findall(m.group(0))))
+                        column = m.end()
+                        last = (index, column)
+                        continue
+                    elif state == 9:
+                        if trace:
+                            self.logger.debug(">>Language closer")
+                        if line[column] != ';':
+                            raise ParserError(self.filename,
+                                              lines[last[0] - start], last[0], last[1],
+                                              "Missing \';\'")
+                        column += 1
+                        last = (index, column)
+                        state = 2
+                        continue
 
                 except ParserError as e:
                     # Any exception raised is considered an error
@@ -407,23 +1370,220 @@ class Map(object):
         # Store the parsed releases
         self.releases = releases
 
-    def read(self, filename):
+    def read(self, filename, stream=True, log=True, base=None):
         """
         Read a linker map file (version script) and store the obtained releases
 
         Obtain the lines of the file and calls ``parse()`` to parse the file
 
+        In streaming mode, the file is parsed while it is read and its lines
+        are not kept in memory. The ``lines`` are loaded again from the file
+        only if requested.
+
+        If the file is a version of the file read by ``base``, only the lines
+        changed are parsed (see ``_parse_changes()``). The lines of the file
+        are then kept in memory.
+
         :param filename:        The path to the file to be read
+        :param stream:          Parse the file without keeping its lines
+        :param log:             Log the diagnostics found when checking the
+                                map (see ``check()``)
+        :param base:            A map read from another version of the file
         :raises ParserError:    Raised when a syntax error is found in the file
         """
 
-        with open(filename, "r") as f:
-            self.lines = f.readlines()
-
         self.filename = filename
-        self.parse(self.lines)
+        self._lines = None
+
+        digest = None
+        if self.cache_dir:
+            digest = self._cache_digest(filename)
+            if self._load_cache(digest, log):
+                return
+
+        # Keep the messages logged while parsing to store in the cache
+        collector = _RecordCollector()
+        self.logger.addHandler(collector)
+        try:
+            if base is not None:
+                with open(filename, "r") as f:
+                    self._lines = f.readlines()
+                if not self._parse_changes(self._lines, base):
+                    self.parse(self._lines)
+            elif stream and self.parser != "legacy":
+                with open(filename, "r") as f:
+                    self.parse(f)
+            else:
+                with open(filename, "r") as f:
+                    self._lines = f.readlines()
+                self.parse(self._lines)
+        finally:
+            self.logger.removeHandler(collector)
+
         # Check the map read
-        self.check()
+        self.check(log=log)
+
+        if digest:
+            self._store_cache(digest, collector.records)
+
+    def _cache_digest(self, filename):
+        """
+        Compute the key used to store the file in the cache
+
+        The key is a hash of the file content, the program version, the cache
+        format version, the parser engine, and the path to the file (which is
+        part of the cached messages).
+
+        :param filename: The path to the file
+        :returns:        A string containing the hexadecimal hash
+        """
+
+        import hashlib
+
+        h = hashlib.sha256()
+        key = "{0}:{1}:{2}:{3}:".format(__version__, CACHE_FORMAT_VERSION,
+                                        self.parser, filename)
+        if not isinstance(key, bytes):
+            key = key.encode("utf-8")
+        h.update(key)
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(65536), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, digest + ".cache")
+
+    def _load_cache(self, digest, log=True):
+        """
+        Load the releases from the cache, replacing the parsing and checking
+
+        The messages logged when the file was parsed are logged again, as well
+        as the diagnostics found when it was checked. If the messages were
+        stored with a higher level than the current logger level, the cached
+        data is not used.
+
+        :param digest: The key of the cached file
+        :param log:    Log the diagnostics
+        :returns:      True if the releases were loaded; False otherwise
+        """
+
+        import json
+        import zlib
+
+        path = self._cache_path(digest)
+        if not os.path.isfile(path):
+            return False
+
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            level = data["level"]
+            stored = data["releases"]
+            dependencies = data["dependencies"]
+            records = data["records"]
+            diagnostics = [Diagnostic(*d) for d in data["diagnostics"]]
+        except Exception as e:
+            self.logger.debug("Could not load cached \'%s\': %s", path, e)
+            return False
+
+        if self.logger.getEffectiveLevel() < level:
+            return False
+
+        self.logger.debug("Using cached \'%s\'", path)
+
+        releases = []
+        for name, previous, released, line, symbols, extern in stored:
+            r = Release()
+            r.name = _intern(name)
+            r.previous = _intern(previous)
+            r.released = released
+            r.line = line
+            for scope, scope_symbols in symbols:
+                r.symbols[_intern(scope)] = tuple([_intern(symbol) for symbol
+                                                   in scope_symbols])
+            for scope, language, scope_symbols in extern:
+                r.extern.setdefault(_intern(scope), {})[_intern(language)] = \
+                    tuple([_intern(symbol) for symbol in scope_symbols])
+            releases.append(r)
+        self.releases = releases
+
+        # Reuse the dependencies solved when the map was checked
+        self._graph = (self.releases, self.releases.version,
+                       DependencyGraph(dependencies))
+
+        for level, message in records:
+            self.logger.log(level, "%s", message)
+
+        # The map was checked when it was stored
+        self.diagnostics = diagnostics
+        if log:
+            log_diagnostics(self.logger, diagnostics)
+        self._restore_release_diagnostics()
+        self.init = True
+        return True
+
+    def _restore_release_diagnostics(self):
+        """
+        Restore the diagnostics of each release from ``diagnostics``, as if
+        the releases were checked, so that the next incremental check reuses
+        them
+
+        Nothing is restored if more than one release have the same name.
+        """
+
+        releases = self.releases
+        by_name = dict((release.name, (release, [], []))
+                       for release in releases)
+        if len(by_name) != len(releases):
+            return
+
+        for d in self.diagnostics:
+            if d.code in _RELEASE_CODES:
+                by_name[d.release][1 + _RELEASE_CODES[d.code]].append(d)
+
+        self._release_diagnostics = dict((id(found[0]), found) for found in
+                                         by_name.values())
+        self._checked = releases
+        releases.clear_changes()
+
+    def _store_cache(self, digest, records):
+        """
+        Store the releases, the messages logged, and the diagnostics in the
+        cache
+
+        Errors are not fatal: the cache is simply not updated.
+
+        :param digest:  The key of the cached file
+        :param records: A list of the logged messages as (level, message)
+        """
+
+        import json
+        import tempfile
+        import zlib
+
+        data = {"level": self.logger.getEffectiveLevel(),
+                "releases": [(r.name, r.previous, r.released, r.line,
+                              [(scope, symbols) for scope, symbols in
+                               r.symbols.items()],
+                              [(scope, language, symbols) for scope, languages
+                               in r.extern.items() for language, symbols in
+                               languages.items()])
+                             for r in self.releases],
+                "dependencies": self.graph.dependencies,
+                "records": records,
+                "diagnostics": [d.as_tuple() for d in self.diagnostics]}
+
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            content = zlib.compress(json.dumps(data).encode("utf-8"))
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.rename(tmp, self._cache_path(digest))
+        except Exception as e:
+            self.logger.debug("Could not store in the cache: %s", e)
 
     def all_global_symbols(self):
         """
@@ -438,45 +1598,216 @@ class Map(object):
             self.logger.error(msg)
             raise Exception(msg)
 
-        symbols = []
-        for release in self.releases:
-            if 'global' in release.symbols:
-                symbols.extend(release.symbols['global'])
-        return set(symbols)
+        return self.releases.global_symbols()
 
-    def duplicates(self):
+    def find_symbol(self, symbol):
         """
-        Find and return a list of duplicated symbols for each release
+        Find the releases and scopes containing a symbol
 
-        If no duplicates are found, return an empty list
+        The symbols are indexed on the first search, and the index is kept up
+        to date as releases and symbols are added or removed, so the
+        following searches take constant time.
 
-        :returns: A list of tuples [(release, [(scope, [duplicates])])]
+        :param symbol: The symbol name
+        :returns:      A list of tuples (release name, scope), empty if the
+                       symbol is not in the map
         """
 
-        duplicates = []
-        for release in self.releases:
-            rel_dup = release.duplicates()
-            if rel_dup:
-                duplicates.append((release.name, rel_dup))
-        return duplicates
+        return [(release.name, scope) for release, scope in
+                self.releases.find_symbol(symbol)]
 
-    def dependencies(self):
+    def introduced_in(self, symbol):
         """
-        Construct the dependencies lists
+        Find the release which introduced a global symbol
 
-        Contruct a list of dependency lists. Each dependency list contain the
-        names of the releases in a dependency path.
-        The heads of the dependencies lists are the releases not refered as a
-        previous release in any release.
+        If the symbol is in the global scope of more than one release, the
+        oldest one (the one with the shortest dependency path) is returned.
 
-        :returns:   A list containing the dependencies lists
+        :param symbol:     The symbol name
+        :returns:          The name of the release, or ``None`` if the symbol
+                           is not in the global scope of any release
+        :raises Exception: Raised when the dependencies cannot be solved (see
+                           ``dependencies()``)
         """
 
-        def get_dependency(releases, head):
-            found = [release for release in releases if release.name == head]
-            if not found:
-                msg = "Release \'{0}\' not found".format(head)
-                self.logger.error(msg)
+        names = [release.name for release, scope in
+                 self.releases.find_symbol(symbol) if scope == 'global']
+        if len(names) < 2:
+            return names[0] if names else None
+
+        graph = self.graph
+        return min(names, key=lambda name: len(graph.chain(name)))
+
+    def _matchers(self):
+        """
+        Get the matchers of the symbols of the releases, building them if
+        needed
+
+        :returns: A tuple (matcher, cxx_matcher)
+        """
+
+        releases = self.releases
+        state = (releases.version, releases.symbols_version)
+        cached = self._matcher
+        if cached is None or cached[0] is not releases or cached[1] != state:
+            groups = []
+            wildcards = []
+            cxx_groups = []
+            for release in releases:
+                scopes = release.symbols.keys()
+                if release.extern:
+                    scopes = set(scopes).union(release.extern)
+                for scope in scopes:
+                    key = (release.name, scope)
+                    symbols = release.symbols.get(scope, ())
+                    languages = release.extern.get(scope, {})
+                    groups.append((key, [symbol for symbol in
+                                         chain(symbols, languages.get("C", ()))
+                                         if symbol != "*"]))
+                    if "*" in symbols:
+                        wildcards.append((key, ["*"]))
+                    if "C++" in languages:
+                        cxx_groups.append((key, languages["C++"]))
+            cxx_matcher = SymbolMatcher(cxx_groups) if cxx_groups else None
+            self._matcher = (releases, state,
+                             SymbolMatcher(groups + wildcards), cxx_matcher)
+        return self._matcher[2:]
+
+    @property
+    def matcher(self):
+        """
+        The matcher of the symbols and glob patterns of the releases
+
+        A ``SymbolMatcher`` whose keys are tuples (release name, scope). As in
+        the linker, a symbol listed by name matches before any pattern, and
+        the ``*`` wildcard matches only if no other pattern matches. Otherwise,
+        the first pattern found in the order of the releases in the map
+        matches. The symbols in ``extern "C"`` blocks are included.
+
+        The matcher is kept until the releases or their symbols are changed.
+        """
+
+        return self._matchers()[0]
+
+    @property
+    def cxx_matcher(self):
+        """
+        The matcher of the symbols in the ``extern "C++"`` blocks
+
+        A ``SymbolMatcher`` as ``matcher``, to be used with demangled names, or
+        ``None`` if the map has no ``extern "C++"`` blocks.
+        """
+
+        return self._matchers()[1]
+
+    def match_symbols(self, symbols):
+        """
+        Find the releases and scopes matching the given symbols
+
+        The symbols are compared with the names and glob patterns in all the
+        scopes of all the releases (see ``matcher``).
+
+        If the map has ``extern "C++"`` blocks, the mangled symbols are
+        demangled (see ``demangle.demangle()``) and compared with the symbols
+        in the blocks (see ``cxx_matcher``), after the names but before the
+        glob patterns of the other symbols. All the symbols are demangled at
+        once and the demangled names are cached.
+
+        :param symbols: An iterable of symbol names (as in the ``.dynsym``
+                        section)
+        :returns:       A generator of tuples (symbol, release name, scope),
+                        where release name and scope are ``None`` if the
+                        symbol is not matched
+        :raises demangle.DemangleError: Raised if the symbols cannot be
+                                        demangled
+        """
+
+        matcher, cxx_matcher = self._matchers()
+
+        demangled = {}
+        if cxx_matcher is not None:
+            from .demangle import demangle
+            from .demangle import is_mangled
+
+            symbols = list(symbols)
+            mangled = [symbol for symbol in symbols if is_mangled(symbol)]
+            demangled = dict(zip(mangled, demangle(mangled)))
+
+        match_name = matcher.match_name
+        match_pattern = matcher.match_pattern
+        for symbol in symbols:
+            key = match_name(symbol)
+            if key is None and symbol in demangled:
+                key = cxx_matcher.match(demangled[symbol])
+            if key is None:
+                key = match_pattern(symbol)
+            if key is None:
+                yield (symbol, None, None)
+            else:
+                yield (symbol, key[0], key[1])
+
+    def exported_by(self, symbol):
+        """
+        Find the release exporting a symbol
+
+        :param symbol: The symbol name
+        :returns:      The name of the release, or ``None`` if the symbol is
+                       not matched by the global scope of any release
+        """
+
+        for _, release, scope in self.match_symbols([symbol]):
+            if scope == 'global':
+                return release
+        return None
+
+    def duplicates(self):
+        """
+        Find and return a list of duplicated symbols for each release
+
+        If no duplicates are found, return an empty list
+
+        :returns: A list of tuples [(release, [(scope, [duplicates])])]
+        """
+
+        duplicates = []
+        for release in self.releases:
+            rel_dup = release.duplicates()
+            if rel_dup:
+                duplicates.append((release.name, rel_dup))
+        return duplicates
+
+    def dependencies(self):
+        """
+        Construct the dependencies lists
+
+        Contruct a list of dependency lists. Each dependency list contain the
+        names of the releases in a dependency path.
+        The heads of the dependencies lists are the releases not refered as a
+        previous release in any release.
+
+        The lists are obtained from ``graph``, so they are computed only once
+        while the releases are not changed.
+
+        :returns:   A list containing the dependencies lists
+        """
+
+        return [list(dep) for dep in self.graph.dependencies]
+
+    def _solve_dependencies(self):
+        """
+        Solve the dependencies of the releases, constructing the dependencies
+        lists returned by ``dependencies()``
+
+        :returns:   A list containing the dependencies lists
+        """
+
+        releases = self.releases
+
+        def get_dependency(head):
+            found = releases.find(head)
+            if not found:
+                msg = "Release \'{0}\' not found".format(head)
+                self.logger.error(msg)
                 raise Exception(msg)
             if len(found) > 1:
                 msg = "defined more than 1 release \'{0}\'".format(head)
@@ -484,19 +1815,38 @@ class Map(object):
                 raise Exception(msg)
             return found[0].previous
 
-        solved = set()
+        # Maps the solved release names to their position in a dependency list
+        solved = {}
+        # The releases found as a previous release (i.e. not heads)
+        referenced = set()
         deps = []
-        for release in self.releases:
+        # The heads are solved first, so that the path of each head is built
+        # only once. Otherwise, if the older releases come first, a list would
+        # be built for each release, copying the path of its previous release.
+        # The remaining releases are solved to detect circular dependencies
+        heads = set(releases.heads())
+        for release in chain([release for release in releases
+                              if release.name in heads], releases):
             # If the dependencies of the current release were resolved, skip
             if release.name in solved:
                 continue
             else:
                 current = [release.name]
+                seen = set(current)
                 dep = release.previous
                 # Construct the current release dependency list
                 while dep:
+                    # If the dependency was already solved, reuse its list.
+                    # The head of a solved list was not checked as a
+                    # dependency, so check it now
+                    if dep in solved:
+                        referenced.add(dep)
+                        get_dependency(dep)
+                        solved_deps, position = solved[dep]
+                        current.extend(solved_deps[position:])
+                        break
                     # If the found dependency was already in the list
-                    if dep in current:
+                    if dep in seen:
                         msg = ("Circular dependency detected!\n"
                                "    {0}".format("->".join(chain(current,
                                                                 [dep]))))
@@ -504,22 +1854,72 @@ class Map(object):
                         raise Exception(msg)
                     # Append the dependency to the current list
                     current.append(dep)
-
-                    # Remove the releases that are not heads from the list
-                    if dep in solved:
-                        deps = [i for i in deps if i[0] != dep]
-                    else:
-                        solved.add(dep)
-                    dep = get_dependency(self.releases, dep)
-                solved.add(release.name)
+                    seen.add(dep)
+                    referenced.add(dep)
+                    dep = get_dependency(dep)
+                for position, name in enumerate(current):
+                    if name not in solved:
+                        solved[name] = (current, position)
                 deps.append(current)
-        return deps
 
-    def check(self):
+        # Remove the lists whose heads are previous releases of other releases
+        return [dep for dep in deps if dep[0] not in referenced]
+
+    def check(self, log=True, incremental=False, jobs=1):
         """
         Check the map structure.
 
-        Reports errors found in the structure of the map in form of warnings.
+        The problems found in the structure of the map are returned as a list
+        of ``Diagnostic``, in the following order:
+
+            - ``duplicate-symbol``: A symbol appears more than once in a scope
+              of a release (a warning for each duplicate)
+            - ``symbol-in-multiple-releases``: A symbol appears in more than
+              one release or scope (a warning for each release and scope)
+            - ``local-wildcard`` (info): A release contains the local ``*``
+              wildcard
+            - ``local-wildcard-not-base``: A release contains the local ``*``
+              wildcard, but has a previous release
+            - ``base-version`` (info): A release seems to be the base version
+            - ``global-wildcard``: A release contains the ``*`` wildcard in
+              the global scope
+            - ``unknown-scope``: A release contains a scope different from
+              ``global`` and ``local``
+            - ``multiple-wildcards``: The ``*`` wildcard was found in more
+              than one place (a warning for each place)
+            - ``missing-wildcard``: The ``*`` wildcard was not found
+            - ``multiple-base-versions``: More than one release seem to be the
+              base version (a warning for each release)
+            - ``missing-base-version``: No base version release was found
+            - ``dependencies`` (info): A dependency list, with the names of the
+              releases separated by ``->`` in the message
+
+        The diagnostics are also stored in ``diagnostics``.
+
+        In incremental mode, only the releases added or changed since the last
+        check (see ``ReleaseList.changes()``) are checked again, and the
+        diagnostics found for the other releases are reused. The dependencies
+        of the releases appended to the map are added to the dependency graph
+        of the last check, instead of solving all the dependencies again. If
+        the map was not checked or the list of releases was replaced, the
+        whole map is checked.
+
+        If more than one job is allowed, the releases of each dependency chain
+        (see ``dependencies()``) are checked in parallel by a pool of
+        processes (see ``run_batch()``). The diagnostics are the same, in the
+        same order, as when checked serially. This is not a speedup: checking
+        the symbols of a release costs less than sending them to another
+        process, so the parallel check is slower than the serial one (compare
+        the ``check`` and ``check_parallel`` benchmarks). The releases are
+        checked serially by default.
+
+        :param log:         Log the diagnostics (see ``log_diagnostics()``)
+        :param incremental: Check only the releases changed since the last
+                            check
+        :param jobs:        The maximum number of processes used to check the
+                            releases (1, the default, checks them serially).
+                            If 0 or None, the number of processors is used
+        :returns:           A list of ``Diagnostic``
         """
 
         if not self.releases:
@@ -527,100 +1927,322 @@ class Map(object):
             self.logger.error(msg)
             raise Exception(msg)
 
+        filename = self.filename or None
+        releases = self.releases
+
+        # Reuse the diagnostics of the releases not changed since the last
+        # check, if the list of releases is the same
+        changed = None
+        cached = {}
+        if incremental and self._checked is releases:
+            changed = set(id(release) for release in releases.changes()[0])
+            cached = self._release_diagnostics
+
+        to_check = [release for release in releases if
+                    id(release) not in cached or id(release) in changed]
+
+        checked = None
+        if jobs != 1 and len(to_check) > 1:
+            checked = self._check_chains(to_check, filename, jobs)
+
+        by_release = {}
+        for release in releases:
+            key = id(release)
+            found = cached.get(key)
+            if found is None or key in changed:
+                if checked is not None:
+                    found = (release,) + checked[key]
+                else:
+                    found = (release,) + self._check_release(release,
+                                                             filename)
+            by_release[key] = found
+        self._release_diagnostics = by_release
+
+        diagnostics = []
+        add = diagnostics.append
+
+        # Duplicated symbols
+        for release in releases:
+            diagnostics.extend(by_release[id(release)][1])
+
+        # Find the symbols in more than one release or scope. The wildcards
+        # are reported below
+        for symbol, places in releases.duplicated_symbols():
+            if symbol == "*":
+                continue
+            for release, scope in places:
+                add(Diagnostic("symbol-in-multiple-releases", "warning",
+                               "The symbol '{0}' was found in more than one"
+                               " release (in '{1}' of {2})"
+                               .format(symbol, scope, release.name),
+                               release.name, scope, symbol,
+                               (filename, release.line, None)))
+
+        # '*' wildcard usage and scopes
         have_wildcard = []
         seems_base = []
-
-        # Find duplicated symbols
-        d = self.duplicates()
-        if d:
-            for release, duplicates in d:
-                self.logger.warning("Duplicates found in release \'%s\':",
-                                    release)
-                for scope, symbols in duplicates:
-                    self.logger.warning("    %s:", scope)
-                    self.logger.warning("\n".join(
-                                                  (" " * 8 +
-                                                   symbol for symbol in
-                                                   symbols)))
-
-        # Check '*' wildcard usage
-        for release in self.releases:
-            for scope, symbols in release.symbols.items():
-                if scope == 'local':
-                    if symbols:
-                        if "*" in symbols:
-                            self.logger.info("%s contains the local \'*\'"
-                                             " wildcard", release.name)
-                            if release.previous:
-                                # Predecessor version and local: *; are present
-                                self.logger.warning("%s should not contain the"
-                                                    " local wildcard because"
-                                                    " it is not the base"
-                                                    " version (it refers to"
-                                                    " version %s"
-                                                    " as its predecessor)",
-                                                    release.name,
-                                                    release.previous)
-                            else:
-                                # Release seems to be base: empty predecessor
-                                msg = "{} seems to be the base version"\
-                                      .format(release.name)
-                                self.logger.info(msg)
-                                seems_base.append(release.name)
-
-                            # Append to the list of releases which contain the
-                            # wildcard '*'
-                            have_wildcard.append((release.name, scope))
-                elif scope == 'global':
-                    if symbols:
-                        if "*" in symbols:
-                            # Release contains '*' wildcard in global scope
-                            self.logger.warning("%s contains the \'*\'"
-                                                " wildcard in"
-                                                " global scope. It is probably"
-                                                " exporting symbols"
-                                                " it should not.",
-                                                release.name)
-                            have_wildcard.append((release.name, scope))
-                else:
-                    # Release contains unknown visibility scopes (not global or
-                    # local)
-                    self.logger.warning("%s contains unknown scope named %s"
-                                        " (different from \'global\' and"
-                                        " \'local\')", release.name, scope)
+        for release in releases:
+            for d in by_release[id(release)][2]:
+                if d.code == "local-wildcard" or d.code == "global-wildcard":
+                    # The releases which contain the wildcard '*'
+                    have_wildcard.append(d)
+                elif d.code == "base-version":
+                    seems_base.append(d)
+                add(d)
 
         if have_wildcard:
             if len(have_wildcard) > 1:
                 # The '*' wildcard was found in more than one place
-                self.logger.warning("The \'*\' wildcard was found in more than"
-                                    " one place:")
-                for name, scope in have_wildcard:
-                    self.logger.warning("    %s: in \'%s\'", name, scope)
+                for d in have_wildcard:
+                    add(Diagnostic("multiple-wildcards", "warning",
+                                   "The '*' wildcard was found in more than"
+                                   " one place (in '{0}' of {1})"
+                                   .format(d.scope, d.release),
+                                   d.release, d.scope, "*", d.location))
         else:
-            self.logger.warning("The \'*\' wildcard was not found")
+            add(Diagnostic("missing-wildcard", "warning",
+                           "The '*' wildcard was not found",
+                           location=(filename, None, None)))
 
         if seems_base:
             if len(seems_base) > 1:
                 # There is more than one release without predecessor and
                 # containing '*' wildcard in local scope
-                self.logger.warning("More than one release seem to be the base"
-                                    " version (contain the local wildcard and"
-                                    " do not have a predecessor version):")
-                for name in seems_base:
-                    self.logger.warning("    %s", name)
+                for d in seems_base:
+                    add(Diagnostic("multiple-base-versions", "warning",
+                                   "More than one release seem to be the base"
+                                   " version (contain the local wildcard and"
+                                   " do not have a predecessor version):"
+                                   " {0}".format(d.release),
+                                   d.release, None, None, d.location))
         else:
-            self.logger.warning("No base version release found")
+            add(Diagnostic("missing-base-version", "warning",
+                           "No base version release found",
+                           location=(filename, None, None)))
+
+        # Report what was found before solving the dependencies, which can
+        # fail
+        if log:
+            log_diagnostics(self.logger, diagnostics)
 
-        dependencies = self.dependencies()
-        self.logger.info("Found dependencies:")
-        for release in dependencies:
-            content = "".join(chain(" " * 4,
-                                    (dep + "->" for dep in release)))
-            self.logger.info(content)
+        self._extend_graph()
+
+        found = len(diagnostics)
+        for release in self.graph.dependencies:
+            add(Diagnostic("dependencies", "info", "->".join(release),
+                           release[0], None, None,
+                           (filename, None, None)))
+
+        if log:
+            log_diagnostics(self.logger, diagnostics[found:])
+
+        self.diagnostics = diagnostics
+
+        # The symbols are not changed after the map is checked
+        for release in releases:
+            if changed is None or id(release) in changed:
+                release.freeze()
+
+        self._checked = releases
+        releases.clear_changes()
 
         # After calling a check, the map is considered initialized
         self.init = True
 
+        return diagnostics
+
+    def _check_chains(self, to_check, filename, jobs):
+        """
+        Check releases in parallel, grouped by dependency chain
+
+        Each release is checked with the first chain containing it, so the
+        releases shared by the chains (e.g. the base version) are checked
+        once.
+
+        :param to_check: The releases to check
+        :param filename: The file name used in the location of the
+                         diagnostics
+        :param jobs:     The maximum number of processes
+        :returns:        A dictionary mapping the ``id()`` of each release
+                         checked to a tuple as returned by
+                         ``_check_release()``, or None if the releases have a
+                         single dependency chain or the dependencies cannot be
+                         solved
+        """
+
+        try:
+            chains = self.graph.dependencies
+        except Exception:
+            # The problem is reported when the map is checked
+            return None
+        if len(chains) < 2:
+            return None
+
+        pending = dict((release.name, release) for release in to_check)
+        if len(pending) != len(to_check):
+            return None
+
+        groups = []
+        for names in chains:
+            group = [pending.pop(name) for name in names if name in pending]
+            if group:
+                groups.append(group)
+        if pending:
+            groups.append([release for release in to_check if
+                           release.name in pending])
+
+        items = [([(r.name, r.previous, r.line, r.symbols) for r in group],
+                  filename) for group in groups]
+
+        checked = {}
+        for group, results in zip(groups, run_batch(_check_chain, items,
+                                                    jobs)):
+            for release, (duplicates, scopes) in zip(group, results):
+                checked[id(release)] = ([Diagnostic(*d) for d in duplicates],
+                                        [Diagnostic(*d) for d in scopes])
+        return checked
+
+    def _check_release(self, release, filename):
+        """
+        Check the symbols and scopes of a release
+
+        :param release:  The release to check
+        :param filename: The file name used in the location of the
+                         diagnostics
+        :returns:        A tuple of two lists of ``Diagnostic``: the
+                         duplicated symbols, and the problems found in the
+                         scopes (see ``check()``)
+        """
+
+        location = (filename, release.line, None)
+
+        # Find duplicated symbols
+        duplicates = []
+        for scope, symbols in release.duplicates():
+            for symbol in symbols:
+                msg = "Duplicated symbol '{0}' in scope '{1}' of release" \
+                      " '{2}'".format(symbol, scope, release.name)
+                duplicates.append(Diagnostic("duplicate-symbol", "warning",
+                                             msg, release.name, scope, symbol,
+                                             location))
+
+        # Check '*' wildcard usage
+        scopes = []
+        add = scopes.append
+        for scope, symbols in release.symbols.items():
+            if scope == 'local':
+                if symbols:
+                    if "*" in symbols:
+                        add(Diagnostic("local-wildcard", "info",
+                                       "{0} contains the local '*'"
+                                       " wildcard".format(release.name),
+                                       release.name, scope, "*", location))
+                        if release.previous:
+                            # Predecessor version and local: *; are present
+                            add(Diagnostic("local-wildcard-not-base",
+                                           "warning",
+                                           "{0} should not contain the local"
+                                           " wildcard because it is not the"
+                                           " base version (it refers to"
+                                           " version {1} as its predecessor)"
+                                           .format(release.name,
+                                                   release.previous),
+                                           release.name, scope, "*",
+                                           location))
+                        else:
+                            # Release seems to be base: empty predecessor
+                            add(Diagnostic("base-version", "info",
+                                           "{0} seems to be the base"
+                                           " version".format(release.name),
+                                           release.name, None, None,
+                                           location))
+            elif scope == 'global':
+                if symbols:
+                    if "*" in symbols:
+                        # Release contains '*' wildcard in global scope
+                        add(Diagnostic("global-wildcard", "warning",
+                                       "{0} contains the '*' wildcard in"
+                                       " global scope. It is probably"
+                                       " exporting symbols it should not."
+                                       .format(release.name),
+                                       release.name, scope, "*", location))
+            else:
+                # Release contains unknown visibility scopes (not global or
+                # local)
+                add(Diagnostic("unknown-scope", "warning",
+                               "{0} contains unknown scope named {1}"
+                               " (different from 'global' and"
+                               " 'local')".format(release.name, scope),
+                               release.name, scope, None, location))
+
+        return (duplicates, scopes)
+
+    def _extend_graph(self):
+        """
+        Add the releases appended to the list since the graph was computed to
+        the cached dependency graph
+
+        This is done only if the releases were appended to the end of the list
+        and no release was removed or renamed (or had its previous release
+        changed) since the last call to ``ReleaseList.clear_changes()``, and
+        if the release names and the previous releases of the releases changed
+        are not ambiguous. Otherwise, the graph is recomputed as usual when
+        accessed, reporting the duplicated releases and the circular
+        dependencies.
+        """
+
+        releases = self.releases
+        cached = self._graph
+        if cached is None or cached[0] is not releases or \
+                cached[1] == releases.version:
+            return
+
+        changed, removed = releases.changes()
+        if removed:
+            return
+        if len(set(release.name for release in releases)) != len(releases):
+            return
+        for release in changed:
+            if release.previous and \
+                    len(releases.find(release.previous)) != 1:
+                return
+        graph = cached[2]
+        added = set(id(release) for release in changed
+                    if release.name not in graph)
+        if not added:
+            return
+        # The new releases should be the last ones in the list
+        tail = releases[len(releases) - len(added):]
+        if set(id(release) for release in tail) != added:
+            return
+
+        dependencies = list(graph.dependencies)
+        heads = dict((dep[0], i) for i, dep in enumerate(dependencies))
+        chains = {}
+        for release in tail:
+            name = release.name
+            previous = release.previous
+            if not previous:
+                current = [name]
+            elif previous in heads:
+                current = [name] + dependencies[heads[previous]]
+                # The previous release is no longer a head
+                dependencies[heads.pop(previous)] = None
+            elif previous in chains:
+                current = [name] + chains[previous]
+            elif previous in graph:
+                current = [name] + graph.chain(previous)
+            else:
+                # Release not found, reported when solving the dependencies
+                return
+            chains[name] = current
+            heads[name] = len(dependencies)
+            dependencies.append(current)
+
+        dependencies = [dep for dep in dependencies if dep is not None]
+        self._graph = (releases, releases.version,
+                       DependencyGraph(dependencies))
+
     def guess_latest_release(self):
         """
         Try to guess the latest release
@@ -636,9 +2258,7 @@ class Map(object):
             self.logger.error(msg)
             raise Exception(msg)
 
-        deps = self.dependencies()
-
-        heads = (dep[0] for dep in deps)
+        heads = self.graph.heads
 
         latest = [None, None, '_0_0_0', None]
         for release in heads:
@@ -714,133 +2334,1598 @@ class Map(object):
                         head = self.guess_latest_release()
                         new_prefix = head[1]
 
-            # At this point, new_prefix can still be None
+            # At this point, new_prefix can still be None
+
+            if not new_suffix:
+                self.logger.debug("[guess]: Guessing new suffix")
+                self.logger.debug("[guess]: find latest release")
+                # Guess the latest release
+                head = self.guess_latest_release()
+                if head[3]:
+                    self.logger.debug("[guess]: Got suffix from latest")
+                    prev_ver = head[3]
+
+                    # Bump the previous release version
+                    self.logger.debug("[guess]: Bumping release")
+                    new_ver = bump_version(prev_ver, abi_break)
+                    new_suffix = "".join(("_" + str(i) for i in new_ver if i is
+                                          not None))
+
+        if not new_prefix or not new_suffix:
+            # ERROR: could not guess the name
+            msg = "Insufficient information to guess the new release"\
+                  " name. Releases found do not have version"\
+                  " information or a valid library name. Please"\
+                  " provide the complete name of the release."
+            self.logger.error(msg)
+            raise Exception(msg)
+
+        # Return the combination of the prefix and version
+        return new_prefix.upper() + new_suffix
+
+    def sort_releases_nice(self, top_release):
+        """
+        Sort the releases contained in a map file putting the dependencies of
+        ``top_release`` first. This changes the order of the list in
+        ``releases``.
+
+        :param top_release: The release whose dependencies should be prioritized
+        """
+
+        if not self.init:
+            msg = "Map not checked, run check()"
+            self.logger.error(msg)
+            raise Exception(msg)
+
+        # Use natural sorting
+        releases = sorted(self.releases, key=lambda release: _natural_sort_key(release.name), reverse=True)
+        releases.reverse()
+        top_dependency = set(self.graph.chain(top_release))
+
+        top_list = []
+        new_list = []
+
+        for release in releases:
+            if release.name in top_dependency:
+                top_list.append(release)
+            else:
+                new_list.append(release)
+
+        self.releases = top_list + new_list
+
+    def apply(self, changes, allow_abi_break=False, guess=True):
+        """
+        Apply a sequence of symbol changes to the map, then check it once
+
+        Each change is a tuple ``(action, symbols)`` or ``(action, symbols,
+        release)``, where ``action`` is ``"add"`` or ``"remove"``:
+            - ``"add"``: The symbols are added to the global scope of the
+              release with the given name. If the release does not exist, or
+              if no name is given, a new release is created on top of the
+              latest release. All the additions without a name go to the same
+              new release, whose name is guessed as in ``guess_name()``.
+            - ``"remove"``: The symbols are removed from the global scopes of
+              the releases where they are found. This is an incompatible
+              change and the SONAME of the library should be bumped. The
+              release name, if given, is ignored.
+
+        The changes are applied in order against the symbol index of the
+        releases, and only the releases modified are checked again at the end
+        (see ``check()``). If a change fails, the changes applied before are
+        undone, leaving the releases as they were.
+
+        :param changes:         An iterable of changes
+        :param allow_abi_break: Allow the removal of symbols
+        :param guess:           Guess the names of the new releases if not
+                                complete (see ``guess_name()``)
+        :returns:               A tuple ``(added, removed)`` with the sorted
+                                lists of the symbols added and removed
+        :raises Exception:      Raised if the map was not checked, if a
+                                released release would be modified, or if
+                                symbols would be removed without
+                                ``allow_abi_break``
+        """
+
+        if not self.init:
+            msg = "Map not checked, run check()"
+            self.logger.error(msg)
+            raise Exception(msg)
+
+        releases = self.releases
+        original = releases.global_symbols()
+
+        # The releases created by the changes are put on top of the latest one
+        latest = self.guess_latest_release()[0]
+        # The release which receives the additions without a release name
+        unnamed = None
+
+        # The releases created and the symbols of the scopes changed before
+        # the changes, to undo them if a change fails
+        created = []
+        saved = {}
+
+        def save(release, scope):
+            key = (id(release), scope)
+            if key not in saved:
+                symbols = release.symbols.get(scope)
+                if symbols is not None:
+                    symbols = tuple(symbols)
+                saved[key] = (release, scope, symbols)
+
+        try:
+            for change in changes:
+                action, symbols = change[0], change[1]
+                name = change[2] if len(change) > 2 else None
+                symbols = clean_symbols(symbols)
+
+                if action == "add":
+                    release = None
+                    release_info = None
+                    if name:
+                        release_info = get_info_from_release_string(name)
+                        if not release_info:
+                            msg = "Invalid release name \'{0}\'".format(name)
+                            self.logger.error(msg)
+                            raise Exception(msg)
+                        found = releases.find(release_info[0])
+                        if found:
+                            release = found[-1]
+                    else:
+                        release = unnamed
+
+                    if release is None:
+                        release = Release()
+                        release.name = self.guess_name(release_info,
+                                                       guess=guess)
+                        release.previous = latest
+                        releases.append(release)
+                        created.append(release)
+                        latest = release.name
+                        if not name:
+                            unnamed = release
+                    elif release.released:
+                        msg = "Released releases cannot be modified. Abort."
+                        self.logger.error(msg)
+                        raise Exception(msg)
+
+                    new = []
+                    seen = set(release.symbols.get('global', ()))
+                    for symbol in symbols:
+                        if symbol in seen:
+                            continue
+                        seen.add(symbol)
+                        if any(scope == 'global' for _, scope in
+                               releases.find_symbol(symbol)):
+                            self.logger.warning("The symbol \'%s\' is"
+                                                " already present in a"
+                                                " previous version. Keep the"
+                                                " previous implementation to"
+                                                " not break ABI.", symbol)
+                        new.append(symbol)
+
+                    if new:
+                        save(release, 'global')
+                        release.add_symbols('global', new)
+
+                elif action == "remove":
+                    for symbol in symbols:
+                        places = [(r, scope) for r, scope in
+                                  releases.find_symbol(symbol) if
+                                  scope == 'global']
+                        if not places:
+                            self.logger.warning("Requested to remove \'%s\',"
+                                                " but not found.", symbol)
+                            continue
+
+                        if not allow_abi_break:
+                            msg = "ABI break detected: symbols would be" \
+                                  " removed"
+                            self.logger.error(msg)
+                            raise Exception(msg)
+
+                        for r, scope in places:
+                            save(r, scope)
+                            r.remove_symbols(scope, [symbol])
+
+                else:
+                    msg = "Unknown change \'{0}\'".format(action)
+                    self.logger.error(msg)
+                    raise Exception(msg)
+        except Exception:
+            for release, scope, symbols in saved.values():
+                release._replace_symbols(scope, symbols)
+            for release in reversed(created):
+                releases.remove(release)
+            raise
+
+        # Only the releases modified are checked again
+        self.check(incremental=True)
+
+        current = releases.global_symbols()
+        return sorted(current - original), sorted(original - current)
+
+    def verify(self, filename):
+        """
+        Cross-check the symbols and versions of a shared object (ELF file)
+        against the map
+
+        The exported symbols and the version definitions are read from the
+        file and compared to the global symbols of the releases. The exported
+        symbols not listed by name are matched against the glob patterns and
+        the language blocks of the map (see ``match_symbols()``).
+
+        :param filename: The path to the shared object
+        :returns: A dictionary with the differences found, containing:
+                  ``unlisted``: The exported symbols not listed in the map;
+                  ``missing``: A list of tuples (release, symbol) of the
+                  symbols listed in the map but not exported;
+                  ``wrong_version``: A list of tuples (symbol, [releases],
+                  [versions]) of the symbols bound to versions different from
+                  the releases listing them;
+                  ``missing_versions``: The releases not defined as versions
+                  in the file;
+                  ``unknown_versions``: The versions defined in the file which
+                  are not releases in the map.
+                  All lists are sorted.
+        """
+
+        if not self.init:
+            msg = "Map not checked, run check()"
+            self.logger.error(msg)
+            raise Exception(msg)
+
+        # Map each listed symbol to the releases listing it
+        listed = {}
+        for release in self.releases:
+            for symbol in release.symbols.get('global', ()):
+                if not is_glob(symbol):
+                    listed.setdefault(symbol, set()).add(release.name)
+
+        from .elf import SHN_ABS
+        from .elf import VER_FLG_BASE
+        from .elf import ELFFile
+        from .elf import is_exported
+
+        with ELFFile(filename) as elf:
+            definitions = elf.version_definitions()
+            version_nodes = set(definition.name for definition in
+                                definitions)
+            defined = set(definition.name for definition in definitions if
+                          not definition.flags & VER_FLG_BASE)
+
+            # Map each exported symbol to the versions it is bound to
+            exported = {}
+            for symbol in elf.symbols():
+                if not is_exported(symbol):
+                    continue
+                # The absolute symbols defining the version nodes are not
+                # exported symbols (see ``ELFFile.exported_symbols()``)
+                if symbol.shndx == SHN_ABS and symbol.name in version_nodes:
+                    continue
+                exported.setdefault(symbol.name, set()).add(symbol.version)
+
+        # Map each exported symbol to the releases listing or matching it
+        bound = dict((symbol, releases) for symbol, releases in
+                     listed.items() if symbol in exported)
+        unlisted = []
+        for symbol, release, scope in self.match_symbols(
+                sorted(symbol for symbol in exported if symbol not in listed)):
+            if scope == 'global':
+                bound[symbol] = set([release])
+            else:
+                unlisted.append(symbol)
+
+        missing = sorted((release, symbol) for symbol, releases in
+                         listed.items() if symbol not in exported for
+                         release in releases)
+
+        wrong_version = []
+        for symbol in sorted(bound):
+            releases = bound[symbol]
+            versions = exported[symbol]
+            if not releases & versions:
+                # Unversioned symbols are shown as readelf does
+                wrong_version.append((symbol, sorted(releases),
+                                      sorted(version or "*global*" for
+                                             version in versions)))
+
+        names = set(release.name for release in self.releases)
+
+        return {"unlisted": unlisted,
+                "missing": missing,
+                "wrong_version": wrong_version,
+                "missing_versions": sorted(names - defined),
+                "unknown_versions": sorted(defined - names)}
+
+    def compare_symbols(self, symbols):
+        """
+        Compare the global symbols of the map with the symbols exported by a
+        new version of the library
+
+        A symbol is present in the map if it is listed by name in the global
+        scope of a release (including the ``extern "C"`` blocks), or if it is
+        matched by a glob pattern in a global scope (see ``SymbolMatcher``).
+        The mangled C++ symbols are also demangled and matched with the
+        ``extern "C++"`` blocks of the global scopes, as in
+        ``match_symbols()``. A glob pattern (or a symbol in an ``extern
+        "C++"`` block) is present if it matches any of the given symbols. The
+        ``*`` wildcard is compared as a name.
+
+        :param symbols: An iterable of the exported symbol names
+        :returns:       A tuple (added, removed) of sets, containing the given
+                        symbols not present in the map, and the global symbols
+                        and patterns of the map not present in the given
+                        symbols
+        :raises demangle.DemangleError: Raised if the symbols cannot be
+                                        demangled
+        """
+
+        listed = self.all_global_symbols()
+        cxx_symbols = []
+        for release in self.releases:
+            languages = release.extern.get('global', {})
+            listed.update(languages.get("C", ()))
+            cxx_symbols.extend(languages.get("C++", ()))
+
+        patterns = [symbol for symbol in listed if symbol != '*' and
+                    is_glob(symbol)]
+
+        # Each pattern is its own group, to know which patterns match
+        matcher = SymbolMatcher((pattern, [pattern]) for pattern in patterns)
+        match_pattern = matcher.match_pattern
+
+        symbols = set(symbols)
+        added = set()
+        matched = set()
+        for symbol in symbols:
+            if symbol in listed:
+                continue
+            pattern = match_pattern(symbol) if patterns else None
+            if pattern is None:
+                added.add(symbol)
+            else:
+                matched.add(pattern)
+
+        # Each symbol in the extern "C++" blocks is its own group
+        if cxx_symbols and added:
+            from .demangle import demangle
+            from .demangle import is_mangled
+
+            cxx_matcher = SymbolMatcher((symbol, [symbol]) for symbol in
+                                        cxx_symbols)
+            mangled = [symbol for symbol in added if is_mangled(symbol)]
+            for symbol, name in zip(mangled, demangle(mangled)):
+                found = cxx_matcher.match(name)
+                if found is not None:
+                    added.discard(symbol)
+                    matched.add(found)
+
+        removed = set(symbol for symbol in chain(listed, cxx_symbols) if
+                      symbol not in symbols and symbol not in matched)
+        return added, removed
+
+    def diff(self, other):
+        """
+        Compare the map with a newer version of it
+
+        The global symbols and the releases of both maps are compared. A
+        release missing in ``other`` is considered renamed if a new release
+        lists exactly the same global symbols; the symbols of renamed
+        releases are not reported as moved. The glob patterns are compared
+        as written.
+
+        The change is compatible if the binaries linked against the old map
+        still work with the new one: no symbols were removed or moved to
+        other releases, and no releases were removed or renamed.
+
+        The symbols are compared using indexes built in a single pass over
+        each map, so the time is linear in the number of symbols (only the
+        differences found are sorted).
+
+        :param other: The new map (a ``Map``)
+        :returns: A dictionary with the differences found, containing:
+                  ``added``: A list of tuples (release, symbol) of the
+                  symbols not found in the old map;
+                  ``removed``: A list of tuples (release, symbol) of the
+                  symbols not found in the new map;
+                  ``moved``: A list of tuples (symbol, [old releases], [new
+                  releases]) of the symbols listed in different releases;
+                  ``added_releases``: The new releases;
+                  ``removed_releases``: The releases not found in the new map;
+                  ``renamed_releases``: A list of tuples (old name, new name);
+                  ``reparented_releases``: A list of tuples (release, old
+                  previous, new previous) of the releases whose previous
+                  release changed (following the renamed releases);
+                  ``compatible``: True if the change does not break the ABI.
+                  All lists are sorted.
+        """
+
+        def index(releases):
+            # The symbols are mapped to the name of the release listing them,
+            # or to a set of names if listed in more than one release
+            by_name = {}
+            by_symbol = {}
+            for release in releases:
+                name = release.name
+                by_name[name] = release
+                for symbol in release.symbols.get('global', ()):
+                    current = by_symbol.setdefault(symbol, name)
+                    if current is not name:
+                        if isinstance(current, set):
+                            current.add(name)
+                        elif current != name:
+                            by_symbol[symbol] = set((current, name))
+            return by_name, by_symbol
+
+        def names(releases):
+            if isinstance(releases, set):
+                return releases
+            return (releases,)
+
+        old_releases, old_symbols = index(self.releases)
+        new_releases, new_symbols = index(other.releases)
+
+        gone = [name for name in old_releases if name not in new_releases]
+        added_names = set(name for name in new_releases if
+                          name not in old_releases)
+
+        # Find the new releases listing exactly the symbols of a release gone
+        candidates = {}
+        for name in added_names:
+            key = frozenset(new_releases[name].symbols.get('global', ()))
+            if key:
+                # Ambiguous if more than one release lists the same symbols
+                candidates[key] = None if key in candidates else name
+        renamed = {}
+        for name in gone:
+            key = frozenset(old_releases[name].symbols.get('global', ()))
+            new_name = candidates.pop(key, None)
+            if new_name:
+                renamed[name] = new_name
+
+        def rename(name):
+            return renamed.get(name, name)
+
+        added = sorted((release, symbol) for symbol, releases in
+                       new_symbols.items() if symbol not in old_symbols for
+                       release in names(releases))
+        removed = sorted((release, symbol) for symbol, releases in
+                         old_symbols.items() if symbol not in new_symbols for
+                         release in names(releases))
+
+        moved = []
+        for symbol, releases in old_symbols.items():
+            current = new_symbols.get(symbol)
+            if current is None:
+                continue
+            if isinstance(releases, set) or isinstance(current, set):
+                if set(rename(name) for name in names(releases)) != \
+                        set(names(current)):
+                    moved.append((symbol, sorted(names(releases)),
+                                  sorted(names(current))))
+            elif rename(releases) != current:
+                moved.append((symbol, [releases], [current]))
+        moved.sort()
+
+        reparented = []
+        for name, release in old_releases.items():
+            new = new_releases.get(rename(name))
+            if new is None:
+                continue
+            previous = rename(release.previous) if release.previous else None
+            if previous != (new.previous or None):
+                reparented.append((new.name, release.previous or None,
+                                   new.previous or None))
+        reparented.sort()
+
+        removed_releases = sorted(name for name in gone if name not in renamed)
+
+        return {"added": added,
+                "removed": removed,
+                "moved": moved,
+                "added_releases": sorted(added_names -
+                                         set(renamed.values())),
+                "removed_releases": removed_releases,
+                "renamed_releases": sorted(renamed.items()),
+                "reparented_releases": reparented,
+                "compatible": not (removed or moved or removed_releases or
+                                   renamed)}
+
+    def merge(self, base, other):
+        """
+        Merge the changes made by two versions of a map (three-way merge)
+
+        This map and ``other`` are two versions derived from ``base``. The
+        changes each version made to ``base`` are combined per release and per
+        scope (and language block):
+            - The releases added by either version are kept. The releases
+              removed by a version and not modified by the other are removed.
+            - The symbols added by either version are added, and the symbols
+              removed by either version are removed.
+            - The previous release and the released state are taken from the
+              version which changed them.
+
+        A conflict is reported only when the versions made incompatible
+        changes: a release removed by one version and modified by the other,
+        a release given different previous releases, or the same symbol added
+        to different releases. The changes made by this map are kept in the
+        result when there is a conflict.
+
+        The releases of this map keep their order. The releases found only in
+        ``other`` are put before the release following them in ``other``.
+
+        :param base:  The common ancestor of both versions (a ``Map``)
+        :param other: The other version (a ``Map``)
+        :returns:     A tuple (merged, conflicts), where merged is a new
+                      ``Map``, not checked yet, and conflicts is a sorted list
+                      of messages describing the conflicts found
+        """
+
+        base_releases = dict((r.name, r) for r in base.releases)
+        ours = dict((r.name, r) for r in self.releases)
+        theirs = dict((r.name, r) for r in other.releases)
+
+        conflicts = []
+
+        def contents(release):
+            # The symbols of each scope and language block of a release
+            if release is None:
+                return {}
+            result = dict(release.symbols)
+            for scope, languages in release.extern.items():
+                for language, symbols in languages.items():
+                    result[(scope, language)] = symbols
+            return result
+
+        def same(first, second):
+            if (first.previous or None) != (second.previous or None) or \
+                    first.released != second.released:
+                return False
+            first, second = contents(first), contents(second)
+            return set(first) == set(second) and \
+                all(set(first[key]) == set(second[key]) for key in first)
+
+        def pick(base_value, ours_value, theirs_value):
+            # Returns the value chosen and if the versions conflict
+            if ours_value == theirs_value or theirs_value == base_value:
+                return ours_value, False
+            if ours_value == base_value:
+                return theirs_value, False
+            return ours_value, True
+
+        def merge_symbols(base_symbols, ours_symbols, theirs_symbols):
+            # Kept by both versions, or added by one of them
+            base_set = set(base_symbols)
+            ours_set = set(ours_symbols)
+            theirs_set = set(theirs_symbols)
+            merged = [symbol for symbol in ours_symbols if
+                      symbol in theirs_set or symbol not in base_set]
+            merged.extend(symbol for symbol in theirs_symbols if
+                          symbol not in base_set and symbol not in ours_set)
+            return merged
+
+        # Group the releases found only in the other version by the release
+        # following them there
+        following = {}
+        group = []
+        for release in other.releases:
+            if release.name in ours:
+                following.setdefault(release.name, []).extend(group)
+                group = []
+            else:
+                group.append(release.name)
+
+        order = []
+        for release in self.releases:
+            order.extend(following.pop(release.name, ()))
+            order.append(release.name)
+        order.extend(group)
+
+        names = []
+        seen = set()
+        for name in order:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+
+        merged = []
+        for name in names:
+            base_release = base_releases.get(name)
+            ours_release = ours.get(name)
+            theirs_release = theirs.get(name)
+
+            if ours_release is None or theirs_release is None:
+                present = ours_release or theirs_release
+                if base_release is not None:
+                    # Removed by one version
+                    if same(base_release, present):
+                        continue
+                    conflicts.append("The release \'{0}\' was removed in one"
+                                     " version and modified in the other"
+                                     .format(name))
+                merged.append((name, present.previous or None,
+                               present.released, present.line,
+                               contents(present)))
+                continue
+
+            base_previous = None
+            base_released = False
+            if base_release is not None:
+                base_previous = base_release.previous or None
+                base_released = base_release.released
+
+            previous, conflict = pick(base_previous,
+                                      ours_release.previous or None,
+                                      theirs_release.previous or None)
+            if conflict:
+                conflicts.append("The release \'{0}\' has different previous"
+                                 " releases: \'{1}\' and \'{2}\'"
+                                 .format(name, ours_release.previous,
+                                         theirs_release.previous))
+            released, _ = pick(base_released, ours_release.released,
+                               theirs_release.released)
+
+            base_contents = contents(base_release)
+            ours_contents = contents(ours_release)
+            theirs_contents = contents(theirs_release)
+            symbols = {}
+            for key in chain(ours_contents, (key for key in theirs_contents if
+                                             key not in ours_contents)):
+                symbols[key] = merge_symbols(base_contents.get(key, ()),
+                                             ours_contents.get(key, ()),
+                                             theirs_contents.get(key, ()))
+            merged.append((name, previous, released, ours_release.line,
+                           symbols))
+
+        # The symbols added by both versions must be in the same releases
+        base_global = base.releases.global_symbols()
+
+        def added(releases):
+            result = {}
+            for release in releases:
+                for symbol in release.symbols.get('global', ()):
+                    if symbol not in base_global:
+                        result.setdefault(symbol, set()).add(release.name)
+            return result
+
+        ours_added = added(self.releases)
+        discard = {}
+        for symbol, releases in added(other.releases).items():
+            ours_releases = ours_added.get(symbol)
+            if ours_releases is None or ours_releases == releases:
+                continue
+            conflicts.append("The symbol \'{0}\' was added to different"
+                             " releases: {1} and {2}"
+                             .format(symbol, ", ".join(sorted(ours_releases)),
+                                     ", ".join(sorted(releases))))
+            for name in releases - ours_releases:
+                discard.setdefault(name, set()).add(symbol)
+
+        # The releases emptied by discarding the conflicting symbols are
+        # removed, unless other releases depend on them
+        required = set(previous for _, previous, _, _, _ in merged)
+        releases = []
+        for name, previous, released, line, symbols in merged:
+            if name in discard and name not in ours and \
+                    name not in required and \
+                    not any(set(key_symbols) - discard[name] for
+                            key_symbols in symbols.values()):
+                continue
+            release = Release()
+            release.name = name
+            release.previous = previous or ''
+            release.released = released
+            release.line = line
+            for key, key_symbols in symbols.items():
+                if key == 'global' and name in discard:
+                    key_symbols = [symbol for symbol in key_symbols if
+                                   symbol not in discard[name]]
+                if isinstance(key, tuple):
+                    release.add_extern_symbols(key[0], key[1], key_symbols)
+                else:
+                    release.add_symbols(key, key_symbols)
+            releases.append(release)
+
+        result = Map()
+        result.releases = releases
+        return result, sorted(conflicts)
+
+
+class Release(object):
+    """
+    A internal representation of a release version and its symbols
+
+    A release is usually identified by the library name (suffix) and the release
+    version (suffix). A release contains symbols, grouped by their visibility
+    scope (global or local).
+
+    In this class the symbols of a release are stored in a list of dictionaries
+    mapping a visibility scope name (e.g. \"global\") to a list of the contained
+    symbols:
+    ::
+
+        ([{"global": [symbols]}, {"local": [local_symbols]}])
+
+    Attributes:
+        name: The release name
+        previous: The previous release to which this release is dependent
+        symbols: The symbols contained in the release, grouped by the visibility
+                 scope.
+        extern: The symbols in language blocks (e.g. ``extern "C++" {...}``),
+                as a dictionary mapping the visibility scope to a dictionary
+                mapping the language (e.g. ``"C++"``) to the list of symbols.
+                The symbols are the demangled names or patterns, as written
+                in the map
+        line: The number of the line where the release is defined in the file
+              parsed, or ``None`` if it was not parsed from a file
+
+    Changes to ``name`` and ``previous``, and the symbols added or removed
+    with ``add_symbols()`` and ``remove_symbols()``, are reported to the
+    ``ReleaseList`` objects containing the release, to keep their indexes up
+    to date.
+
+    When the map containing the release is checked, the lists of symbols are
+    replaced by tuples (see ``freeze()``). Use ``add_symbols()`` to add
+    symbols to a scope.
+    """
+
+    __slots__ = ("_owners", "_name", "_previous", "released", "symbols",
+                 "extern", "line")
+
+    def __init__(self):
+        # Weak references to the lists containing this release
+        self._owners = ()
+        self._name = ''
+        self._previous = ''
+        self.released = False
+        self.symbols = dict()
+        self.extern = dict()
+        self.line = None
+
+    def _set_indexed(self, attribute, value):
+        """
+        Set an indexed attribute, updating the indexes of the owner lists
+
+        :param attribute: The name of the attribute holding the value
+        :param value:     The new value
+        """
+
+        owners = self._live_owners()
+
+        for owner in owners:
+            owner._unindex(self)
+        setattr(self, attribute, value)
+        for owner in owners:
+            owner._index(self)
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        self._set_indexed('_name', name)
+
+    @property
+    def previous(self):
+        return self._previous
+
+    @previous.setter
+    def previous(self, previous):
+        self._set_indexed('_previous', previous)
+
+    def add_symbols(self, scope, symbols):
+        """
+        Add symbols to a scope, creating the scope if needed
+
+        :param scope:   The name of the scope (e.g. ``"global"``)
+        :param symbols: The symbols to add
+        """
+
+        symbols = [_intern(symbol) for symbol in symbols]
+        scope = _intern(scope)
+        current = self.symbols.get(scope)
+        if current is None:
+            self.symbols[scope] = symbols
+        elif isinstance(current, tuple):
+            self.symbols[scope] = list(current) + symbols
+        else:
+            current.extend(symbols)
+
+        for owner in self._live_owners():
+            owner._index_symbols(self, scope, symbols)
+
+    def remove_symbols(self, scope, symbols):
+        """
+        Remove symbols from a scope
+
+        All the occurrences of the symbols are removed. The symbols not found
+        are ignored.
+
+        :param scope:   The name of the scope (e.g. ``"global"``)
+        :param symbols: The symbols to remove
+        """
+
+        current = self.symbols.get(scope)
+        if not current:
+            return
+
+        symbols = set(symbols)
+        removed = [symbol for symbol in current if symbol in symbols]
+        if not removed:
+            return
+        kept = [symbol for symbol in current if symbol not in symbols]
+        if isinstance(current, tuple):
+            kept = tuple(kept)
+        self.symbols[scope] = kept
+
+        for owner in self._live_owners():
+            owner._unindex_symbols(self, scope, removed)
+
+    def _replace_symbols(self, scope, symbols):
+        """
+        Replace the symbols of a scope, as when undoing changes
+
+        :param scope:   The name of the scope (e.g. ``"global"``)
+        :param symbols: The symbols of the scope, or None to remove the scope
+        """
+
+        owners = self._live_owners()
+        current = self.symbols.pop(scope, None)
+        if current:
+            for owner in owners:
+                owner._unindex_symbols(self, scope, current)
+        if symbols is not None:
+            self.symbols[scope] = symbols
+            for owner in owners:
+                owner._index_symbols(self, scope, symbols)
+
+    def add_extern_symbols(self, scope, language, symbols):
+        """
+        Add symbols to a language block of a scope, creating it if needed
+
+        :param scope:    The name of the scope (e.g. ``"global"``)
+        :param language: The language (e.g. ``"C++"``)
+        :param symbols:  The symbols to add, as written in the block
+        """
+
+        languages = self.extern.setdefault(_intern(scope), {})
+        current = languages.get(language)
+        symbols = [_intern(symbol) for symbol in symbols]
+        if current is None:
+            languages[_intern(language)] = symbols
+        elif isinstance(current, tuple):
+            languages[language] = list(current) + symbols
+        else:
+            current.extend(symbols)
+
+        for owner in self._live_owners():
+            owner._touch(self)
+
+    def _live_owners(self):
+        """
+        Get the lists containing this release, forgetting the dead ones
+
+        :returns: A list of ``ReleaseList``
+        """
+
+        owners = [owner() for owner in self._owners]
+        owners = [owner for owner in owners if owner is not None]
+        if len(owners) != len(self._owners):
+            self._owners = tuple(weakref.ref(owner) for owner in owners)
+        return owners
+
+    def copy(self):
+        """
+        Get a copy of the release, not contained in any list
+
+        The symbols are frozen (see ``freeze()``) to be shared by the copy.
+
+        :returns: A new ``Release``
+        """
+
+        self.freeze()
+        r = Release()
+        r.name = self.name
+        r.previous = self.previous
+        r.released = self.released
+        r.line = self.line
+        r.symbols = dict(self.symbols)
+        r.extern = dict((scope, dict(languages)) for scope, languages in
+                        self.extern.items())
+        return r
+
+    def freeze(self):
+        """
+        Store the symbols of each scope in a tuple
+
+        Tuples use less memory than lists, and prevent the symbols from being
+        changed inadvertently.
+        """
+
+        symbols = self.symbols
+        for scope in list(symbols):
+            if not isinstance(symbols[scope], tuple):
+                symbols[scope] = tuple(symbols[scope])
+        for languages in self.extern.values():
+            for language in list(languages):
+                if not isinstance(languages[language], tuple):
+                    languages[language] = tuple(languages[language])
+
+    def __str__(self):
+        return "".join(self.iter_lines())
+
+    def iter_lines(self):
+        """
+        Iterate over the lines of the release as it is written in a map
+
+        :returns: A generator of the lines, terminated with ``\\n``
+        """
+
+        if self.released:
+            yield self.name + "    # Released\n"
+        else:
+            yield self.name + "\n"
+        yield "{\n"
+        scopes = self.symbols.keys()
+        if self.extern:
+            scopes = set(scopes).union(self.extern)
+        for v in sorted(scopes):
+            yield "    " + v + ":\n"
+            for symbol in sorted(self.symbols.get(v, ())):
+                yield "        " + symbol + ";\n"
+            languages = self.extern.get(v, {})
+            for language in sorted(languages):
+                yield "        extern \"" + language + "\" {\n"
+                for symbol in sorted(languages[language]):
+                    yield "            " + symbol + ";\n"
+                yield "        };\n"
+        yield "} " + self.previous + ";\n"
+
+    def duplicates(self):
+        duplicates = []
+        for scope, symbols in (self.symbols.items()):
+            seen = set()
+            release_dups = set()
+            if symbols:
+                for symbol in symbols:
+                    if symbol not in seen:
+                        seen.add(symbol)
+                    else:
+                        release_dups.add(symbol)
+                if release_dups:
+                    duplicates.append((scope, list(release_dups)))
+        return duplicates
+
+
+class ReleaseList(list):
+    """
+    A list of releases indexed by the release names
+
+    This is a ``list`` which keeps two indexes up to date as releases are
+    added, removed, renamed or have their previous release changed:
+
+        - The releases by name, used by ``find()``
+        - The releases by previous release name, used by ``successors()``
+
+    This allows finding a release and its successors in constant time.
+    Since more than one release can have the same name (which is an error
+    reported by ``Map.dependencies()``), the indexes map names to tuples.
+
+    An index of the releases and scopes containing each symbol, used by
+    ``find_symbol()`` and ``global_symbols()``, is built on the first query
+    (``duplicated_symbols()`` uses it only if it was built).
+    From then on, it is updated as releases are added or removed, and as
+    symbols are added or removed with ``Release.add_symbols()`` and
+    ``Release.remove_symbols()``.
+
+    The list also records the releases added or changed, and the names of the
+    releases removed or renamed, until ``clear_changes()`` is called. This is
+    used by ``Map.check()`` to check only the releases changed since the last
+    check.
+
+    Attributes:
+        version:         A counter incremented on every change to the list,
+                         used to invalidate data computed from the releases
+        symbols_version: A counter incremented when symbols are added to or
+                         removed from the releases in the list
+    """
+
+    def __init__(self, releases=()):
+        super(ReleaseList, self).__init__(releases)
+        self.version = 0
+        self.symbols_version = 0
+        self._by_name = {}
+        self._by_previous = {}
+        # Maps each symbol to its first (release, scope) pair; the other
+        # occurrences are kept in _symbol_duplicates
+        self._by_symbol = None
+        self._symbol_duplicates = {}
+        self._global_symbols = None
+        # The releases changed and the names removed since the last call to
+        # clear_changes()
+        self._changed = {}
+        self._removed_names = set()
+        for release in self:
+            self._add(release)
+
+    def _index(self, release):
+        self.version += 1
+        self._changed[id(release)] = release
+        # The releases are kept in tuples, which are smaller than lists, as
+        # usually there is a single release per name
+        for index, key in ((self._by_name, release.name),
+                           (self._by_previous, release.previous)):
+            index[key] = index.get(key, ()) + (release,)
+
+    def _unindex(self, release):
+        self.version += 1
+        self._changed.pop(id(release), None)
+        self._removed_names.add(release.name)
+        for index, key in ((self._by_name, release.name),
+                           (self._by_previous, release.previous)):
+            found = index[key]
+            for i, item in enumerate(found):
+                if item is release:
+                    found = found[:i] + found[i + 1:]
+                    break
+            if found:
+                index[key] = found
+            else:
+                del index[key]
+
+    def _add(self, release):
+        self._index(release)
+        release._owners += (weakref.ref(self),)
+        if self._by_symbol is not None:
+            for scope, symbols in release.symbols.items():
+                self._index_symbols(release, scope, symbols)
+
+    def _discard(self, release):
+        self._unindex(release)
+        if self._by_symbol is not None:
+            for scope, symbols in release.symbols.items():
+                self._unindex_symbols(release, scope, symbols)
+        owners = release._owners
+        for i, owner in enumerate(owners):
+            if owner() is self:
+                release._owners = owners[:i] + owners[i + 1:]
+                break
+
+    def _replace(self, old):
+        # Reindex after an operation which replaced many items
+        for release in old:
+            self._discard(release)
+        for release in self:
+            self._add(release)
+
+    def append(self, release):
+        super(ReleaseList, self).append(release)
+        self._add(release)
+
+    def extend(self, releases):
+        releases = list(releases)
+        super(ReleaseList, self).extend(releases)
+        for release in releases:
+            self._add(release)
+
+    def __iadd__(self, releases):
+        self.extend(releases)
+        return self
+
+    def insert(self, index, release):
+        super(ReleaseList, self).insert(index, release)
+        self._add(release)
+
+    def pop(self, index=-1):
+        release = super(ReleaseList, self).pop(index)
+        self._discard(release)
+        return release
+
+    def remove(self, release):
+        super(ReleaseList, self).remove(release)
+        self._discard(release)
+
+    def clear(self):
+        del self[:]
+
+    def sort(self, *args, **kwargs):
+        super(ReleaseList, self).sort(*args, **kwargs)
+        self.version += 1
+
+    def reverse(self):
+        super(ReleaseList, self).reverse()
+        self.version += 1
+
+    def __setitem__(self, index, value):
+        old = list(self)
+        super(ReleaseList, self).__setitem__(index, value)
+        self._replace(old)
+
+    def __delitem__(self, index):
+        old = list(self)
+        super(ReleaseList, self).__delitem__(index)
+        self._replace(old)
+
+    def __imul__(self, count):
+        old = list(self)
+        super(ReleaseList, self).__imul__(count)
+        self._replace(old)
+        return self
+
+    # Python 2 uses these for simple slices
+    def __setslice__(self, i, j, releases):
+        self.__setitem__(slice(i, j), releases)
+
+    def __delslice__(self, i, j):
+        self.__delitem__(slice(i, j))
+
+    def _touch(self, release):
+        """
+        Record that the symbols of a release were changed
+
+        :param release: The release changed
+        """
+
+        self.symbols_version += 1
+        self._changed[id(release)] = release
+
+    def changes(self):
+        """
+        Get the changes made to the list since the last ``clear_changes()``
+
+        :returns: A tuple (changed, removed) with the list of the releases
+                  added or changed (including their names, previous releases
+                  and symbols) and the set of the names of the releases
+                  removed or renamed
+        """
+
+        return (list(self._changed.values()), set(self._removed_names))
+
+    def clear_changes(self):
+        """
+        Forget the changes made to the list
+        """
+
+        self._changed.clear()
+        self._removed_names.clear()
+
+    def _index_symbols(self, release, scope, symbols):
+        """
+        Add symbols of a scope of a release to the symbol index
+
+        :param release: The release containing the symbols
+        :param scope:   The name of the scope containing the symbols
+        :param symbols: The symbols
+        """
+
+        self._touch(release)
+        if self._by_symbol is None:
+            return
+        if scope == 'global':
+            self._global_symbols = None
+
+        # The same pair is shared by all the symbols of the scope
+        pair = (release, scope)
+        by_symbol = self._by_symbol
+        for symbol in symbols:
+            if symbol in by_symbol:
+                self._symbol_duplicates.setdefault(symbol, []).append(pair)
+            else:
+                by_symbol[symbol] = pair
+
+    def _unindex_symbols(self, release, scope, symbols):
+        """
+        Remove symbols of a scope of a release from the symbol index
+
+        :param release: The release containing the symbols
+        :param scope:   The name of the scope containing the symbols
+        :param symbols: The symbols
+        """
+
+        self._touch(release)
+        if self._by_symbol is None:
+            return
+        if scope == 'global':
+            self._global_symbols = None
+
+        by_symbol = self._by_symbol
+        duplicates = self._symbol_duplicates
+        for symbol in symbols:
+            pair = by_symbol.get(symbol)
+            if pair is None:
+                continue
+            others = duplicates.get(symbol)
+            if pair[0] is release and pair[1] == scope:
+                if others:
+                    by_symbol[symbol] = others.pop(0)
+                else:
+                    del by_symbol[symbol]
+            elif others:
+                for i, other in enumerate(others):
+                    if other[0] is release and other[1] == scope:
+                        del others[i]
+                        break
+            if symbol in duplicates and not duplicates[symbol]:
+                del duplicates[symbol]
+
+    def _scan_symbols(self):
+        """
+        Find the releases and scopes containing each symbol
+
+        :returns: A tuple (by_symbol, duplicates), where by_symbol maps each
+                  symbol to its first (release, scope) pair, and duplicates
+                  maps the symbols found more than once to the list of their
+                  other pairs
+        """
+
+        by_symbol = {}
+        duplicates = {}
+        for release in self:
+            for scope, symbols in release.symbols.items():
+                # The same pair is shared by all the symbols of the scope
+                pair = (release, scope)
+                for symbol in symbols:
+                    if symbol in by_symbol:
+                        duplicates.setdefault(symbol, []).append(pair)
+                    else:
+                        by_symbol[symbol] = pair
+        return by_symbol, duplicates
+
+    def _symbol_index(self):
+        """
+        Get the symbol index, building it if needed
+
+        :returns: The dictionary mapping the symbols to their first
+                  (release, scope) pair
+        """
+
+        if self._by_symbol is None:
+            self._by_symbol, self._symbol_duplicates = self._scan_symbols()
+            self._global_symbols = None
+        return self._by_symbol
+
+    def find_symbol(self, symbol):
+        """
+        Find the releases and scopes containing a symbol
+
+        :param symbol: The symbol name
+        :returns:      A list of tuples (release, scope), in the order the
+                       symbol was found (usually only one or none)
+        """
+
+        pair = self._symbol_index().get(symbol)
+        if pair is None:
+            return []
+        found = [pair]
+        found.extend(self._symbol_duplicates.get(symbol, ()))
+        return found
+
+    def duplicated_symbols(self):
+        """
+        Find the symbols in more than one release or scope
+
+        The symbols repeated in the same scope of a release are not included
+        (see ``Release.duplicates()``), unless they are also in another
+        release or scope.
+
+        :returns: A list of tuples (symbol, [(release, scope)]), sorted by the
+                  position of the first release containing the symbol and
+                  by the symbol; the places are sorted by the position of
+                  the release and by the scope
+        """
+
+        # The index is not built just to find the duplicates, as it would be
+        # kept with an entry for each symbol of the map
+        if self._by_symbol is None:
+            by_symbol, duplicates = self._scan_symbols()
+        else:
+            by_symbol = self._by_symbol
+            duplicates = self._symbol_duplicates
+        if not duplicates:
+            return []
+
+        # The order of the index depends on the changes made to the list, so
+        # the places are sorted by the position of the releases
+        position = dict((id(release), i) for i, release in enumerate(self))
+
+        def place_key(pair):
+            return (position[id(pair[0])], pair[1])
+
+        found = []
+        for symbol, others in duplicates.items():
+            places = []
+            seen = set()
+            for pair in chain((by_symbol[symbol],), others):
+                key = (id(pair[0]), pair[1])
+                if key not in seen:
+                    seen.add(key)
+                    places.append(pair)
+            if len(places) > 1:
+                places.sort(key=place_key)
+                found.append((symbol, places))
+        found.sort(key=lambda item: (place_key(item[1][0])[0], item[0]))
+        return found
+
+    def global_symbols(self):
+        """
+        Get the symbols in the global scope of any release
+
+        :returns: A set of symbol names
+        """
+
+        if self._global_symbols is None:
+            by_symbol = self._symbol_index()
+            found = set(symbol for symbol, (_, scope) in by_symbol.items()
+                        if scope == 'global')
+            for symbol, others in self._symbol_duplicates.items():
+                if symbol not in found:
+                    if any(scope == 'global' for _, scope in others):
+                        found.add(symbol)
+            self._global_symbols = frozenset(found)
+        return set(self._global_symbols)
+
+    def find(self, name):
+        """
+        Find the releases with the given name
+
+        :param name: The release name
+        :returns:    A list of the releases with the given name (usually only
+                     one or none)
+        """
+
+        return list(self._by_name.get(name, ()))
+
+    def successors(self, name):
+        """
+        Find the releases which have the given release as previous release
+
+        :param name: The release name
+        :returns:    A list of the releases refering to ``name`` as previous
+        """
+
+        if not name:
+            return []
+        return list(self._by_previous.get(name, ()))
+
+    def heads(self):
+        """
+        Get the names of the releases which are not the previous release of
+        any other release, in the order they appear in the list
+
+        :returns: A list of release names
+        """
+
+        heads = []
+        seen = set()
+        for release in self:
+            name = release.name
+            if name not in seen and name not in self._by_previous:
+                heads.append(name)
+            seen.add(name)
+        return heads
+
+
+class DependencyGraph(object):
+    """
+    The dependency graph of the releases of a map
+
+    Built from the dependencies lists computed by ``Map``. Use ``Map.graph`` to
+    get the graph of a map, which is computed only once while the releases of
+    the map are not changed.
+
+    Attributes:
+        dependencies: The dependencies lists (see ``Map.dependencies()``)
+        heads:        The names of the releases which are not the previous
+                      release of any other release
+    """
+
+    def __init__(self, dependencies):
+        """
+        The constructor
+
+        :param dependencies: The dependencies lists, as returned by
+                             ``Map.dependencies()``
+        """
 
-            if not new_suffix:
-                self.logger.debug("[guess]: Guessing new suffix")
-                self.logger.debug("[guess]: find latest release")
-                # Guess the latest release
-                head = self.guess_latest_release()
-                if head[3]:
-                    self.logger.debug("[guess]: Got suffix from latest")
-                    prev_ver = head[3]
+        self.dependencies = dependencies
+        self.heads = [dep[0] for dep in dependencies]
 
-                    # Bump the previous release version
-                    self.logger.debug("[guess]: Bumping release")
-                    new_ver = bump_version(prev_ver, abi_break)
-                    new_suffix = "".join(("_" + str(i) for i in new_ver if i is
-                                          not None))
+        # Maps each release name to its position in a dependency list
+        self._position = {}
+        for dep in dependencies:
+            for position, name in enumerate(dep):
+                if name not in self._position:
+                    self._position[name] = (dep, position)
 
-        if not new_prefix or not new_suffix:
-            # ERROR: could not guess the name
-            msg = "Insufficient information to guess the new release"\
-                  " name. Releases found do not have version"\
-                  " information or a valid library name. Please"\
-                  " provide the complete name of the release."
-            self.logger.error(msg)
-            raise Exception(msg)
+        self._topo_order = None
 
-        # Return the combination of the prefix and version
-        return new_prefix.upper() + new_suffix
+    def __contains__(self, name):
+        return name in self._position
 
-    def sort_releases_nice(self, top_release):
+    def chain(self, release):
         """
-        Sort the releases contained in a map file putting the dependencies of
-        ``top_release`` first. This changes the order of the list in
-        ``releases``.
+        Get the dependency path of a release
 
-        :param top_release: The release whose dependencies should be prioritized
+        :param release: The release name
+        :returns:       A list of the names of the releases in the path,
+                        starting from the given release. Empty if the release
+                        is not in the graph
         """
 
-        if not self.init:
-            msg = "Map not checked, run check()"
-            self.logger.error(msg)
-            raise Exception(msg)
+        if release not in self._position:
+            return []
+        dep, position = self._position[release]
+        return dep[position:]
 
-        # Use natural sorting
-        self.releases = sorted(self.releases, key=lambda release: _natural_sort_key(release.name), reverse=True)
-        dependencies = self.dependencies()
-        top_dependency = next((dependency for dependency in dependencies if
-                               dependency[0] == top_release))
+    def topo_order(self):
+        """
+        Get the releases in topological order
 
-        new_list = []
-        index = 0
+        Each release comes after its previous release, so the base releases
+        come first.
 
-        while self.releases:
-            release = self.releases.pop()
-            if release.name in top_dependency:
-                new_list.insert(index, release)
-                index += 1
-            else:
-                new_list.append(release)
+        :returns: A list of release names
+        """
 
-        self.releases = new_list
+        if self._topo_order is None:
+            order = []
+            seen = set()
+            for dep in self.dependencies:
+                for name in reversed(dep):
+                    if name not in seen:
+                        seen.add(name)
+                        order.append(name)
+            self._topo_order = order
+        return list(self._topo_order)
 
 
-class Release(object):
+class SymbolMatcher(object):
     """
-    A internal representation of a release version and its symbols
-
-    A release is usually identified by the library name (suffix) and the release
-    version (suffix). A release contains symbols, grouped by their visibility
-    scope (global or local).
+    Match symbols against groups of symbol names and glob patterns
 
-    In this class the symbols of a release are stored in a list of dictionaries
-    mapping a visibility scope name (e.g. \"global\") to a list of the contained
-    symbols:
-    ::
+    Each group is identified by a key (e.g. a release and a scope). The names
+    of all the groups are kept in a dictionary and their glob patterns are
+    combined in a single regular expression, so matching a symbol takes a
+    lookup and a regex match, whatever the number of groups and patterns.
 
-        ([{"global": [symbols]}, {"local": [local_symbols]}])
+    A name matches before any pattern. Otherwise, the key of the first group
+    (in the order given) with a pattern matching the symbol is returned. The
+    symbols between double quotes are names, even if they contain ``*``,
+    ``?`` or ``[``.
 
     Attributes:
-        name: The release name
-        previous: The previous release to which this release is dependent
-        symbols: The symbols contained in the release, grouped by the visibility
-                 scope.
+        keys: The keys of the groups containing glob patterns
     """
 
-    def __init__(self):
-        self.name = ''
-        self.previous = ''
-        self.released = False
-        self.symbols = dict()
+    # Old versions of the re module support at most 100 groups in a regular
+    # expression
+    _MAX_GROUPS = 99 if sys.version_info < (3, 5) else None
 
-    def __str__(self):
-        released = ""
-        vs = []
-        visibilities = sorted(self.symbols.keys())
-        if self.released:
-            released = "    # Released"
-        for v in visibilities:
-            symbols = sorted(self.symbols[v])
-            vs.extend([" " * 4, v, ":\n",
-                       "".join((" " * 8 + symbol + ";\n"
-                                for symbol in symbols))])
-        content = "".join(chain(self.name, released, "\n",
-                                "{\n", vs, "} ",
-                                self.previous, ";\n"))
-        return content
+    def __init__(self, groups=()):
+        """
+        The constructor
 
-    def duplicates(self):
-        duplicates = []
-        for scope, symbols in (self.symbols.items()):
-            seen = set()
-            release_dups = set()
-            if symbols:
-                for symbol in symbols:
-                    if symbol not in seen:
-                        seen.add(symbol)
-                    else:
-                        release_dups.add(symbol)
-                if release_dups:
-                    duplicates.append((scope, list(release_dups)))
-        return duplicates
+        :param groups: An iterable of tuples (key, symbols), where the symbols
+                       can be names or glob patterns. The keys should not be
+                       ``None``
+        """
+
+        self.keys = []
+        self._names = {}
+
+        parts = []
+        for key, symbols in groups:
+            regexes = []
+            for symbol in symbols:
+                if symbol.startswith('"') and symbol.endswith('"'):
+                    symbol = symbol[1:-1]
+                elif is_glob(symbol):
+                    regexes.append(glob_to_regex(symbol))
+                    continue
+                if symbol not in self._names:
+                    self._names[symbol] = key
+            if regexes:
+                parts.append("(?P<_{0}>{1})".format(len(self.keys),
+                                                    "|".join(regexes)))
+                self.keys.append(key)
+
+        step = self._MAX_GROUPS or len(parts) or 1
+        self._matchers = [re.compile("(?:{0})\\Z"
+                                     .format("|".join(parts[i:i + step])))
+                          .match for i in range(0, len(parts), step)]
+
+    def match(self, symbol):
+        """
+        Find the group matching a symbol
+
+        :param symbol: The symbol name
+        :returns:      The key of the group, or ``None`` if no group matches
+        """
+
+        key = self._names.get(symbol)
+        if key is not None:
+            return key
+        return self.match_pattern(symbol)
+
+    def match_name(self, symbol):
+        """
+        Find the group containing a symbol by name
+
+        :param symbol: The symbol name
+        :returns:      The key of the group, or ``None`` if no group contains
+                       the name
+        """
+
+        return self._names.get(symbol)
+
+    def match_pattern(self, symbol):
+        """
+        Find the first group with a glob pattern matching a symbol
+
+        :param symbol: The symbol name
+        :returns:      The key of the group, or ``None`` if no pattern matches
+        """
+
+        for match in self._matchers:
+            m = match(symbol)
+            if m is not None:
+                return self.keys[int(m.lastgroup[1:])]
+        return None
 
 
 ###############################################################################
 # Utility functions
 ###############################################################################
 
+def log_diagnostics(logger, diagnostics):
+    """
+    Log the diagnostics found when checking a map
+
+    The consecutive diagnostics of the same kind are logged in groups (e.g.
+    the duplicated symbols are listed under the release and scope in which
+    they were found).
+
+    :param logger:      The logger to use
+    :param diagnostics: A list of ``Diagnostic``, as returned by
+                        ``Map.check()``
+    """
+
+    for code, group in groupby(diagnostics, attrgetter("code")):
+        if code == "duplicate-symbol":
+            for release, by_release in groupby(group, attrgetter("release")):
+                logger.warning("Duplicates found in release \'%s\':", release)
+                for scope, by_scope in groupby(by_release,
+                                               attrgetter("scope")):
+                    logger.warning("    %s:", scope)
+                    logger.warning("\n".join(" " * 8 + d.symbol
+                                             for d in by_scope))
+        elif code == "symbol-in-multiple-releases":
+            for symbol, by_symbol in groupby(group, attrgetter("symbol")):
+                logger.warning("The symbol '%s' was found in more than one"
+                               " release:", symbol)
+                for d in by_symbol:
+                    logger.warning("    %s: in '%s'", d.release, d.scope)
+        elif code == "multiple-wildcards":
+            logger.warning("The \'*\' wildcard was found in more than one"
+                           " place:")
+            for d in group:
+                logger.warning("    %s: in \'%s\'", d.release, d.scope)
+        elif code == "multiple-base-versions":
+            logger.warning("More than one release seem to be the base version"
+                           " (contain the local wildcard and do not have a"
+                           " predecessor version):")
+            for d in group:
+                logger.warning("    %s", d.release)
+        elif code == "dependencies":
+            logger.info("Found dependencies:")
+            for d in group:
+                logger.info("    %s->", d.message)
+        else:
+            for d in group:
+                logger.log(VERBOSITY_MAP[d.severity], "%s", d.message)
+
+
 def get_version_from_string(version_string):
     """
     Get the version numbers from a string
@@ -963,6 +4048,58 @@ def bump_version(version, abi_break):
     return new_version
 
 
+def is_glob(symbol):
+    """
+    Check if a symbol in a scope is a glob pattern
+
+    :param symbol: The symbol
+    :returns:      True if the symbol contains ``*``, ``?`` or ``[``
+    """
+
+    return _GLOB_CHARS.search(symbol) is not None
+
+
+def glob_to_regex(pattern):
+    """
+    Translate a glob pattern to a regular expression
+
+    As in the version scripts, ``*`` matches any sequence of characters, ``?``
+    matches any character and a bracket expression (e.g. ``[a-z]``, or
+    ``[!a-z]`` for the characters not in the set) matches one of the
+    characters in the set. The other characters match themselves.
+
+    :param pattern: The glob pattern
+    :returns:       The regular expression, without anchors
+    """
+
+    regex = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            regex.append('.*')
+        elif c == '?':
+            regex.append('.')
+        elif c == '[':
+            start = i
+            if start < n and pattern[start] in '!^':
+                start += 1
+            end = pattern.find(']', start)
+            if end <= start:
+                # Not a valid bracket expression
+                regex.append(re.escape(c))
+            else:
+                negate = '^' if start > i else ''
+                regex.append('[' + negate +
+                             pattern[start:end].replace('\\', '\\\\') + ']')
+                i = end + 1
+        else:
+            regex.append(re.escape(c))
+    return ''.join(regex)
+
+
 def clean_symbols(symbols):
     """
     Receives a list of lines read from the input and returns a list of words
@@ -978,7 +4115,7 @@ def clean_symbols(symbols):
     clean = []
     if symbols:
         no_invalid = chain(*(re.split(r'\W+', i) for i in symbols))
-        clean.extend((i for i in no_invalid if i))
+        clean.extend((_intern(i) for i in no_invalid if i))
 
     # Report duplicated symbols
     if clean:
@@ -1027,15 +4164,207 @@ def check_files(out_arg, out_name, in_arg, in_name, dry):
                 logger.warning("Moving \'%s\' to \'%s.old\'.", str(in_name),
                                str(in_name))
                 try:
-                    # If it is the case, copy to another file to
-                    # preserve the content
-                    shutil.copy2(str(in_name), str(in_name) + ".old")
+                    # If it is the case, keep the content in another file
+                    _backup(str(in_name), str(in_name) + ".old")
                 except Exception as e:
                     logger.error("Could not copy \'%s\' to \'%s.old\'."
                                  " Aborting.", str(in_name), str(in_name))
                     raise e
 
 
+def _can_replace(path):
+    """
+    Check if a file can be replaced by a new file keeping its attributes
+
+    Only regular files in directories where the new file can be created are
+    replaced. Files owned by another user, with a group which the user cannot
+    give to the new file, or with extended attributes (e.g. ACLs) are not, as
+    the new file would not keep them.
+
+    :param path: The real path to the file
+    :returns:    True if the file can be replaced, or does not exist and can
+                 be created by replacing; False if it has to be written in
+                 place
+    """
+
+    directory = os.path.dirname(path)
+    if not os.access(directory, os.W_OK | os.X_OK):
+        return False
+    if not os.path.exists(path):
+        return True
+    if not os.path.isfile(path):
+        return False
+    if hasattr(os, "geteuid"):
+        st = os.stat(path)
+        euid = os.geteuid()
+        if st.st_uid != euid:
+            return False
+        if euid != 0 and st.st_gid != os.getegid() and \
+                st.st_gid not in os.getgroups():
+            return False
+    listxattr = getattr(os, "listxattr", None)
+    if listxattr is not None:
+        try:
+            if listxattr(path):
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def _backup(filename, backup):
+    """
+    Keep the content of a file which is going to be written in a backup file
+
+    If the file will be replaced by a new file (see ``write_file()``), the
+    backup is a hard link to it, created with a temporary name and renamed,
+    so the content is not copied. If the content of the file does not
+    change, the file is not replaced and the backup stays linked to it.
+    If the file will be written in place, if the link cannot be created, or
+    if the existing backup is read-only, the file is copied.
+
+    :param filename: The path to the file
+    :param backup:   The path to the backup file
+    """
+
+    path = os.path.realpath(filename)
+    if hasattr(os, "link") and _can_replace(path) and \
+            (not os.path.exists(backup) or os.access(backup, os.W_OK)):
+        import tempfile
+
+        # The link fails if the name exists, so the name cannot be taken
+        tmp = tempfile.mktemp(dir=os.path.dirname(os.path.abspath(backup)),
+                              prefix="." + os.path.basename(backup) + ".",
+                              suffix=".tmp")
+        try:
+            os.link(path, tmp)
+        except OSError:
+            pass
+        else:
+            try:
+                _replace(tmp, backup)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            return
+
+    # A backup linked to the file before is replaced by a copy
+    if os.path.exists(backup) and os.path.samefile(path, backup):
+        os.remove(backup)
+
+    import shutil
+    shutil.copy2(filename, backup)
+
+
+def _write_in_place(filename, lines, sync=False):
+    """
+    Write the lines to a file, truncating it
+
+    If the new content is identical to the existing regular file, the file is
+    not modified.
+
+    :param filename: The path to the file
+    :param lines:    An iterable of the lines to write
+    :param sync:     Flush the content to the disk
+    :returns:        True if the file was written; False if it was not
+                     modified
+    """
+
+    content = "".join(lines)
+    regular = os.path.isfile(filename)
+    if regular:
+        with open(filename, "r") as f:
+            if f.read() == content:
+                return False
+
+    with open(filename, "w") as f:
+        f.write(content)
+        if sync and regular:
+            f.flush()
+            os.fsync(f.fileno())
+    return True
+
+
+def write_file(filename, lines, sync=False):
+    """
+    Write the lines to a file atomically
+
+    The lines are written to a temporary file in the same directory, which
+    then replaces the file. Readers of the file never see it partially
+    written, and the file is not truncated if the writing fails.
+
+    Files which cannot be replaced keeping their attributes (see
+    ``_can_replace()``), and other files than regular files (e.g.
+    ``/dev/stdout``) are written in place instead.
+
+    If the new content is identical to the existing file, the file is not
+    modified (keeping its modification time).
+
+    :param filename: The path to the file
+    :param lines:    An iterable of the lines to write
+    :param sync:     Flush the content to the disk before replacing the file
+    :returns:        True if the file was written; False if it was not
+                     modified
+    """
+
+    import filecmp
+    import tempfile
+
+    # Other files than regular files are opened as given (e.g. /dev/stdout
+    # is a link to a pipe, which has no path)
+    if os.path.exists(filename) and not os.path.isfile(filename):
+        return _write_in_place(filename, lines, sync)
+
+    # Replace the target of a symbolic link, not the link
+    path = os.path.realpath(filename)
+    directory = os.path.dirname(path)
+
+    if not _can_replace(path):
+        return _write_in_place(path, lines, sync)
+
+    fd, tmp = tempfile.mkstemp(dir=directory,
+                               prefix="." + os.path.basename(path) + ".",
+                               suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(lines)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        if os.path.isfile(path):
+            if filecmp.cmp(tmp, path, shallow=False):
+                os.remove(tmp)
+                return False
+            st = os.stat(path)
+            mode = st.st_mode & 0o7777
+            # Keep the group of the file
+            if os.stat(tmp).st_gid != st.st_gid:
+                os.chown(tmp, -1, st.st_gid)
+        else:
+            # Use the permissions of a file created with open()
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp, mode)
+
+        _replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    if sync and hasattr(os, "O_DIRECTORY"):
+        # Make the rename durable
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    return True
+
+
 def get_info_from_args(args):
     """
     Get the release information from the provided arguments
@@ -1081,7 +4410,301 @@ def get_info_from_args(args):
             logger.error(msg)
             raise Exception(msg)
 
-    return release_info
+    return release_info
+
+
+def get_symbols_from_args(args):
+    """
+    Get the list of symbols from the input given in the arguments
+
+    The symbols are read from the exported symbols of the ELF file given with
+    \'--from-elf\', from the file given with \'--in\', or from stdin, in
+    this order of preference. Symbols read from text are separated by
+    whitespaces.
+
+    :param args: Arguments given in command line parsed by argparse
+    :returns:    A list of the symbols read
+    """
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__)
+
+    from_elf = getattr(args, "from_elf", None)
+    if from_elf:
+        logger.debug("Reading symbols from \'%s\'", from_elf)
+        from .elf import ELFFile
+        with ELFFile(from_elf) as elf:
+            return elf.exported_symbols()
+
+    symbols = []
+    lines = None
+    if args.input:
+        with open(args.input, "r") as symbols_fp:
+            lines = symbols_fp.readlines()
+    else:
+        # Read from stdin
+        lines = sys.stdin.readlines()
+
+    for line in lines:
+        symbols.extend(line.split())
+
+    return symbols
+
+
+def read_manifest(filename):
+    """
+    Read a manifest file listing the files to be processed in batch
+
+    Each non-empty line contains whitespace separated fields (e.g. the map file
+    followed by the file containing the symbols). Lines starting with ``#`` are
+    ignored.
+
+    :param filename: The path to the manifest file
+    :returns:        A list of the lists of fields of each line
+    """
+
+    entries = []
+    with open(filename, "r") as f:
+        for line in f:
+            fields = line.split()
+            if fields and not fields[0].startswith("#"):
+                entries.append(fields)
+    return entries
+
+
+def _read_map(args, filename, logger, modify=False):
+    """
+    Read and check the map file used by a command
+
+    If the command is run by the server (see ``abimap.server``), the maps
+    kept in memory by the server are used.
+
+    :param args:     Arguments given in command line parsed by argparse
+    :param filename: The path to the map file
+    :param logger:   The logger object
+    :param modify:   Indicates if the map will be modified by the command
+    :returns:        The checked map
+    """
+
+    maps = getattr(args, "maps", None)
+    if maps is None:
+        return Map(filename=filename, logger=logger,
+                   cache_dir=getattr(args, "cache_dir", None))
+
+    if modify:
+        return maps.take(filename, logger, getattr(args, "cache_dir", None))
+    return maps.get(filename, logger, getattr(args, "cache_dir", None))
+
+
+def _run_captured(name, level, work):
+    """
+    Run a function capturing the messages logged and the output to stdout
+
+    Used to run the work for a single file in batch mode, so that the results
+    can be reported per file.
+
+    :param name:  The name identifying the work (usually the file name)
+    :param level: The logging level to use
+    :param work:  The function to run, called without arguments
+    :returns:     A tuple (name, records, output, error), where records is a
+                  list of (level, message), output is the text written to
+                  stdout, and error is the error message or None
+    """
+
+    logger = Single_Logger.getLogger(__name__)
+
+    collector = _RecordCollector()
+    handlers = logger.handlers[:]
+    saved_level = logger.level
+    stdout = sys.stdout
+
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(collector)
+    logger.setLevel(level)
+    sys.stdout = StringIO()
+
+    error = None
+    try:
+        work()
+    except Exception as e:
+        error = str(e)
+    finally:
+        output = sys.stdout.getvalue()
+        sys.stdout = stdout
+        # Remove the collector and the handlers added by the work (e.g. for a
+        # log file), which would otherwise be kept by a long-running process
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            if handler is not collector:
+                handler.close()
+        for handler in handlers:
+            logger.addHandler(handler)
+        logger.setLevel(saved_level)
+
+    return (name, collector.records, output, error)
+
+
+def _check_file(filename, level, cache_dir):
+    """
+    Read and check a map file, capturing the results (see ``_run_captured()``)
+
+    :param filename:  The path to the map file
+    :param level:     The logging level to use
+    :param cache_dir: The directory to cache the parsed map
+    :returns:         A tuple (name, records, output, error)
+    """
+
+    def work():
+        Map(filename=filename, cache_dir=cache_dir)
+
+    return _run_captured(filename, level, work)
+
+
+def _diagnose_file(filename, level, cache_dir):
+    """
+    Read and check a map file, collecting the diagnostics instead of logging
+    them (see ``_run_captured()``)
+
+    If the file cannot be read, the error is added to the diagnostics.
+
+    :param filename:  The path to the map file
+    :param level:     The logging level to use
+    :param cache_dir: The directory to cache the parsed map
+    :returns:         A tuple (name, records, diagnostics, error), where
+                      diagnostics is a list of tuples (see
+                      ``Diagnostic.as_tuple()``)
+    """
+
+    diagnostics = []
+
+    def work():
+        m = Map(cache_dir=cache_dir)
+        try:
+            m.read(filename, log=False)
+        except ParserError as e:
+            diagnostics.append(Diagnostic("syntax-error", "error", e.message,
+                                          location=(filename, e.line + 1,
+                                                    e.column)))
+            raise
+        except Exception as e:
+            diagnostics.append(Diagnostic("error", "error", str(e),
+                                          location=(filename, None, None)))
+            raise
+        diagnostics.extend(m.diagnostics)
+
+    name, records, _, error = _run_captured(filename, level, work)
+    return (name, records, [d.as_tuple() for d in diagnostics], error)
+
+
+def _check_chain(releases, filename):
+    """
+    Check the symbols and scopes of the releases of a dependency chain (see
+    ``Map._check_release()``)
+
+    Used to check the chains of a map in parallel (see ``Map.check()``).
+
+    :param releases: A list of tuples (name, previous, line, symbols), where
+                     symbols is a dictionary mapping the scopes to the
+                     symbols
+    :param filename: The file name used in the location of the diagnostics
+    :returns:        A list with a tuple (duplicates, scopes) for each
+                     release, where duplicates and scopes are lists of tuples
+                     (see ``Diagnostic.as_tuple()``)
+    """
+
+    m = Map()
+    results = []
+    for name, previous, line, symbols in releases:
+        r = Release()
+        r.name = name
+        r.previous = previous
+        r.line = line
+        r.symbols = symbols
+        duplicates, scopes = m._check_release(r, filename)
+        results.append(([d.as_tuple() for d in duplicates],
+                        [d.as_tuple() for d in scopes]))
+    return results
+
+
+def _update_file(args, level):
+    """
+    Update a map file, capturing the results (see ``_run_captured()``)
+
+    :param args:  The arguments for ``update()`` for this file
+    :param level: The logging level to use
+    :returns:     A tuple (name, records, output, error)
+    """
+
+    def work():
+        update(args)
+
+    return _run_captured(args.file, level, work)
+
+
+def run_batch(worker, items, jobs=1):
+    """
+    Call the worker for each item, in parallel using a pool of processes if
+    more than one job is allowed
+
+    If ``concurrent.futures`` is not available, the items are processed
+    serially.
+
+    :param worker: The function to call, which must be picklable
+    :param items:  A list of tuples of arguments to the worker
+    :param jobs:   The maximum number of processes. If 0 or None, the number
+                   of processors is used
+    :returns:      A list of the results, in the same order of the items
+    """
+
+    executor_class = None
+    if jobs != 1 and len(items) > 1:
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            executor_class = ProcessPoolExecutor
+        except ImportError:
+            pass
+
+    if executor_class is None:
+        return [worker(*item) for item in items]
+
+    with executor_class(max_workers=jobs or None) as executor:
+        futures = [executor.submit(worker, *item) for item in items]
+        return [future.result() for future in futures]
+
+
+def report_batch(results):
+    """
+    Report the results of the files processed in batch
+
+    The output of each file is printed after its name and the messages
+    logged are logged again prefixed by the file name.
+
+    :param results: A list of tuples (name, records, output, error)
+    :raises Exception: Raised if the processing of any file failed
+    """
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__)
+
+    failed = []
+    for name, records, output, error in results:
+        if output:
+            print("{0}:".format(name))
+            print(output)
+        for level, message in records:
+            logger.log(level, "%s: %s", name, message)
+        if error is not None:
+            # Avoid repeating errors already logged
+            if not any(error in message for _, message in records):
+                logger.error("%s: %s", name, error)
+            failed.append(name)
+
+    if failed:
+        msg = "{0} of {1} files failed: {2}".format(len(failed), len(results),
+                                                    ", ".join(failed))
+        logger.error(msg)
+        raise Exception(msg)
 
 
 ###############################################################################
@@ -1126,6 +4749,17 @@ def update(args):
     if args.verbosity:
         logger.setLevel(VERBOSITY_MAP[args.verbosity])
 
+    # In batch mode, update each map listed in the manifest
+    manifest = getattr(args, "manifest", None)
+    if manifest:
+        update_batch(args)
+        return
+
+    if not args.file:
+        msg = "Please provide the map file to update"
+        logger.error(msg)
+        raise Exception(msg)
+
     # If output would be overwritten, print a warning
     if args.out:
         if os.path.isfile(args.out):
@@ -1143,23 +4777,13 @@ def update(args):
     release_info = get_info_from_args(args)
 
     # Read the current map file
-    cur_map = Map(filename=args.file, logger=logger)
+    cur_map = _read_map(args, args.file, logger, modify=True)
 
     # Get all global symbols (it is a set)
     all_symbols = cur_map.all_global_symbols()
 
     # Generate the list of the new symbols
-    new_symbols = []
-    lines = None
-    if args.input:
-        with open(args.input, "r") as symbols_fp:
-            lines = symbols_fp.readlines()
-    else:
-        # Read from stdin
-        lines = sys.stdin.readlines()
-
-    for line in lines:
-        new_symbols.extend(line.split())
+    new_symbols = get_symbols_from_args(args)
 
     # Clean the input removing invalid symbols
     new_symbols = clean_symbols(new_symbols)
@@ -1192,13 +4816,7 @@ def update(args):
                                symbol)
     # If the list of all symbols are being compared (the default option)
     else:
-        for symbol in new_set:
-            if symbol not in all_symbols:
-                added_set.add(symbol)
-
-        for symbol in all_symbols:
-            if symbol not in new_set:
-                removed_set.add(symbol)
+        added_set, removed_set = cur_map.compare_symbols(new_set)
 
     # Make lists from the sets
     added = list(added_set)
@@ -1228,8 +4846,8 @@ def update(args):
 
     if added:
         if release_info:
-            for to_up in cur_map.releases:
-                if to_up and to_up.name == release_info[0]:
+            for to_up in cur_map.releases.find(release_info[0]):
+                if to_up:
                     # If the release to be modified is released
                     if to_up.released:
                         msg = "Released releases cannot be modified. Abort."
@@ -1243,7 +4861,6 @@ def update(args):
             # Guess the name for the new release
             r.name = cur_map.guess_name(release_info, guess=args.guess)
             r.name.upper()
-            r.symbols['global'] = []
 
             if not removed:
                 # Add the name for the previous release
@@ -1257,7 +4874,7 @@ def update(args):
             r.released = True
 
         # Add the symbols added to global scope
-        r.symbols['global'].extend(added)
+        r.add_symbols('global', added)
     if removed:
         if not args.allow_abi_break:
             msg = "ABI break detected: symbols would be removed"
@@ -1303,8 +4920,9 @@ def update(args):
         # Substitute the map
         cur_map = new_map
 
-    # Do a structural check
-    cur_map.check()
+    # Do a structural check. Only the releases changed are checked again,
+    # unless the map was replaced
+    cur_map.check(incremental=True)
 
     # Sort the releases putting the new release and dependencies first
     cur_map.sort_releases_nice(r.name)
@@ -1313,25 +4931,115 @@ def update(args):
         print("This is a dry run, the files were not modified.")
         return
 
-    try:
-        if args.out:
-            f = open(args.out, "w")
-        else:
-            f = sys.stdout
+    # Set the name of the application in the output
+    name_version = None
+    if args.program:
+        name_version = "{0}-{1}".format(args.program, __version__)
+    else:
+        name_version = "abimap-{0}".format(__version__)
 
-        # Set the name of the application in the output
-        name_version = None
-        if args.program:
-            name_version = "{0}-{1}".format(args.program, __version__)
-        else:
-            name_version = "abimap-{0}".format(__version__)
+    lines = chain(["# This map file was updated with"
+                   " {0}\n\n".format(name_version)], cur_map.iter_lines())
+    if args.out:
+        if not write_file(args.out, lines, getattr(args, "fsync", False)):
+            logger.info("\'%s\' is up to date, not modified", args.out)
+    else:
+        sys.stdout.writelines(lines)
 
-        f.write("# This map file was updated with"
-                " {0}\n\n".format(name_version))
-        f.write(str(cur_map))
-    finally:
-        if args.out:
-            f.close()
+
+def update_batch(args):
+    """
+    Update the maps listed in the manifest given in the arguments
+
+    Each line of the manifest contains the path to a map file, the path to
+    the file containing the symbols, and optionally the output file. If the
+    output file is not given, the map file is updated in place. The other
+    arguments are applied to all maps.
+
+    :param args: Arguments given in command line parsed by argparse
+    """
+
+    import argparse
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__)
+
+    items = []
+    for entry in read_manifest(args.manifest):
+        if len(entry) < 2:
+            msg = "Missing the symbols file for \'{0}\' in the manifest"\
+                  .format(entry[0])
+            logger.error(msg)
+            raise Exception(msg)
+
+        file_args = argparse.Namespace(**vars(args))
+        file_args.manifest = None
+        file_args.logfile = None
+        file_args.file = entry[0]
+        file_args.input = entry[1]
+        file_args.from_elf = None
+        file_args.out = entry[2] if len(entry) > 2 else entry[0]
+        items.append((file_args, logger.getEffectiveLevel()))
+
+    report_batch(run_batch(_update_file, items, getattr(args, "jobs", 1)))
+
+
+def batch_update(map, deltas, out=None, allow_abi_break=False, guess=True,
+                 program=None, sync=False, cache_dir=None):
+    """
+    Apply many symbol changes to a map, reading and writing it only once
+
+    The map is read (if a path is given), the changes are applied with
+    ``Map.apply()``, which checks the map once, and the result is written to
+    ``out``. This is the library counterpart of calling ``update()`` once for
+    each change.
+
+    :param map:             The path to the map file, or a checked ``Map``
+    :param deltas:          An iterable of changes (see ``Map.apply()``)
+    :param out:             The path of the output file. If not given, the
+                            map file is updated in place
+    :param allow_abi_break: Allow the removal of symbols
+    :param guess:           Guess the names of the new releases
+    :param program:         The name of the program written in the header
+    :param sync:            Flush the output to the disk (see
+                            ``write_file()``)
+    :param cache_dir:       The directory where the parsed maps are cached
+    :returns:               The updated ``Map``
+    :raises Exception:      Raised if no output file can be determined, or if
+                            the changes cannot be applied
+    """
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__)
+
+    if isinstance(map, Map):
+        cur_map = map
+    else:
+        cur_map = Map(filename=map, logger=logger, cache_dir=cache_dir)
+
+    if not out:
+        out = cur_map.filename
+    if not out:
+        msg = "Please provide the output file"
+        logger.error(msg)
+        raise Exception(msg)
+
+    added, removed = cur_map.apply(deltas, allow_abi_break=allow_abi_break,
+                                   guess=guess)
+
+    if added or removed:
+        # Sort the releases putting the latest release and dependencies first
+        latest = cur_map.guess_latest_release()[0]
+        if latest:
+            cur_map.sort_releases_nice(latest)
+
+    name_version = "{0}-{1}".format(program or "abimap", __version__)
+    lines = chain(["# This map file was updated with"
+                   " {0}\n\n".format(name_version)], cur_map.iter_lines())
+    if not write_file(out, lines, sync):
+        logger.info("\'%s\' is up to date, not modified", out)
+
+    return cur_map
 
 
 def new(args):
@@ -1378,17 +5086,7 @@ def new(args):
     logger.debug(str(release_info))
 
     # Generate the list of the new symbols
-    new_symbols = []
-    lines = None
-    if args.input:
-        with open(args.input, "r") as symbols_fp:
-            lines = symbols_fp.readlines()
-    else:
-        # Read from stdin
-        lines = sys.stdin.readlines()
-
-    for line in lines:
-        new_symbols.extend(line.split())
+    new_symbols = get_symbols_from_args(args)
 
     # Clean the input removing invalid symbols
     new_symbols = clean_symbols(new_symbols)
@@ -1429,25 +5127,21 @@ def new(args):
             print("This is a dry run, the files were not modified.")
             return
 
-        try:
-            if args.out:
-                f = open(args.out, "w")
-            else:
-                f = sys.stdout
-
-            # Set the name of the application in the output
-            name_version = None
-            if args.program:
-                name_version = "{0}-{1}".format(args.program, __version__)
-            else:
-                name_version = "abimap-{0}".format(__version__)
+        # Set the name of the application in the output
+        name_version = None
+        if args.program:
+            name_version = "{0}-{1}".format(args.program, __version__)
+        else:
+            name_version = "abimap-{0}".format(__version__)
 
-            f.write("# This map file was created with"
-                    " {0}\n\n".format(name_version))
-            f.write(str(new_map))
-        finally:
-            if args.out:
-                f.close()
+        lines = chain(["# This map file was created with"
+                       " {0}\n\n".format(name_version)],
+                      new_map.iter_lines())
+        if args.out:
+            if not write_file(args.out, lines, getattr(args, "fsync", False)):
+                logger.info("\'%s\' is up to date, not modified", args.out)
+        else:
+            sys.stdout.writelines(lines)
     else:
         logger.warning("No valid symbols provided. Nothing done.")
 
@@ -1468,15 +5162,356 @@ def check(args):
     logger.debug("Arguments provided: ")
     logger.debug(str(args))
 
+    # Set the verbosity if provided
+    if args.verbosity:
+        logger.setLevel(VERBOSITY_MAP[args.verbosity])
+
+    files = args.file
+    if not isinstance(files, (list, tuple)):
+        files = [files]
+    files = list(files)
+
+    manifest = getattr(args, "manifest", None)
+    if manifest:
+        files.extend(entry[0] for entry in read_manifest(manifest))
+
+    if not files:
+        msg = "Please provide the map files to check"
+        logger.error(msg)
+        raise Exception(msg)
+
+    level = logger.getEffectiveLevel()
+    jobs = getattr(args, "jobs", 1)
+
+    if getattr(args, "format", "text") == "json":
+        import json
+
+        # Print the diagnostics of all files in a single JSON list
+        items = [(filename, level, args.cache_dir) for filename in files]
+        results = run_batch(_diagnose_file, items, jobs)
+        print(json.dumps([Diagnostic(*d).as_dict()
+                          for _, _, diagnostics, _ in results
+                          for d in diagnostics], sort_keys=True))
+        report_batch([(name, records, None, error)
+                      for name, records, _, error in results])
+        return
+
+    if len(files) == 1 and not manifest:
+        # Read the map file (the map is checked when read)
+        _read_map(args, files[0], logger)
+        return
+
+    # Check the files in batch, reporting the results per file
+    items = [(filename, level, args.cache_dir) for filename in files]
+    report_batch(run_batch(_check_file, items, jobs))
+
+
+def verify(args):
+    """
+    \'verify\' subcommand
+
+    Cross-check the symbols and versions of a shared object against a map.
+    The differences are printed and an exception is raised if any is found.
+
+    :param args: Arguments given in command line parsed by argparse
+    """
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__, filename=args.logfile)
+
+    logger.info("Command: verify")
+    logger.debug("Arguments provided: ")
+    logger.debug(str(args))
+
     # Set the verbosity if provided
     if args.verbosity:
         logger.setLevel(VERBOSITY_MAP[args.verbosity])
 
     # Read the map file
-    abimap = Map(filename=args.file, logger=logger)
+    cur_map = _read_map(args, args.file, logger)
+
+    result = cur_map.verify(args.binary)
+
+    sections = [("Exported but not listed in the map:",
+                 result["unlisted"]),
+                ("Listed in the map but not exported:",
+                 ("{0}: {1}".format(release, symbol) for release, symbol in
+                  result["missing"])),
+                ("Bound to the wrong version:",
+                 ("{0}: bound to {1}, listed in {2}".format(symbol,
+                                                            ", ".join(versions),
+                                                            ", ".join(releases))
+                  for symbol, releases, versions in result["wrong_version"])),
+                ("Releases not defined in the binary:",
+                 result["missing_versions"]),
+                ("Versions not defined in the map:",
+                 result["unknown_versions"])]
+
+    found = False
+    for title, items in sections:
+        items = list(items)
+        if items:
+            found = True
+            msg = "".join(chain(title + "\n",
+                                ("    " + item + "\n" for item in items)))
+            print(msg)
+
+    if found:
+        msg = "The binary \'{0}\' does not match the map \'{1}\'"\
+              .format(args.binary, args.file)
+        logger.error(msg)
+        raise Exception(msg)
+
+    logger.info("The binary matches the map")
+
+
+def diff(args):
+    """
+    \'diff\' subcommand
+
+    Compare two versions of a map. The differences are printed and an
+    exception is raised if the change breaks the ABI.
+
+    :param args: Arguments given in command line parsed by argparse
+    """
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__, filename=args.logfile)
+
+    logger.info("Command: diff")
+    logger.debug("Arguments provided: ")
+    logger.debug(str(args))
+
+    # Set the verbosity if provided
+    if args.verbosity:
+        logger.setLevel(VERBOSITY_MAP[args.verbosity])
+
+    # Read the map files
+    old_map = _read_map(args, args.old, logger)
+    new_map = _read_map(args, args.new, logger)
+
+    result = old_map.diff(new_map)
+
+    if getattr(args, "format", "text") == "json":
+        import json
+
+        print(json.dumps(result, sort_keys=True))
+    else:
+        sections = [("Added:",
+                     ("{0}: {1}".format(release, symbol) for release, symbol
+                      in result["added"])),
+                    ("Removed:",
+                     ("{0}: {1}".format(release, symbol) for release, symbol
+                      in result["removed"])),
+                    ("Moved:",
+                     ("{0}: from {1} to {2}".format(symbol,
+                                                    ", ".join(old) or "-",
+                                                    ", ".join(new) or "-")
+                      for symbol, old, new in result["moved"])),
+                    ("Added releases:", result["added_releases"]),
+                    ("Removed releases:", result["removed_releases"]),
+                    ("Renamed releases:",
+                     ("{0} -> {1}".format(old, new) for old, new in
+                      result["renamed_releases"])),
+                    ("Changed previous releases:",
+                     ("{0}: from {1} to {2}".format(release, old or "-",
+                                                    new or "-")
+                      for release, old, new in
+                      result["reparented_releases"]))]
+
+        for title, items in sections:
+            items = list(items)
+            if items:
+                msg = "".join(chain(title + "\n",
+                                    ("    " + item + "\n" for item in items)))
+                print(msg)
+
+    if not result["compatible"]:
+        msg = "The changes from \'{0}\' to \'{1}\' break the ABI"\
+              .format(args.old, args.new)
+        logger.error(msg)
+        raise Exception(msg)
+
+    logger.info("The changes are compatible")
+
+
+def merge(args):
+    """
+    \'merge\' subcommand
+
+    Merge the changes made to a map in two versions of it (see
+    ``Map.merge()``). Can be used as a git merge driver::
+
+        abimap merge %O %A %B -o %A
+
+    The merged map is written even if conflicts are found, keeping the
+    changes from \'ours\', and an exception is raised.
+
+    :param args: Arguments given in command line parsed by argparse
+    """
+
+    import filecmp
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__, filename=args.logfile)
+
+    logger.info("Command: merge")
+    logger.debug("Arguments provided: ")
+    logger.debug(str(args))
+
+    # Set the verbosity if provided
+    if args.verbosity:
+        logger.setLevel(VERBOSITY_MAP[args.verbosity])
+
+    # If one of the versions did not change the map, the result is the other
+    result = None
+    if filecmp.cmp(args.ours, args.theirs, shallow=False) or \
+            filecmp.cmp(args.base, args.theirs, shallow=False):
+        result = args.ours
+    elif filecmp.cmp(args.base, args.ours, shallow=False):
+        result = args.theirs
+
+    if result is not None:
+        logger.info("Only one version changed the map, using \'%s\'",
+                    result)
+        if args.dry:
+            print("This is a dry run, the files were not modified.")
+            return
+        with open(result, "r") as f:
+            if args.out:
+                if not write_file(args.out, f, getattr(args, "fsync", False)):
+                    logger.info("\'%s\' is up to date, not modified",
+                                args.out)
+            else:
+                sys.stdout.writelines(f)
+        return
+
+    # Only the lines changed from the base are parsed in the other versions
+    base_map = Map(logger=logger, cache_dir=args.cache_dir)
+    base_map.read(args.base, stream=False)
+    ours_map = Map(logger=logger, cache_dir=args.cache_dir)
+    ours_map.read(args.ours, base=base_map)
+    theirs_map = Map(logger=logger, cache_dir=args.cache_dir)
+    theirs_map.read(args.theirs, base=base_map)
+
+    merged, conflicts = ours_map.merge(base_map, theirs_map)
+
+    # Do a structural check
+    merged.check()
+
+    for conflict in conflicts:
+        logger.error("Conflict: %s", conflict)
+
+    if args.dry:
+        print("This is a dry run, the files were not modified.")
+    else:
+        # Set the name of the application in the output
+        name_version = None
+        if args.program:
+            name_version = "{0}-{1}".format(args.program, __version__)
+        else:
+            name_version = "abimap-{0}".format(__version__)
+
+        lines = chain(["# This map file was merged with"
+                       " {0}\n\n".format(name_version)], merged.iter_lines())
+        if args.out:
+            if not write_file(args.out, lines, getattr(args, "fsync", False)):
+                logger.info("\'%s\' is up to date, not modified", args.out)
+        else:
+            sys.stdout.writelines(lines)
+
+    if conflicts:
+        msg = "{0} conflicts found merging \'{1}\' and \'{2}\'"\
+              .format(len(conflicts), args.ours, args.theirs)
+        logger.error(msg)
+        raise Exception(msg)
+
+
+def serve(args):
+    """
+    \'serve\' subcommand
+
+    Run the commands requested by clients over a Unix socket, keeping the
+    maps read in memory (see ``abimap.server``), until stopped.
+
+    :param args: Arguments given in command line parsed by argparse
+    """
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__, filename=args.logfile)
+
+    logger.info("Command: serve")
+    logger.debug("Arguments provided: ")
+    logger.debug(str(args))
+
+    # Set the verbosity if provided
+    if args.verbosity:
+        logger.setLevel(VERBOSITY_MAP[args.verbosity])
+
+    if not args.socket:
+        msg = "Please provide the path of the socket"
+        logger.error(msg)
+        raise Exception(msg)
+
+    if sys.version_info < (3, 4):
+        msg = "The server requires Python 3.4 or later"
+        logger.error(msg)
+        raise Exception(msg)
+
+    from .server import Server
+
+    Server(args.socket, args.jobs, args.max_maps, logger).run()
+
+
+def client(args):
+    """
+    \'client\' subcommand
+
+    Forward a command to a server started with \'serve\', and report its
+    results as if the command was run locally.
+
+    :param args: Arguments given in command line parsed by argparse
+    """
+
+    from .client import ClientError
+    from .client import make_request
+    from .client import send_request
+
+    # Get logger
+    logger = Single_Logger.getLogger(__name__)
+
+    if not args.socket:
+        msg = "Please provide the path of the socket"
+        logger.error(msg)
+        raise Exception(msg)
+
+    if args.stop:
+        request = {"stop": True}
+    else:
+        request = make_request(args.command, args.program)
+        if not request["argv"]:
+            msg = "Please provide the command to run"
+            logger.error(msg)
+            raise Exception(msg)
 
-    # Check the map file
-    abimap.check()
+    try:
+        response = send_request(args.socket, request)
+    except ClientError as e:
+        logger.error(str(e))
+        raise
+
+    sys.stdout.write(response.get("stdout") or "")
+
+    records = response.get("records") or []
+    for level, message in records:
+        logger.log(level, "%s", message)
+
+    error = response.get("error")
+    if error is not None:
+        # Avoid repeating errors already logged
+        if not any(error in message for _, message in records):
+            logger.error("%s", error)
+        raise Exception(error)
 
 
 def version(args):
@@ -1508,16 +5543,27 @@ def get_arg_parser():
 
     :returns: A parser for command line arguments. (argparse.ArgumentParser)
     """
+    import argparse
+
     # Common file arguments
     file_args = argparse.ArgumentParser(add_help=False)
     file_args.add_argument('-o', '--out',
                            help='Output file (defaults to stdout)')
-    file_args.add_argument('-i', '--in',
-                           help='Read from this file instead of stdio',
-                           dest='input')
+    group_in = file_args.add_mutually_exclusive_group()
+    group_in.add_argument('-i', '--in',
+                          help='Read from this file instead of stdio',
+                          dest='input')
+    group_in.add_argument('--from-elf',
+                          help='Read the symbols exported by this shared'
+                          ' object (ELF) file instead of stdio',
+                          dest='from_elf')
     file_args.add_argument('-d', '--dry',
                            help='Do everything, but do not modify the files',
                            action='store_true')
+    file_args.add_argument('--fsync',
+                           help='Flush the output file to the disk before'
+                           ' replacing the existing file',
+                           action='store_true')
 
     # Common verbosity arguments
     verb_args = argparse.ArgumentParser(add_help=False)
@@ -1534,6 +5580,23 @@ def get_arg_parser():
     verb_args.add_argument('-l', '--logfile',
                            help='Log to this file')
 
+    # Common cache arguments
+    cache_args = argparse.ArgumentParser(add_help=False)
+    cache_args.add_argument('--cache-dir',
+                            help='Cache the parsed map files in this'
+                            ' directory (defaults to $ABIMAP_CACHE_DIR, if'
+                            ' set)',
+                            default=os.environ.get('ABIMAP_CACHE_DIR'))
+
+    # Common batch arguments
+    batch_args = argparse.ArgumentParser(add_help=False)
+    batch_args.add_argument('--manifest',
+                            help='Process the files listed in this file')
+    batch_args.add_argument('-j', '--jobs', type=int, default=0,
+                            help='The number of processes used to process'
+                            ' many files (defaults to the number of'
+                            ' processors)')
+
     # Common release name arguments
     name_args = argparse.ArgumentParser(add_help=False)
     name_args.add_argument("-n", "--name",
@@ -1562,12 +5625,22 @@ def get_arg_parser():
     # Update subcommand parser
     parser_up = subparsers.add_parser("update", help="Update the map file",
                                       parents=[file_args, verb_args,
-                                               name_args],
+                                               name_args, cache_args,
+                                               batch_args],
                                       epilog="A list of symbols is expected as"
                                       " the input.\nIf a file is provided with"
                                       " \'-i\', the symbols are read"
-                                      " from the given file. Otherwise the"
-                                      " symbols are read from stdin.")
+                                      " from the given file. If a shared"
+                                      " object is provided with"
+                                      " \'--from-elf\', its exported symbols"
+                                      " are used. Otherwise the"
+                                      " symbols are read from stdin.\nWith"
+                                      " \'--manifest\', each line of the"
+                                      " manifest contains a map file, a file"
+                                      " containing the symbols, and"
+                                      " optionally an output file (if not"
+                                      " given, the map file is updated in"
+                                      " place).")
     parser_up.add_argument("--allow-abi-break",
                            help="Allow removing symbols, and to break ABI",
                            action='store_true')
@@ -1580,7 +5653,8 @@ def get_arg_parser():
                        action='store_true')
     group.add_argument("--remove", help="Remove the symbols from the map"
                        " file. This breaks the ABI.", action="store_true")
-    parser_up.add_argument('file', help='The map file being updated')
+    parser_up.add_argument('file', help='The map file being updated',
+                           nargs='?')
     parser_up.set_defaults(func=update)
 
     # New subcommand parser
@@ -1591,7 +5665,10 @@ def get_arg_parser():
                                        epilog="A list of symbols is expected"
                                        " as the input.\nIf a file is provided"
                                        " with \'-i\', the symbols are read"
-                                       " from the given file. Otherwise the"
+                                       " from the given file. If a shared"
+                                       " object is provided with"
+                                       " \'--from-elf\', its exported"
+                                       " symbols are used. Otherwise the"
                                        " symbols are read from stdin.")
     parser_new.add_argument("-f", "--final",
                             help="Mark the new release as final,"
@@ -1601,10 +5678,125 @@ def get_arg_parser():
 
     # Check subcommand parser
     parser_check = subparsers.add_parser("check", help="Check the map file",
-                                         parents=[verb_args])
-    parser_check.add_argument("file", help="The map file to be checked")
+                                         parents=[verb_args, cache_args,
+                                                  batch_args],
+                                         epilog="With \'--manifest\', each"
+                                         " line of the manifest contains a map"
+                                         " file to be checked.")
+    parser_check.add_argument("file", help="The map files to be checked",
+                              nargs='*')
+    parser_check.add_argument("--format", help="The format of the report:"
+                              " logged messages (text), or a list of the"
+                              " problems found printed in JSON (json)",
+                              choices=["text", "json"], default="text")
     parser_check.set_defaults(func=check)
 
+    # Verify subcommand parser
+    parser_verify = subparsers.add_parser("verify",
+                                          help="Verify the symbol versions of"
+                                          " a shared object against the map"
+                                          " file",
+                                          parents=[verb_args, cache_args])
+    parser_verify.add_argument("binary", help="The shared object (ELF file)"
+                               " to be verified")
+    parser_verify.add_argument("file", help="The map file")
+    parser_verify.set_defaults(func=verify)
+
+    # Diff subcommand parser
+    parser_diff = subparsers.add_parser("diff",
+                                        help="Compare two versions of a map"
+                                        " file",
+                                        parents=[verb_args, cache_args],
+                                        epilog="The symbols added, removed,"
+                                        " and moved between releases, and the"
+                                        " releases added, removed, renamed,"
+                                        " or with a different previous"
+                                        " release are printed. It fails if"
+                                        " the changes break the ABI.")
+    parser_diff.add_argument("old", help="The old map file")
+    parser_diff.add_argument("new", help="The new map file")
+    parser_diff.add_argument("--format", help="The format of the report:"
+                             " text, or the differences printed in JSON"
+                             " (json)", choices=["text", "json"],
+                             default="text")
+    parser_diff.set_defaults(func=diff)
+
+    # Merge subcommand parser
+    parser_merge = subparsers.add_parser("merge",
+                                         help="Merge the changes made to a"
+                                         " map file in two versions of it",
+                                         parents=[verb_args, cache_args],
+                                         epilog="To use as a git merge"
+                                         " driver, set \'driver = abimap"
+                                         " merge %%O %%A %%B -o %%A\' in the"
+                                         " merge driver configuration. The"
+                                         " merged map is written even if"
+                                         " conflicts are found, keeping the"
+                                         " changes from \'ours\'.")
+    parser_merge.add_argument("base", help="The common ancestor of both"
+                              " versions")
+    parser_merge.add_argument("ours", help="The current version")
+    parser_merge.add_argument("theirs", help="The other version")
+    parser_merge.add_argument('-o', '--out',
+                              help='Output file (defaults to stdout)')
+    parser_merge.add_argument('-d', '--dry',
+                              help='Do everything, but do not modify the'
+                              ' files', action='store_true')
+    parser_merge.add_argument('--fsync',
+                              help='Flush the output file to the disk before'
+                              ' replacing the existing file',
+                              action='store_true')
+    parser_merge.set_defaults(func=merge)
+
+    # Serve subcommand parser
+    parser_serve = subparsers.add_parser("serve",
+                                         help="Run the commands requested by"
+                                         " clients, keeping the maps in"
+                                         " memory",
+                                         parents=[verb_args],
+                                         epilog="The server runs \'check\',"
+                                         " \'update\', \'new\', \'verify\',"
+                                         " \'diff\', \'merge\', and"
+                                         " \'version\'"
+                                         " commands requested"
+                                         " with \'abimap client\'. It stops"
+                                         " on SIGTERM, SIGINT, or when"
+                                         " requested with \'abimap client"
+                                         " --stop\'.")
+    parser_serve.add_argument("-s", "--socket",
+                              help="The path of the Unix socket (defaults to"
+                              " $ABIMAP_SOCKET, if set)",
+                              default=os.environ.get('ABIMAP_SOCKET'))
+    parser_serve.add_argument('-j', '--jobs', type=int, default=0,
+                              help='The number of processes running the'
+                              ' commands (defaults to the number of'
+                              ' processors)')
+    parser_serve.add_argument('--max-maps', type=int, default=64,
+                              help='The maximum number of maps kept in memory'
+                              ' by each process (defaults to 64)')
+    parser_serve.set_defaults(func=serve)
+
+    # Client subcommand parser
+    parser_client = subparsers.add_parser("client",
+                                          help="Run a command in a server"
+                                          " started with \'serve\'",
+                                          epilog="The command and its"
+                                          " arguments are given after the"
+                                          " client options (e.g. \'abimap"
+                                          " client -s PATH -- check"
+                                          " libx.map\'). The symbols read"
+                                          " from stdin are sent to the"
+                                          " server.")
+    parser_client.add_argument("-s", "--socket",
+                               help="The path of the Unix socket of the"
+                               " server (defaults to $ABIMAP_SOCKET, if set)",
+                               default=os.environ.get('ABIMAP_SOCKET'))
+    parser_client.add_argument("--stop", help="Stop the server",
+                               action="store_true")
+    parser_client.add_argument("command", help="The command to run, and its"
+                               " arguments", nargs=argparse.REMAINDER)
+    parser_client.set_defaults(func=client)
+
     # Version subcommand parser
     parser_version = subparsers.add_parser("version", help="Print version")
     parser_version.set_defaults(func=version)
@@ -1,6 +1,7 @@
 import filecmp
 import os
 import re
+import struct
 from distutils import dir_util
 
 import pytest
@@ -246,3 +247,135 @@ def run_tc(tc, datadir, capsys, caplog):
 
         # Clear the captured log and output so far
         caplog.clear()
+
+
+def make_elf(path, symbols, versions=(), bits=64, byteorder='<',
+             soname="libx.so.1"):
+    """
+    Write a minimal ELF shared object containing only the sections used to
+    read the dynamic symbols and the version definitions.
+
+    Each symbol is given as a tuple ``(name, version)`` or
+    ``(name, version, hidden)``, where ``version`` is the name of one of the
+    given versions or None. Symbols named starting with "undef_" are
+    undefined and symbols named starting with "local_" have local binding.
+
+    Each version is given as a tuple ``(name, parents)``. As done by the
+    linker, an absolute symbol is added for each version.
+
+    :param path:      The path of the file to write
+    :param symbols:   The list of symbols
+    :param versions:  The list of versions
+    :param bits:      The ELF class: 32 or 64
+    :param byteorder: The byte order: '<' or '>'
+    :param soname:    The name of the base version
+    """
+
+    bo = byteorder
+
+    dynstr = bytearray(b'\0')
+
+    def add_string(string):
+        offset = len(dynstr)
+        dynstr.extend(string.encode("utf-8") + b'\0')
+        return offset
+
+    # Version definitions: the base version comes first
+    all_versions = [(soname, [])] + list(versions)
+    version_index = {}
+    verdef = bytearray()
+    for i, (name, parents) in enumerate(all_versions):
+        names = [name] + list(parents)
+        version_index[name] = i + 1
+        last = i == len(all_versions) - 1
+        verdef.extend(struct.pack(bo + "HHHHIII", 1, 1 if i == 0 else 0,
+                                  i + 1, len(names), 0, 20,
+                                  0 if last else 20 + 8 * len(names)))
+        for j, aux_name in enumerate(names):
+            verdef.extend(struct.pack(bo + "II", add_string(aux_name),
+                                      0 if j == len(names) - 1 else 8))
+
+    # Symbols, including the absolute symbols of the versions
+    entries = [(name, version_index[name], False, 0xfff1, 1, 1)
+               for name, _ in versions]
+    for symbol in symbols:
+        name, version = symbol[0], symbol[1]
+        hidden = symbol[2] if len(symbol) > 2 else False
+        shndx = 0 if name.startswith("undef_") else 5
+        bind = 0 if name.startswith("local_") else 1
+        entries.append((name, version_index.get(version, 1), hidden, shndx,
+                        bind, 2))
+
+    dynsym = bytearray()
+    versym = bytearray(struct.pack(bo + "H", 0))
+    if bits == 32:
+        dynsym.extend(struct.pack(bo + "IIIBBH", 0, 0, 0, 0, 0, 0))
+    else:
+        dynsym.extend(struct.pack(bo + "IBBHQQ", 0, 0, 0, 0, 0, 0))
+    for name, index, hidden, shndx, bind, stype in entries:
+        info = (bind << 4) | stype
+        if bits == 32:
+            dynsym.extend(struct.pack(bo + "IIIBBH", add_string(name), 0x1000,
+                                      8, info, 0, shndx))
+        else:
+            dynsym.extend(struct.pack(bo + "IBBHQQ", add_string(name), info,
+                                      0, shndx, 0x1000, 8))
+        versym.extend(struct.pack(bo + "H", index | (0x8000 if hidden else 0)))
+
+    shstrtab = bytearray(b'\0')
+
+    def add_section_name(string):
+        offset = len(shstrtab)
+        shstrtab.extend(string.encode("utf-8") + b'\0')
+        return offset
+
+    header_size = 52 if bits == 32 else 64
+    symbol_size = 16 if bits == 32 else 24
+    section_size = 40 if bits == 32 else 64
+
+    # (name, type, data, link, info, entsize)
+    sections = [(".dynstr", 3, None, 0, 0, 0),
+                (".dynsym", 11, dynsym, 1, 1, symbol_size),
+                (".gnu.version", 0x6fffffff, versym, 2, 0, 2),
+                (".gnu.version_d", 0x6ffffffd, verdef, 1,
+                 len(all_versions), 0),
+                (".shstrtab", 3, None, 0, 0, 0)]
+    names = [add_section_name(section[0]) for section in sections]
+
+    content = bytearray(header_size)
+    headers = [(0, 0, 0, 0, 0, 0, 0)]
+    for name, (_, stype, data, link, info, entsize) in zip(names, sections):
+        if data is None:
+            data = dynstr if stype == 3 and name == names[0] else shstrtab
+        offset = len(content)
+        content.extend(data)
+        while len(content) % 8:
+            content.append(0)
+        headers.append((name, stype, offset, len(data), link, info, entsize))
+
+    shoff = len(content)
+    for name, stype, offset, size, link, info, entsize in headers:
+        if bits == 32:
+            content.extend(struct.pack(bo + "IIIIIIIIII", name, stype, 0,
+                                       offset, offset, size, link, info, 1,
+                                       entsize))
+        else:
+            content.extend(struct.pack(bo + "IIQQQQIIQQ", name, stype, 0,
+                                       offset, offset, size, link, info, 1,
+                                       entsize))
+
+    ident = b'\x7fELF' + struct.pack("BBBB", 1 if bits == 32 else 2,
+                                     1 if bo == '<' else 2, 1, 0)
+    ident += b'\0' * (16 - len(ident))
+    if bits == 32:
+        header = struct.pack(bo + "HHIIIIIHHHHHH", 3, 62, 1, 0, 0, shoff, 0,
+                             header_size, 0, 0, section_size, len(headers),
+                             len(headers) - 1)
+    else:
+        header = struct.pack(bo + "HHIQQQIHHHHHH", 3, 62, 1, 0, 0, shoff, 0,
+                             header_size, 0, 0, section_size, len(headers),
+                             len(headers) - 1)
+    content[0:header_size] = ident + header
+
+    with open(path, "wb") as f:
+        f.write(bytes(content))
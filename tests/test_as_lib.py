@@ -2,6 +2,10 @@
 
 """Tests using as library"""
 
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 import pytest
 from conftest import cd
@@ -269,3 +273,130 @@ def test_update_different_program_name(datadir, capsys):
         with open("update_default_name.stdout") as tcout:
             assert out == tcout.read()
         assert not err
+
+
+def test_write_matches_str(datadir):
+    with cd(datadir):
+        for filename in ("base.map", "released.map", "without_version.map"):
+            m = symver.Map(filename=filename)
+
+            out = StringIO()
+            m.write(out)
+
+            assert out.getvalue() == str(m)
+            assert "".join(m.iter_lines()) == str(m)
+            for release in m.releases:
+                assert "".join(release.iter_lines()) == str(release)
+
+
+def test_compact_releases(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="base.map")
+        other = symver.Map(filename="base.map")
+
+    release = m.releases[0]
+    assert not hasattr(release, "__dict__")
+
+    # After checking, the symbols are stored in tuples
+    assert all(isinstance(symbols, tuple) for symbols in
+               release.symbols.values())
+
+    # The names are interned, so they are shared between maps
+    assert release.name is other.releases[0].name
+    assert release.symbols["global"][0] is \
+        other.releases[0].symbols["global"][0]
+
+    # Symbols can still be added
+    release.add_symbols("global", ["new_symbol"])
+    release.add_symbols("other", ["other_symbol"])
+    assert "new_symbol" in release.symbols["global"]
+    assert release.symbols["other"] == ["other_symbol"]
+
+
+def test_apply(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="base.map")
+
+    added, removed = m.apply([("add", ["new_a", "new_b"]),
+                              ("add", ["new_c", "new_a"]),
+                              ("add", ["next_symbol"], "BASE_2_0_0")])
+
+    assert added == ["new_a", "new_b", "new_c", "next_symbol"]
+    assert not removed
+
+    # All additions without a release name go to the same new release
+    assert [r.name for r in m.releases] == ["BASE_1_0_0", "BASE_1_1_0",
+                                            "BASE_2_0_0"]
+    assert list(m.releases[1].symbols["global"]) == ["new_a", "new_b",
+                                                     "new_c"]
+    assert m.releases[1].previous == "BASE_1_0_0"
+    assert m.releases[2].previous == "BASE_1_1_0"
+    assert not [d for d in m.diagnostics if d.severity != "info"]
+
+    # Removing is an ABI break
+    with pytest.raises(Exception) as e:
+        m.apply([("remove", ["new_b"])])
+    assert "ABI break detected" in str(e.value)
+
+    added, removed = m.apply([("remove", ["new_b", "one_symbol"]),
+                              ("add", ["one_symbol"], "BASE_2_0_0")],
+                             allow_abi_break=True)
+    # The symbol moved to another release is neither added nor removed
+    assert not added
+    assert removed == ["new_b"]
+    assert m.find_symbol("one_symbol") == [("BASE_2_0_0", "global")]
+    assert not m.find_symbol("new_b")
+
+
+def test_apply_released(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="released.map")
+
+    with pytest.raises(Exception) as e:
+        m.apply([("add", ["new_symbol"], "RELEASED_1_0_0")])
+    assert "Released releases cannot be modified" in str(e.value)
+
+
+@pytest.mark.parametrize("allow_abi_break, change, message", [
+    (False, ("remove", ["one_symbol"]), "ABI break detected"),
+    (True, ("add", ["new_c"], "RELEASED_1_0_0"),
+     "Released releases cannot be modified"),
+])
+def test_apply_rejected(datadir, allow_abi_break, change, message):
+    with cd(datadir):
+        m = symver.Map(filename="released.map")
+
+    expected = str(m)
+    releases = list(m.releases)
+
+    changes = [("add", ["new_a"]),
+               ("add", ["new_b"], "RELEASED_1_1_0")]
+    if allow_abi_break:
+        changes.append(("remove", ["new_a", "one_symbol"]))
+
+    # The changes applied before the one rejected are undone
+    with pytest.raises(Exception) as e:
+        m.apply(changes + [change], allow_abi_break=allow_abi_break)
+    assert message in str(e.value)
+
+    assert list(m.releases) == releases
+    assert str(m) == expected
+    assert not m.find_symbol("new_a")
+    assert not m.find_symbol("new_b")
+    assert m.find_symbol("one_symbol") == [("RELEASED_1_0_0", "global")]
+
+
+def test_batch_update(datadir):
+    with cd(datadir):
+        abimap.batch_update("base.map", [("add", ["new_a"]),
+                                         ("add", ["new_b"])],
+                            out="out.map")
+
+        with open("out.map") as f:
+            content = f.read()
+        assert content.startswith("# This map file was updated with abimap-")
+
+        m = symver.Map(filename="out.map")
+
+    assert [r.name for r in m.releases] == ["BASE_1_0_0", "BASE_1_1_0"]
+    assert list(m.releases[1].symbols["global"]) == ["new_a", "new_b"]
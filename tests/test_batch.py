@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for processing many files in batch"""
+
+import filecmp
+
+import pytest
+from conftest import cd
+from conftest import is_error_in_log
+from conftest import is_warning_in_log
+
+from abimap import symver
+
+
+def run(options):
+    class C(object):
+        """
+        Empty class used as a namespace
+        """
+        pass
+
+    parser = symver.get_arg_parser()
+    ns = C()
+    ns.program = 'abimap'
+    args = parser.parse_args(options, namespace=ns)
+    args.func(args)
+
+
+@pytest.mark.skipif(pytest.__version__ < '3.4', reason="caplog not supported")
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_check_many(datadir, caplog, jobs):
+    with cd(datadir):
+        run(["check", "-j", jobs, "base.map", "baseless.map"])
+
+        # The messages are prefixed with the file name
+        assert is_warning_in_log("baseless.map: No base version release found",
+                                 caplog.text)
+        assert not is_warning_in_log("base.map: No base version",
+                                     caplog.text)
+
+
+@pytest.mark.skipif(pytest.__version__ < '3.4', reason="caplog not supported")
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_check_many_failed(datadir, caplog, jobs):
+    with cd(datadir):
+        with pytest.raises(Exception) as e:
+            run(["check", "-j", jobs, "base.map", "nameless.map",
+                 "missing.map"])
+
+        expected = "2 of 3 files failed: nameless.map, missing.map"
+        assert expected in str(e.value)
+        assert is_error_in_log("nameless.map: In file nameless.map, line 2",
+                               caplog.text)
+        assert is_error_in_log("missing.map: ", caplog.text)
+
+
+def test_update_manifest(datadir, capsys):
+    with cd(datadir):
+        run(["update", "--add", "-j", "1", "--manifest", "manifest"])
+
+        assert filecmp.cmp("base.out", "base.out.expected", shallow=False)
+
+        # Without output file, the map is updated in place
+        m = symver.Map(filename="baseless.map")
+        assert sorted(r.name for r in m.releases) == ["BASELESS_1_0_0",
+                                                      "BASELESS_1_1_0"]
+
+        out, err = capsys.readouterr()
+        assert "base.map:\nAdded:\n    symbol\n" in out
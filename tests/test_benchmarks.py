@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the benchmarks runner"""
+
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, "benchmarks")
+
+
+def run_benchmarks(options):
+    command = [sys.executable, os.path.join(BENCHMARKS, "run.py")]
+    return subprocess.call(command + options)
+
+
+def test_benchmarks_baseline(tmpdir):
+    baseline = str(tmpdir.join("baseline.json"))
+    options = ["--releases", "3", "--symbols", "10", "--chain-depth", "2",
+               "--comment-density", "0.5", "--repeat", "1"]
+
+    assert run_benchmarks(options + ["--output", baseline]) == 0
+
+    with open(baseline) as f:
+        results = json.load(f)
+
+    assert sorted(results["results"]) == ["check", "check_parallel",
+                                          "dependencies", "diff", "merge",
+                                          "new", "parse", "parse_trace",
+                                          "read",
+                                          "read_again", "recheck",
+                                          "start_check", "start_version",
+                                          "str", "update"]
+    assert results["params"]["releases"] == 3
+
+    # Compare with a baseline (tolerating any slowdown)
+    options += ["--compare", baseline, "--tolerance", "1000"]
+    assert run_benchmarks(options + ["--benchmark", "parse"]) == 0
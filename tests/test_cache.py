@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the parsed map cache"""
+
+import os
+import pickle
+import zlib
+
+import pytest
+from conftest import cd
+from conftest import is_warning_in_log
+
+from abimap import symver
+
+
+def fail_parse(self, lines):
+    raise AssertionError("The map should have been loaded from the cache")
+
+
+def test_cache_hit(datadir, monkeypatch):
+    with cd(datadir):
+        m = symver.Map(cache_dir="cache")
+        m.read("base.map")
+
+        # The cache file is created
+        assert len(os.listdir("cache")) == 1
+
+        expected = str(m)
+        dependencies = m.dependencies()
+
+        # Reading again does not parse the file
+        monkeypatch.setattr(symver.Map, "parse", fail_parse)
+
+        cached = symver.Map(cache_dir="cache")
+        cached.read("base.map")
+
+        assert cached.init
+        assert str(cached) == expected
+        assert cached.dependencies() == dependencies
+        assert cached.all_global_symbols() == set(["one_symbol"])
+
+
+def test_cache_miss_on_change(datadir):
+    with cd(datadir):
+        m = symver.Map(cache_dir="cache")
+        m.read("base.map")
+
+        with open("base.map", "a") as f:
+            f.write("\nBASE_1_1_0\n{\n    global:\n        new_symbol;\n"
+                    "} BASE_1_0_0;\n")
+
+        changed = symver.Map(cache_dir="cache")
+        changed.read("base.map")
+
+        assert len(changed.releases) == 2
+        assert len(os.listdir("cache")) == 2
+
+
+@pytest.mark.skipif(pytest.__version__ < '3.4', reason="caplog not supported")
+def test_cache_replay_warnings(datadir, caplog):
+    with cd(datadir):
+        m = symver.Map(cache_dir="cache")
+        m.read("baseless.map")
+
+        assert is_warning_in_log("No base version release found",
+                                 caplog.text)
+        caplog.clear()
+
+        cached = symver.Map(cache_dir="cache")
+        cached.read("baseless.map")
+
+        assert is_warning_in_log("No base version release found",
+                                 caplog.text)
+
+
+@pytest.mark.skipif(pytest.__version__ < '3.4', reason="caplog not supported")
+def test_cache_replay_filename(datadir, caplog):
+    with cd(datadir):
+        # The same content in two files, with a warning naming the file
+        for filename in ("a.map", "b.map"):
+            with open(filename, "w") as f:
+                f.write("LIBA_1_0_0\n{\n    a;\n} ;\n")
+
+        m = symver.Map(cache_dir="cache")
+        m.read("a.map")
+        caplog.clear()
+
+        other = symver.Map(cache_dir="cache")
+        other.read("b.map")
+
+        assert "In file b.map" in caplog.text
+        assert "In file a.map" not in caplog.text
+
+
+class Payload(object):
+    """
+    An object running code when unpickled
+    """
+
+    def __reduce__(self):
+        return (os.mkdir, ("unpickled",))
+
+
+def test_cache_data_only(datadir):
+    with cd(datadir):
+        m = symver.Map(cache_dir="cache")
+        m.read("base.map")
+
+        # Replace the cached data with a pickle
+        path = os.path.join("cache", os.listdir("cache")[0])
+        with open(path, "wb") as f:
+            f.write(zlib.compress(pickle.dumps(Payload(), 2)))
+
+        cached = symver.Map(cache_dir="cache")
+        cached.read("base.map")
+
+        # The file is parsed again, and the pickle is not loaded
+        assert str(cached) == str(m)
+        assert not os.path.exists("unpickled")
+
+
+def test_cache_dir_option(datadir, monkeypatch):
+    monkeypatch.setenv("ABIMAP_CACHE_DIR", "env_cache")
+
+    parser = symver.get_arg_parser()
+
+    args = parser.parse_args(["check", "base.map"])
+    assert args.cache_dir == "env_cache"
+
+    args = parser.parse_args(["check", "--cache-dir", "other", "base.map"])
+    assert args.cache_dir == "other"
+
+    with cd(datadir):
+        args.func(args)
+        assert len(os.listdir("other")) == 1
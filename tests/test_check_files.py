@@ -78,3 +78,26 @@ def test_same_file(datadir, caplog):
 
     # Check the content
     assert filecmp.cmp(in_name, created, shallow=False)
+
+    # The backup keeps the content when the file is replaced
+    with open(in_name) as f:
+        content = f.read()
+    symver.write_file(in_name, ["# New content\n"])
+    with open(created) as f:
+        assert f.read() == content
+    assert not os.path.samefile(in_name, created)
+
+
+def test_same_file_in_place(datadir, monkeypatch):
+    in_name = os.path.join(str(datadir), "in.map")
+    created = in_name + ".old"
+
+    symver.check_files("--out", in_name, "--in", in_name, False)
+
+    # The file is copied if it will be written in place, replacing a backup
+    # linked to it
+    monkeypatch.setattr(symver, "_can_replace", lambda path: False)
+    symver.check_files("--out", in_name, "--in", in_name, False)
+
+    assert filecmp.cmp(in_name, created, shallow=False)
+    assert not os.path.samefile(in_name, created)
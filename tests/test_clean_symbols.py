@@ -14,3 +14,13 @@ def test_clean_symbols(testcases):
     else:
         # If no test cases were found, fail
         assert 0
+
+
+def test_clean_unicode_symbols():
+    # The names read from ELF files are unicode strings in Python 2
+    assert symver.clean_symbols([u"one_symbol", u"two_symbol"]) == \
+        ["one_symbol", "two_symbol"]
+
+    r = symver.Release()
+    r.add_symbols("global", [u"one_symbol"])
+    assert r.symbols["global"] == ["one_symbol"]
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the diagnostics found when checking maps"""
+
+import json
+
+import pytest
+from conftest import cd
+
+from abimap import symver
+
+
+def run(options):
+    class C(object):
+        """
+        Empty class used as a namespace
+        """
+        pass
+
+    parser = symver.get_arg_parser()
+    ns = C()
+    ns.program = 'abimap'
+    args = parser.parse_args(options, namespace=ns)
+    args.func(args)
+
+
+def test_check_returns_diagnostics(datadir):
+    with cd(datadir):
+        m = symver.Map()
+        m.read("wildcard_warnings.map", log=False)
+        diagnostics = m.check(log=False)
+
+    assert diagnostics == m.diagnostics
+
+    found = [(d.code, d.severity, d.release, d.scope) for d in diagnostics]
+    assert found == [
+        ("symbol-in-multiple-releases", "warning", "NOTBASE_1_1_0", "global"),
+        ("symbol-in-multiple-releases", "warning", "BASE_1_0_0", "global"),
+        ("local-wildcard", "info", "NOTBASE_1_1_0", "local"),
+        ("local-wildcard-not-base", "warning", "NOTBASE_1_1_0", "local"),
+        ("local-wildcard", "info", "BASE_1_0_0", "local"),
+        ("base-version", "info", "BASE_1_0_0", None),
+        ("global-wildcard", "warning", "GLOBAL_WILDCARD_1_2_0", "global"),
+        ("unknown-scope", "warning", "SCOPES_1_3_0", "scope"),
+        ("local-wildcard", "info", "OTHER_BASE_1_0_0", "local"),
+        ("base-version", "info", "OTHER_BASE_1_0_0", None),
+        ("multiple-wildcards", "warning", "NOTBASE_1_1_0", "local"),
+        ("multiple-wildcards", "warning", "BASE_1_0_0", "local"),
+        ("multiple-wildcards", "warning", "GLOBAL_WILDCARD_1_2_0", "global"),
+        ("multiple-wildcards", "warning", "OTHER_BASE_1_0_0", "local"),
+        ("multiple-base-versions", "warning", "BASE_1_0_0", None),
+        ("multiple-base-versions", "warning", "OTHER_BASE_1_0_0", None),
+        ("dependencies", "info", "NOTBASE_1_1_0", None),
+        ("dependencies", "info", "GLOBAL_WILDCARD_1_2_0", None),
+        ("dependencies", "info", "SCOPES_1_3_0", None),
+        ("dependencies", "info", "OTHER_BASE_1_0_0", None)]
+
+    # The location points to the line where the release is defined
+    assert diagnostics[2].location == ("wildcard_warnings.map", 3, None)
+    assert diagnostics[-1].message == "OTHER_BASE_1_0_0"
+
+
+@pytest.mark.skipif(pytest.__version__ < '3.4', reason="caplog not supported")
+def test_check_without_logging(datadir, caplog):
+    with cd(datadir):
+        m = symver.Map()
+        m.read("duplicated_symbol.map", log=False)
+
+    assert not caplog.records
+
+    duplicates = [d for d in m.diagnostics if d.code == "duplicate-symbol"]
+    assert len(duplicates) == 1
+    assert duplicates[0].symbol == "one_symbol"
+    assert duplicates[0].scope == "global"
+    assert duplicates[0].release == "LIBX_1_0_0"
+
+    # Logging is just a way to report the diagnostics
+    symver.log_diagnostics(m.logger, m.diagnostics)
+    assert "Duplicates found in release \'LIBX_1_0_0\':\n" in caplog.text
+    assert "    global:\n" in caplog.text
+    assert "        one_symbol\n" in caplog.text
+
+
+@pytest.mark.skipif(pytest.__version__ < '3.4', reason="caplog not supported")
+def test_symbol_in_multiple_releases(datadir, caplog):
+    with cd(datadir):
+        m = symver.Map()
+        m.read("multiple_releases.map")
+
+    found = [(d.symbol, d.release, d.scope, d.location[1])
+             for d in m.diagnostics
+             if d.code == "symbol-in-multiple-releases"]
+    assert found == [("hidden", "LIBX_1_1_0", "local", 3),
+                     ("hidden", "LIBX_1_0_0", "global", 11),
+                     ("hidden", "LIBX_1_0_0", "local", 11),
+                     ("moved", "LIBX_1_1_0", "global", 3),
+                     ("moved", "LIBX_1_0_0", "global", 11)]
+
+    # Repeating a symbol in the same scope is a different problem
+    duplicates = [(d.symbol, d.release) for d in m.diagnostics
+                  if d.code == "duplicate-symbol"]
+    assert duplicates == [("hidden", "LIBX_1_0_0")]
+
+    assert ("The symbol \'moved\' was found in more than one"
+            " release:\n") in caplog.text
+    assert "    LIBX_1_1_0: in \'local\'\n" in caplog.text
+
+
+def test_diagnostics_cached(datadir, tmpdir):
+    cache_dir = str(tmpdir.join("cache"))
+    with cd(datadir):
+        first = symver.Map(filename="wildcard_warnings.map",
+                           cache_dir=cache_dir)
+        second = symver.Map(filename="wildcard_warnings.map",
+                            cache_dir=cache_dir)
+
+    assert first.diagnostics
+    assert second.diagnostics == first.diagnostics
+
+
+def test_check_json(datadir, capsys):
+    with cd(datadir):
+        with pytest.raises(Exception) as e:
+            run(["check", "--quiet", "-j", "1", "--format", "json",
+                 "base.map", "duplicated_symbol.map", "nameless.map"])
+
+    assert "1 of 3 files failed: nameless.map" in str(e.value)
+
+    out, err = capsys.readouterr()
+    diagnostics = json.loads(out)
+
+    warnings = [(d["location"]["file"], d["code"]) for d in diagnostics
+                if d["severity"] != "info"]
+    assert warnings == [("duplicated_symbol.map", "duplicate-symbol"),
+                        ("nameless.map", "syntax-error")]
+
+    error = diagnostics[-1]
+    assert error["message"] == "Invalid Release identifier"
+    assert error["location"] == {"file": "nameless.map", "line": 2,
+                                 "column": 1}
+
+
+def test_incremental_check(datadir, monkeypatch):
+    with cd(datadir):
+        m = symver.Map()
+        m.read("wildcard_warnings.map", log=False)
+
+    checked = []
+    check_release = symver.Map._check_release
+
+    def counting_check_release(self, release, filename):
+        checked.append(release.name)
+        return check_release(self, release, filename)
+
+    monkeypatch.setattr(symver.Map, "_check_release", counting_check_release)
+
+    # Nothing changed
+    assert m.check(log=False, incremental=True) == m.diagnostics
+    assert checked == []
+
+    # Append a release and change the symbols of another
+    r = symver.Release()
+    r.name = "NEW_1_4_0"
+    r.previous = "SCOPES_1_3_0"
+    r.add_symbols("global", ["two_symbol", "new_symbol", "new_symbol"])
+    m.releases.append(r)
+    m.releases.find("BASE_1_0_0")[0].remove_symbols("global", ["one_symbol"])
+
+    diagnostics = m.check(log=False, incremental=True)
+    assert sorted(checked) == ["BASE_1_0_0", "NEW_1_4_0"]
+    assert m.graph.heads == ["NOTBASE_1_1_0", "GLOBAL_WILDCARD_1_2_0",
+                             "OTHER_BASE_1_0_0", "NEW_1_4_0"]
+
+    # The result is the same as checking the whole map
+    del checked[:]
+    assert m.check(log=False) == diagnostics
+    assert len(checked) == len(m.releases)
+    found = [(d.code, d.release, d.symbol) for d in diagnostics
+             if d.code in ("duplicate-symbol", "symbol-in-multiple-releases")]
+    assert found == [("duplicate-symbol", "NEW_1_4_0", "new_symbol"),
+                     ("symbol-in-multiple-releases", "SCOPES_1_3_0",
+                      "two_symbol"),
+                     ("symbol-in-multiple-releases", "NEW_1_4_0",
+                      "two_symbol")]
+
+
+def test_incremental_check_cached(datadir, tmpdir, monkeypatch):
+    cache_dir = str(tmpdir.join("cache"))
+    with cd(datadir):
+        symver.Map(filename="wildcard_warnings.map", cache_dir=cache_dir)
+        m = symver.Map(filename="wildcard_warnings.map", cache_dir=cache_dir)
+
+    # The map loaded from the cache was not checked, but the diagnostics of
+    # the releases are reused
+    def fail(*args):
+        raise AssertionError("The dependencies were solved again")
+
+    monkeypatch.setattr(symver.Map, "_solve_dependencies", fail)
+
+    r = symver.Release()
+    r.name = "NEW_1_4_0"
+    r.previous = "NOTBASE_1_1_0"
+    r.add_symbols("global", ["new_symbol"])
+    m.releases.append(r)
+    diagnostics = m.check(log=False, incremental=True)
+
+    assert diagnostics[-1].message == "NEW_1_4_0->NOTBASE_1_1_0->BASE_1_0_0"
+    assert [d.release for d in diagnostics if d.code == "dependencies"] == [
+        "GLOBAL_WILDCARD_1_2_0", "SCOPES_1_3_0", "OTHER_BASE_1_0_0",
+        "NEW_1_4_0"]
+
+
+def test_parallel_check(datadir, monkeypatch):
+    with cd(datadir):
+        m = symver.Map()
+        m.read("wildcard_warnings.map", log=False)
+    m.releases.find("OTHER_BASE_1_0_0")[0].add_symbols("global",
+                                                       ["three_symbol"])
+    expected = m.check(log=False)
+
+    chains = []
+    run_batch = symver.run_batch
+
+    def recording_run_batch(worker, items, jobs=1):
+        chains.extend([name for name, _, _, _ in releases]
+                      for releases, _ in items)
+        return run_batch(worker, items, jobs)
+
+    monkeypatch.setattr(symver, "run_batch", recording_run_batch)
+
+    # The same diagnostics, in the same order
+    assert m.check(log=False, jobs=2) == expected
+    assert any(d.code == "duplicate-symbol" for d in expected)
+
+    # Each release is checked once, with the first chain containing it
+    assert chains == [["NOTBASE_1_1_0", "BASE_1_0_0"],
+                      ["GLOBAL_WILDCARD_1_2_0"], ["SCOPES_1_3_0"],
+                      ["OTHER_BASE_1_0_0"]]
+
+
+def test_incremental_check_duplicated(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="duplicated.map")
+
+    # The previous release of the new release is ambiguous
+    r = symver.Release()
+    r.name = "LIBTC5_1_1_0"
+    r.previous = "LIBTC5_1_0_0"
+    r.add_symbols("global", ["new_symbol"])
+    m.releases.append(r)
+
+    with pytest.raises(Exception) as e:
+        m.check(log=False, incremental=True)
+    assert "defined more than 1 release \'LIBTC5_1_0_0\'" in str(e.value)
+
+    with cd(datadir):
+        with open("symbols.in", "w") as f:
+            f.write("new_symbol\n")
+        with pytest.raises(Exception) as e:
+            run(["update", "--add", "-i", "symbols.in", "-o", "out.map",
+                 "duplicated.map"])
+        assert "defined more than 1 release" in str(e.value)
+
+
+def test_incremental_check_cycle():
+    m = symver.Map()
+    m.parse(["LIBX_1_0_0\n", "{\n", "    global:\n", "        a;\n",
+             "    local:\n", "        *;\n", "} ;\n",
+             "LIBX_1_1_0\n", "{\n", "    global:\n", "        b;\n",
+             "} LIBX_1_0_0;\n"])
+    m.check(log=False)
+
+    # An appended duplicate closing a cycle, followed by a new release
+    for name, previous in (("LIBX_1_0_0", "LIBX_1_1_0"), ("LIBY_1_0_0", "")):
+        r = symver.Release()
+        r.name = name
+        r.previous = previous
+        r.add_symbols("global", ["c_" + name])
+        m.releases.append(r)
+
+    with pytest.raises(Exception) as e:
+        m.check(log=False, incremental=True)
+    with pytest.raises(Exception) as full:
+        m.check(log=False)
+    assert str(e.value) == str(full.value)
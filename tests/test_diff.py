@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the comparison of maps"""
+
+import json
+
+import pytest
+from conftest import cd
+
+from abimap import symver
+
+
+def read_maps(datadir, old, new):
+    with cd(datadir):
+        return symver.Map(filename=old), symver.Map(filename=new)
+
+
+def run_diff(datadir, *options):
+    args = symver.get_arg_parser().parse_args(["diff"] + list(options))
+    args.program = "abimap"
+    with cd(datadir):
+        args.func(args)
+
+
+def test_diff_same(datadir):
+    old, new = read_maps(datadir, "old.map", "old.map")
+
+    result = old.diff(new)
+
+    assert result["compatible"]
+    assert not any(value for key, value in result.items() if
+                   key != "compatible")
+
+
+def test_diff_compatible(datadir):
+    old, new = read_maps(datadir, "old.map", "new.map")
+
+    result = old.diff(new)
+
+    assert result["compatible"]
+    assert result["added"] == [("LIBX_1_2_0", "e")]
+    assert result["added_releases"] == ["LIBX_1_2_0"]
+    assert not result["removed"]
+    assert not result["moved"]
+    assert not result["reparented_releases"]
+
+    # The other way around, the symbols and the release are removed
+    result = new.diff(old)
+
+    assert not result["compatible"]
+    assert result["removed"] == [("LIBX_1_2_0", "e")]
+    assert result["removed_releases"] == ["LIBX_1_2_0"]
+
+
+def test_diff_breaking(datadir):
+    old, new = read_maps(datadir, "old.map", "breaking.map")
+
+    result = old.diff(new)
+
+    assert not result["compatible"]
+    assert result["removed"] == [("LIBX_1_1_0", "d")]
+    assert result["moved"] == [("b", ["LIBX_1_0_0"], ["LIBX_1_1_0"])]
+    assert result["reparented_releases"] == [("LIBX_1_1_0", "LIBX_1_0_0",
+                                              None)]
+    assert not result["added"]
+    assert not result["removed_releases"]
+
+
+def test_diff_renamed(datadir):
+    old, new = read_maps(datadir, "old.map", "renamed.map")
+
+    result = old.diff(new)
+
+    assert not result["compatible"]
+    assert result["renamed_releases"] == [("LIBX_1_1_0", "LIBX_1_1_1")]
+    # The symbols of the renamed release are not reported as moved
+    assert not result["moved"]
+    assert not result["added_releases"]
+    assert not result["removed_releases"]
+    assert not result["reparented_releases"]
+
+
+def test_diff_command(datadir, capsys):
+    run_diff(datadir, "old.map", "new.map")
+    out, _ = capsys.readouterr()
+    assert out == "Added:\n    LIBX_1_2_0: e\n\n" \
+                  "Added releases:\n    LIBX_1_2_0\n\n"
+
+    with pytest.raises(Exception) as e:
+        run_diff(datadir, "old.map", "breaking.map")
+    assert "break the ABI" in str(e.value)
+    out, _ = capsys.readouterr()
+    assert "Moved:\n    b: from LIBX_1_0_0 to LIBX_1_1_0\n" in out
+    assert "Changed previous releases:\n    LIBX_1_1_0: from LIBX_1_0_0" \
+           " to -\n" in out
+
+    # The differences are printed before the error is raised
+    with pytest.raises(Exception):
+        run_diff(datadir, "--format", "json", "old.map", "renamed.map")
+    out, _ = capsys.readouterr()
+    result = json.loads(out)
+    assert result["renamed_releases"] == [["LIBX_1_1_0", "LIBX_1_1_1"]]
+
+
+def test_diff_duplicated(datadir):
+    old, new = read_maps(datadir, "old.map", "old.map")
+
+    # A symbol listed in more than one release
+    new.releases[1].add_symbols("global", ["a"])
+    result = old.diff(new)
+
+    assert result["moved"] == [("a", ["LIBX_1_0_0"],
+                                ["LIBX_1_0_0", "LIBX_1_1_0"])]
+    assert not result["compatible"]
+
+    result = new.diff(new)
+    assert result["compatible"]
+    assert not result["moved"]
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the ELF reader"""
+
+import os
+import struct
+import subprocess
+
+import pytest
+from conftest import cd
+from conftest import make_elf
+
+from abimap import demangle
+from abimap import elf
+from abimap import symver
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+needs_demangler = pytest.mark.skipif(not which(demangle.DEMANGLER),
+                                     reason="demangler not available")
+
+SYMBOLS = [("one_symbol", "LIBX_1_0_0"),
+           ("old_symbol", "LIBX_1_0_0", True),
+           ("two_symbol", "LIBX_1_1_0"),
+           ("undef_symbol", None),
+           ("local_symbol", None)]
+
+VERSIONS = [("LIBX_1_0_0", []),
+            ("LIBX_1_1_0", ["LIBX_1_0_0"])]
+
+
+@pytest.mark.parametrize("bits", [32, 64])
+@pytest.mark.parametrize("byteorder", ['<', '>'])
+def test_read_elf(tmpdir, bits, byteorder):
+    path = os.path.join(str(tmpdir), "libx.so")
+    make_elf(path, SYMBOLS, VERSIONS, bits=bits, byteorder=byteorder)
+
+    with elf.ELFFile(path) as e:
+        assert e.bits == bits
+        assert e.byteorder == byteorder
+
+        versions = e.version_definitions()
+        assert [v.name for v in versions] == ["libx.so.1", "LIBX_1_0_0",
+                                              "LIBX_1_1_0"]
+        assert versions[0].flags & elf.VER_FLG_BASE
+        assert versions[2].parents == ["LIBX_1_0_0"]
+
+        symbols = dict((s.name, s) for s in e.symbols())
+        assert symbols["one_symbol"].version == "LIBX_1_0_0"
+        assert not symbols["one_symbol"].hidden
+        assert symbols["old_symbol"].hidden
+        assert symbols["two_symbol"].version == "LIBX_1_1_0"
+        assert symbols["undef_symbol"].shndx == elf.SHN_UNDEF
+
+        # Undefined, local, and version symbols are not exported
+        assert e.exported_symbols() == ["one_symbol", "old_symbol",
+                                        "two_symbol"]
+
+
+def test_not_elf(tmpdir):
+    path = os.path.join(str(tmpdir), "not_elf")
+    with open(path, "w") as f:
+        f.write("This is not an ELF file")
+
+    with pytest.raises(elf.ELFError) as e:
+        elf.ELFFile(path)
+    assert "is not an ELF file" in str(e.value)
+
+    empty = os.path.join(str(tmpdir), "empty")
+    open(empty, "w").close()
+
+    with pytest.raises(elf.ELFError):
+        elf.ELFFile(empty)
+
+
+@pytest.mark.parametrize("size", [4, 10, 40])
+def test_truncated_header(tmpdir, size):
+    path = os.path.join(str(tmpdir), "libx.so")
+    make_elf(path, SYMBOLS, VERSIONS)
+
+    # Keep only the beginning of the file header
+    with open(path, "rb") as f:
+        content = f.read(size)
+    with open(path, "wb") as f:
+        f.write(content)
+
+    with pytest.raises(elf.ELFError) as e:
+        elf.ELFFile(path)
+    assert "is truncated" in str(e.value)
+
+
+@pytest.mark.parametrize("stype", [elf.SHT_DYNSYM, elf.SHT_GNU_VERDEF])
+def test_truncated_section(tmpdir, stype):
+    path = os.path.join(str(tmpdir), "libx.so")
+    make_elf(path, SYMBOLS, VERSIONS)
+
+    # Move the section beyond the end of the file
+    with elf.ELFFile(path) as e:
+        index = [s.type for s in e.sections()].index(stype)
+        header = e._shoff + index * e._shentsize
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        # The sh_offset field of a 64 bits section header
+        f.seek(header + 24)
+        f.write(struct.pack("<Q", size))
+
+    with elf.ELFFile(path) as e:
+        with pytest.raises(elf.ELFError) as error:
+            e.version_definitions()
+            list(e.symbols())
+    assert "is truncated" in str(error.value)
+
+
+def test_update_from_elf(datadir, capsys):
+    class C(object):
+        """
+        Empty class used as a namespace
+        """
+        pass
+
+    with cd(datadir):
+        make_elf("libx.so", [("one_symbol", None), ("new_symbol", None)])
+
+        parser = symver.get_arg_parser()
+        ns = C()
+        ns.program = 'abimap'
+        args = parser.parse_args(["update", "--from-elf", "libx.so",
+                                  "base.map"], namespace=ns)
+        args.func(args)
+
+        out, err = capsys.readouterr()
+        with open("update_from_elf.stdout") as tcout:
+            assert out == tcout.read()
+
+
+def run_update(*options):
+    args = symver.get_arg_parser().parse_args(["update"] + list(options))
+    args.program = "abimap"
+    args.func(args)
+
+
+def test_update_from_elf_wildcard(datadir, capsys):
+    with cd(datadir):
+        # The symbols matched by the pattern are neither added nor removed
+        make_elf("libx.so", [("one_symbol", None), ("qux_1", None),
+                             ("qux_2", None)])
+        run_update("--from-elf", "libx.so", "wildcard.map")
+        out, _ = capsys.readouterr()
+        assert out == "No symbols added or removed. Nothing done.\n"
+
+        make_elf("libx.so", [("one_symbol", None), ("qux_1", None),
+                             ("new_symbol", None)])
+        run_update("--from-elf", "libx.so", "wildcard.map")
+        out, _ = capsys.readouterr()
+        assert out.startswith("Added:\n    new_symbol\n\n# This map")
+
+        # A pattern matching no symbol is removed
+        make_elf("libx.so", [("one_symbol", None)])
+        with pytest.raises(Exception) as e:
+            run_update("--from-elf", "libx.so", "wildcard.map")
+        assert "ABI break detected" in str(e.value)
+        out, _ = capsys.readouterr()
+        assert out == "Removed:\n    qux_*\n\n"
+
+
+@needs_demangler
+def test_update_from_elf_cxx(datadir, capsys):
+    with cd(datadir):
+        # ns::f() and ns::g(int) are matched by the extern "C++" block
+        make_elf("libx.so", [("one_symbol", None), ("_ZN2ns1fEv", None),
+                             ("_ZN2ns1gEi", None)])
+        run_update("--from-elf", "libx.so", "cxx.map")
+        out, _ = capsys.readouterr()
+        assert out == "No symbols added or removed. Nothing done.\n"
+
+        # ns::h() is added
+        make_elf("libx.so", [("one_symbol", None), ("_ZN2ns1fEv", None),
+                             ("_ZN2ns1gEi", None), ("_ZN2ns1hEv", None)])
+        run_update("--from-elf", "libx.so", "cxx.map")
+        out, _ = capsys.readouterr()
+        assert out.startswith("Added:\n    _ZN2ns1hEv\n\n# This map")
+
+        # ns::f() is removed
+        make_elf("libx.so", [("one_symbol", None), ("_ZN2ns1gEi", None)])
+        with pytest.raises(Exception) as e:
+            run_update("--from-elf", "libx.so", "cxx.map")
+        assert "ABI break detected" in str(e.value)
+        out, _ = capsys.readouterr()
+        assert out == "Removed:\n    \"ns::f()\"\n\n"
+
+
+@needs_demangler
+@pytest.mark.skipif(not which("g++"), reason="g++ is not available")
+def test_update_from_cxx_library(datadir, capsys):
+    with cd(datadir):
+        with open("lib.cpp", "w") as f:
+            f.write("namespace ns {\n"
+                    "void f() {}\n"
+                    "int g(int x) { return x; }\n"
+                    "}\n"
+                    "extern \"C\" void one_symbol() {}\n")
+        subprocess.check_call(["g++", "-shared", "-fPIC",
+                               "-Wl,--version-script=cxx.map", "-o",
+                               "libcxx.so", "lib.cpp"])
+
+        run_update("--from-elf", "libcxx.so", "cxx.map")
+        out, _ = capsys.readouterr()
+        assert out == "No symbols added or removed. Nothing done.\n"
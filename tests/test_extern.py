@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the language blocks (extern "C++") in the maps"""
+
+import pytest
+from conftest import cd
+
+from abimap import demangle
+from abimap import symver
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+needs_demangler = pytest.mark.skipif(not which(demangle.DEMANGLER),
+                                     reason="demangler not available")
+
+
+def test_extern_parsed(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="extern.map")
+
+    new = m.releases.find("LIBX_1_1_0")[0]
+    assert list(new.symbols["global"]) == ["c_function"]
+    assert list(new.extern["global"]["C++"]) == [
+        "ns::Foo::*", '"ns::bar(int, char const*)"', "ns::baz(int, long)"]
+
+    base = m.releases.find("LIBX_1_0_0")[0]
+    assert list(base.extern["global"]["C++"]) == ["ns::old*",
+                                                  "ns::multi (int)"]
+    assert list(base.extern["local"]["C++"]) == ["ns::detail::*"]
+
+    # The map is written back with the blocks
+    other = symver.Map()
+    other.parse(str(m).splitlines(True))
+    assert str(other) == str(m)
+
+
+def test_extern_cached(datadir, tmpdir):
+    cache_dir = str(tmpdir.join("cache"))
+    with cd(datadir):
+        first = symver.Map(filename="extern.map", cache_dir=cache_dir)
+        second = symver.Map(filename="extern.map", cache_dir=cache_dir)
+
+    assert str(second) == str(first)
+
+
+@needs_demangler
+def test_match_mangled(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="extern.map")
+
+    found = list(m.match_symbols(["_ZN2ns3Foo3getEv", "_ZN2ns3barEiPKc",
+                                  "_ZN2ns3bazEil", "_ZN2ns6old_fnEv",
+                                  "_ZN2ns6detail4implEv", "c_function",
+                                  "_ZN5other1fEv"]))
+    assert found == [("_ZN2ns3Foo3getEv", "LIBX_1_1_0", "global"),
+                     ("_ZN2ns3barEiPKc", "LIBX_1_1_0", "global"),
+                     ("_ZN2ns3bazEil", "LIBX_1_1_0", "global"),
+                     ("_ZN2ns6old_fnEv", "LIBX_1_0_0", "global"),
+                     ("_ZN2ns6detail4implEv", "LIBX_1_0_0", "local"),
+                     ("c_function", "LIBX_1_1_0", "global"),
+                     ("_ZN5other1fEv", "LIBX_1_0_0", "local")]
+    assert m.exported_by("_ZN2ns6detail4implEv") is None
+
+
+def test_demangle_cached(monkeypatch):
+    calls = []
+
+    def fake_demangler(names):
+        calls.append(sorted(names))
+        return ["demangled " + name for name in names]
+
+    monkeypatch.setattr(demangle, "_cache", {})
+    monkeypatch.setattr(demangle, "_run_demangler", fake_demangler)
+
+    assert demangle.demangle(["_Z1av", "c", "_Z1av"]) == [
+        "demangled _Z1av", "c", "demangled _Z1av"]
+    assert demangle.demangle(["_Z1bv", "_Z1av"]) == ["demangled _Z1bv",
+                                                     "demangled _Z1av"]
+
+    # Each name is demangled only once, and the names which are not mangled
+    # are not given to the demangler
+    assert calls == [["_Z1av"], ["_Z1bv"]]
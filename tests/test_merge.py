@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the three-way merge of maps"""
+
+import filecmp
+
+import pytest
+from conftest import cd
+
+from abimap import symver
+
+
+def read_maps(datadir, *filenames):
+    with cd(datadir):
+        return [symver.Map(filename=filename) for filename in filenames]
+
+
+def run_merge(datadir, *options):
+    args = symver.get_arg_parser().parse_args(["merge"] + list(options))
+    args.program = "abimap"
+    with cd(datadir):
+        args.func(args)
+
+
+def test_merge(datadir):
+    base, ours, theirs = read_maps(datadir, "base.map", "ours.map",
+                                   "theirs.map")
+
+    merged, conflicts = ours.merge(base, theirs)
+
+    assert not conflicts
+    assert [r.name for r in merged.releases] == ["LIBX_1_0_0", "LIBX_1_1_0",
+                                                 "LIBX_1_2_0"]
+    # The symbol removed by theirs is removed
+    assert merged.releases[1].symbols["global"] == ["c"]
+    # The symbols added to the same release by both are kept
+    assert merged.releases[2].symbols["global"] == ["e", "f"]
+    assert merged.releases[2].previous == "LIBX_1_1_0"
+
+    # The result is the same the other way around, except for the order
+    merged, conflicts = theirs.merge(base, ours)
+    assert not conflicts
+    assert merged.releases[2].symbols["global"] == ["f", "e"]
+
+
+def test_merge_conflicts(datadir):
+    base, ours, conflict, removed, theirs = read_maps(datadir, "base.map",
+                                                      "ours.map",
+                                                      "conflict.map",
+                                                      "removed.map",
+                                                      "theirs.map")
+
+    merged, conflicts = ours.merge(base, conflict)
+
+    assert conflicts == ["The symbol \'e\' was added to different releases:"
+                         " LIBX_1_2_0 and LIBX_1_2_1"]
+    # The changes from ours are kept, and the release emptied is removed
+    assert str(merged) == str(ours)
+
+    merged, conflicts = removed.merge(base, theirs)
+
+    assert conflicts == ["The release \'LIBX_1_1_0\' was removed in one"
+                         " version and modified in the other"]
+    assert merged.releases.find("LIBX_1_1_0")
+
+    # A release removed and not modified is removed
+    merged, conflicts = removed.merge(base, base)
+    assert not conflicts
+    assert [r.name for r in merged.releases] == ["LIBX_1_0_0"]
+
+
+def test_merge_command(datadir, capsys):
+    run_merge(datadir, "base.map", "ours.map", "theirs.map")
+    out, _ = capsys.readouterr()
+    assert out.startswith("# This map file was merged with abimap-")
+    assert "    global:\n        e;\n        f;\n} LIBX_1_1_0;" in out
+
+    # If only a version changed the map, it is used
+    run_merge(datadir, "base.map", "base.map", "theirs.map", "-o", "out.map")
+    with cd(datadir):
+        assert filecmp.cmp("out.map", "theirs.map", shallow=False)
+
+    # The result is written before reporting the conflicts
+    with pytest.raises(Exception) as e:
+        run_merge(datadir, "base.map", "ours.map", "conflict.map", "-o",
+                  "out.map")
+    assert "1 conflicts found" in str(e.value)
+    with cd(datadir):
+        merged = symver.Map(filename="out.map")
+        assert merged.find_symbol("e") == [("LIBX_1_2_0", "global")]
+
+
+def test_read_changes(datadir):
+    with cd(datadir):
+        base = symver.Map()
+        base.read("base.map", stream=False)
+
+        # A release appended, and a release changed in the middle
+        with open("changed.map", "w") as f:
+            f.writelines(base.lines[:12])
+            f.write("        x;\n")
+            f.writelines(base.lines[12:])
+            f.write("\nLIBX_2_0_0\n{\n    global:\n        y;\n}"
+                    " LIBX_1_1_0;\n")
+
+        for filename in ("ours.map", "changed.map", "removed.map"):
+            expected = symver.Map(filename=filename)
+            m = symver.Map()
+            m.read(filename, base=base)
+
+            assert str(m) == str(expected)
+            assert [r.line for r in m.releases] == \
+                [r.line for r in expected.releases]
+
+        # The releases of the base are not shared
+        m.releases[0].add_symbols("global", ["z"])
+        assert "z" not in base.releases[0].symbols["global"]
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+"""Tests comparing the parser engines"""
+
+import logging
+import os
+
+import pytest
+from conftest import cd
+
+from abimap import symver
+
+
+def parse_with(engine, filename, lines=None):
+    """
+    Parse the given file using the given parser engine
+
+    :param engine:   The parser engine name
+    :param filename: The path to the file to parse
+    :param lines:    The lines to parse instead of the lines of the file
+    :returns:        The printed map or the error message
+    """
+
+    m = symver.Map(parser=engine)
+    m.filename = filename
+
+    if lines is None:
+        with open(filename, "r") as f:
+            lines = f.readlines()
+
+    try:
+        m.parse(lines)
+    except symver.ParserError as e:
+        return str(e)
+
+    return str(m)
+
+
+def test_engines_match(datadir):
+    with cd(datadir):
+        maps = sorted(f for f in os.listdir(".") if f.endswith(".map"))
+        assert maps
+        for filename in maps:
+            expected = parse_with("legacy", filename)
+            assert parse_with("fast", filename) == expected
+
+
+@pytest.mark.parametrize("content", [
+    # Positions of the errors
+    "R_1\n{\n    global:\n$       a;\n} ;\n",
+    "R_2 {\n$ global:\n",
+    # The legacy engine skips some characters after a '{', '}', ':' or ';'
+    "R_1\n{\n    global:\n        a;;\n} ;\n",
+    "R_1\n{\n    global:\n        a;\n} ;{\n",
+    "R_1\n{\n    global:$\n        a;\n} ;\n",
+    "R_1 { global: a; };\n",
+    # Language blocks
+    "R_1\n{\n    extern \"C++\" {\n        \"x\"y;\n    };\n} ;\n",
+    "R_1\n{\n    extern \"C\" {\n        a;\n    };\n} ;\n",
+    "R_1\n{\n    local:\n    extern \"C++\" {\n        ns::f( int\t);\n"
+    "        ns::g # comment\n        (int); \"ns::h()\"\n    };\n} ;\n",
+    "R_1\n{\n    extern \"C++\" {\n        operator[}];\n    };\n} ;\n",
+])
+def test_engines_match_lines(content):
+    lines = content.splitlines(True)
+    assert parse_with("fast", "t.map", lines) == \
+        parse_with("legacy", "t.map", lines)
+
+
+def test_fast_extern(datadir):
+    with cd(datadir):
+        with open("extern.map") as f:
+            lines = f.readlines()
+
+        # The language blocks are parsed without the legacy engine
+        m = symver.Map(parser="fast")
+        m.filename = "extern.map"
+        assert m._parse_fast(lines) == 0
+
+        assert str(m) == parse_with("legacy", "extern.map")
+
+
+def test_unknown_parser():
+    expected = "Unknown parser 'other'"
+
+    with pytest.raises(Exception) as e:
+        symver.Map(parser="other")
+    assert expected in str(e.value)
+
+
+def read_with(stream, filename):
+    """
+    Read the given file in streaming mode or not
+
+    :param stream:   Whether to use the streaming mode
+    :param filename: The path to the file to read
+    :returns:        The printed map or the error message
+    """
+
+    m = symver.Map()
+
+    try:
+        m.read(filename, stream=stream)
+    except symver.ParserError as e:
+        return str(e)
+    except Exception:
+        pass
+
+    return str(m)
+
+
+def test_stream_read_match(datadir):
+    with cd(datadir):
+        maps = sorted(f for f in os.listdir(".") if f.endswith(".map"))
+        for filename in maps:
+            assert read_with(True, filename) == read_with(False, filename)
+
+
+def test_stream_lazy_lines(datadir):
+    with cd(datadir):
+        m = symver.Map()
+        m.read("base.map")
+
+        # The lines are not kept after reading in streaming mode
+        assert m._lines is None
+
+        with open("base.map") as f:
+            assert m.lines == f.readlines()
+
+
+def test_parse_chunks(datadir):
+    with cd(datadir):
+        with open("base.map") as f:
+            content = f.read()
+
+        # Split the content in chunks not aligned with the lines
+        chunks = [content[i:i + 7] for i in range(0, len(content), 7)]
+
+        assert list(symver.iter_lines(chunks)) == \
+            content.splitlines(True)
+
+        m = symver.Map()
+        m.parse(symver.iter_lines(chunks))
+
+        assert str(m) == parse_with("fast", "base.map")
+
+
+def test_stream_context(datadir, caplog):
+    with cd(datadir):
+        with open("duplicated.map") as f:
+            content = f.read()
+        with open("missing_semicolon.map") as f:
+            broken = f.read()
+
+    # The lines given as context are the ones parsed, even without a file
+    m = symver.Map()
+    m.parse(symver.iter_lines([content]))
+    assert "LIBTC5_1_0_0\n           ^" in caplog.text
+
+    with pytest.raises(symver.ParserError) as e:
+        m.parse(symver.iter_lines([broken]))
+    assert "        other_symbol;\n" in str(e.value)
+
+
+class CountingLogger(logging.Logger):
+    """
+    A logger counting the calls to ``debug()``
+    """
+
+    def __init__(self, name):
+        logging.Logger.__init__(self, name)
+        self.debug_calls = 0
+        self.propagate = False
+        self.addHandler(logging.NullHandler())
+
+    def debug(self, *args, **kwargs):
+        self.debug_calls += 1
+        logging.Logger.debug(self, *args, **kwargs)
+
+
+def generate_map(releases, symbols):
+    """
+    Generate the lines of a map with a chain of releases
+
+    :param releases: The number of releases
+    :param symbols:  The number of symbols in each release
+    :returns:        A list of lines
+    """
+
+    lines = []
+    previous = ""
+    for r in range(releases):
+        name = "LIBBENCH_{0}_0_0".format(r)
+        lines.append(name + "\n")
+        lines.append("{\n")
+        lines.append("    global:\n")
+        lines.extend("        symbol_{0}_{1};\n".format(r, s)
+                     for s in range(symbols))
+        if not previous:
+            lines.append("    local:\n")
+            lines.append("        *;\n")
+        lines.append("} " + previous + ";\n")
+        lines.append("\n")
+        previous = name
+    return lines
+
+
+def test_resume_legacy(monkeypatch):
+    # The last release is written in a single line, which is left to the
+    # legacy engine
+    lines = generate_map(3, 10) + ["LIBBENCH_3_0_0 { global: a; } "
+                                   "LIBBENCH_2_0_0;\n"]
+
+    given = []
+    parse_legacy = symver.Map._parse_legacy
+
+    def record(self, lines, *args):
+        lines = list(lines)
+        given.append(lines)
+        return parse_legacy(self, lines, *args)
+
+    monkeypatch.setattr(symver.Map, "_parse_legacy", record)
+
+    m = symver.Map()
+    m.parse(iter(lines))
+
+    # Only the lines from the end of the last release parsed are given to
+    # the legacy engine
+    assert given == [lines[-3:]]
+    assert [r.name for r in m.releases] == \
+        ["LIBBENCH_{0}_0_0".format(r) for r in range(4)]
+    assert str(m) == parse_with("legacy", "t.map", lines)
+
+
+@pytest.mark.parametrize("engine", symver.PARSER_ENGINES)
+def test_trace_disabled(engine):
+    lines = generate_map(3, 10)
+
+    def parse(level):
+        logger = CountingLogger("trace")
+        logger.setLevel(level)
+        m = symver.Map(parser=engine)
+        m.logger = logger
+        m.parse(lines)
+        assert len(m.releases) == 3
+        return logger.debug_calls
+
+    # Without debug, the logger is not called while parsing
+    assert parse(logging.WARNING) == 0
+
+    # With debug, each transition or token is traced
+    assert parse(logging.DEBUG) > 3 * 10
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the glob patterns in the scopes"""
+
+import re
+
+import pytest
+from conftest import cd
+
+from abimap import symver
+
+
+@pytest.mark.parametrize("pattern,matches,others", [
+    ("foo_*", ["foo_", "foo_bar"], ["foo", "xfoo_bar"]),
+    ("bar?", ["bar1", "barx"], ["bar", "bar12"]),
+    ("_Z[!N]*", ["_Z3foo", "_ZL3foo"], ["_ZN3fooE", "_Z"]),
+    ("[a-c]x", ["ax", "cx"], ["dx", "[a-c]x"]),
+    ("a[]b", ["a[]b"], ["ab"]),
+    ("a.b", ["a.b"], ["axb"]),
+])
+def test_glob_to_regex(pattern, matches, others):
+    regex = re.compile(symver.glob_to_regex(pattern) + r"\Z")
+    for symbol in matches:
+        assert regex.match(symbol)
+    for symbol in others:
+        assert not regex.match(symbol)
+
+
+def test_symbol_matcher():
+    matcher = symver.SymbolMatcher([("first", ["exact", "a*"]),
+                                    ("second", ["ab*", "exact_b"]),
+                                    ("last", ["*"])])
+
+    assert matcher.keys == ["first", "second", "last"]
+    assert matcher.match("exact") == "first"
+    assert matcher.match("exact_b") == "second"
+    # The first group matching wins
+    assert matcher.match("abc") == "first"
+    assert matcher.match("other") == "last"
+    assert symver.SymbolMatcher().match("other") is None
+
+
+def test_patterns_parsed(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="patterns.map")
+
+    r = m.releases.find("LIBX_1_1_0")[0]
+    assert list(r.symbols["global"]) == ["new_*", "_Z[!N]?foo*"]
+
+
+def test_exported_by(datadir):
+    with cd(datadir):
+        m = symver.Map(filename="patterns.map")
+
+    assert m.exported_by("new_exact") == "LIBX_1_0_0"
+    assert m.exported_by("new_function") == "LIBX_1_1_0"
+    assert m.exported_by("_ZL3foobar") == "LIBX_1_1_0"
+    assert m.exported_by("_ZN3foo") is None
+    assert m.exported_by("foo_bar") == "LIBX_1_0_0"
+    assert m.exported_by("bar1") == "LIBX_1_0_0"
+    # Patterns in the local scope and the local wildcard
+    assert m.exported_by("internal_x") is None
+    assert m.exported_by("other") is None
+
+    found = list(m.match_symbols(["new_x", "other"]))
+    assert found == [("new_x", "LIBX_1_1_0", "global"),
+                     ("other", "LIBX_1_0_0", "local")]
+
+    # The matcher follows the changes to the symbols
+    r = m.releases.find("LIBX_1_1_0")[0]
+    r.add_symbols("global", ["other"])
+    assert m.exported_by("other") == "LIBX_1_1_0"
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the indexed list of releases"""
+
+from abimap import symver
+
+
+def make_release(name, previous=''):
+    r = symver.Release()
+    r.name = name
+    r.previous = previous
+    return r
+
+
+def test_index_append_remove():
+    releases = symver.ReleaseList()
+
+    base = make_release("LIBX_1_0_0")
+    new = make_release("LIBX_1_1_0", "LIBX_1_0_0")
+
+    releases.append(base)
+    releases.append(new)
+
+    assert releases.find("LIBX_1_0_0") == [base]
+    assert releases.successors("LIBX_1_0_0") == [new]
+    assert releases.heads() == ["LIBX_1_1_0"]
+
+    releases.remove(new)
+
+    assert releases.find("LIBX_1_1_0") == []
+    assert releases.successors("LIBX_1_0_0") == []
+    assert releases.heads() == ["LIBX_1_0_0"]
+
+    assert releases.pop() is base
+    assert releases.find("LIBX_1_0_0") == []
+
+
+def test_index_follows_release_changes():
+    releases = symver.ReleaseList()
+
+    base = make_release("LIBX_1_0_0")
+    new = make_release("LIBX_1_1_0")
+
+    releases.extend([base, new])
+    assert releases.heads() == ["LIBX_1_0_0", "LIBX_1_1_0"]
+
+    # Changing the previous release updates the successors
+    new.previous = "LIBX_1_0_0"
+    assert releases.successors("LIBX_1_0_0") == [new]
+    assert releases.heads() == ["LIBX_1_1_0"]
+
+    # Renaming updates the index by name
+    base.name = "LIBX_1_0_1"
+    assert releases.find("LIBX_1_0_0") == []
+    assert releases.find("LIBX_1_0_1") == [base]
+
+    # Replacing items updates the index
+    releases[0] = make_release("LIBY_1_0_0")
+    assert releases.find("LIBX_1_0_1") == []
+    assert [r.name for r in releases.find("LIBY_1_0_0")] == ["LIBY_1_0_0"]
+
+    del releases[:]
+    assert not releases.find("LIBX_1_1_0")
+
+
+def test_map_releases_indexed():
+    m = symver.Map()
+
+    m.releases = [make_release("LIBX_1_0_0")]
+    assert isinstance(m.releases, symver.ReleaseList)
+
+    m.releases.append(make_release("LIBX_1_1_0", "LIBX_1_0_0"))
+    assert m.dependencies() == [["LIBX_1_1_0", "LIBX_1_0_0"]]
+
+
+def test_long_chain_dependencies():
+    m = symver.Map()
+
+    count = 2000
+    previous = ''
+    for i in range(count):
+        name = "LIBX_1_{0}_0".format(i)
+        m.releases.append(make_release(name, previous))
+        previous = name
+
+    dependencies = m.dependencies()
+
+    assert len(dependencies) == 1
+    assert len(dependencies[0]) == count
+    assert dependencies[0][0] == previous
+
+
+def test_graph_cached():
+    m = symver.Map()
+
+    m.releases = [make_release("LIBX_1_0_0"),
+                  make_release("LIBX_1_1_0", "LIBX_1_0_0"),
+                  make_release("LIBY_1_0_0")]
+
+    graph = m.graph
+
+    assert graph.heads == ["LIBX_1_1_0", "LIBY_1_0_0"]
+    assert graph.chain("LIBX_1_1_0") == ["LIBX_1_1_0", "LIBX_1_0_0"]
+    assert graph.chain("LIBX_1_0_0") == ["LIBX_1_0_0"]
+    assert graph.chain("LIBZ_1_0_0") == []
+    assert graph.topo_order() == ["LIBX_1_0_0", "LIBX_1_1_0", "LIBY_1_0_0"]
+
+    # The graph is reused while the releases are not changed
+    assert m.graph is graph
+    m.dependencies()
+    assert m.graph is graph
+
+
+def test_graph_invalidated():
+    m = symver.Map()
+
+    base = make_release("LIBX_1_0_0")
+    m.releases = [base]
+    graph = m.graph
+
+    # Adding a release
+    new = make_release("LIBX_1_1_0")
+    m.releases.append(new)
+    assert m.graph is not graph
+    assert m.graph.heads == ["LIBX_1_0_0", "LIBX_1_1_0"]
+
+    # Changing the previous release of a release in the map
+    graph = m.graph
+    new.previous = "LIBX_1_0_0"
+    assert m.graph is not graph
+    assert m.graph.heads == ["LIBX_1_1_0"]
+
+    # Replacing the list of releases
+    graph = m.graph
+    m.releases = [base]
+    assert m.graph is not graph
+    assert m.graph.heads == ["LIBX_1_0_0"]
+
+
+def test_symbol_index():
+    releases = symver.ReleaseList()
+
+    base = make_release("LIBX_1_0_0")
+    base.add_symbols("global", ["a", "b"])
+    base.add_symbols("local", ["*"])
+    releases.append(base)
+
+    assert releases.find_symbol("a") == [(base, "global")]
+    assert releases.find_symbol("*") == [(base, "local")]
+    assert releases.find_symbol("c") == []
+    assert releases.global_symbols() == set(["a", "b"])
+
+    # Symbols added to a release in the list are indexed
+    new = make_release("LIBX_1_1_0", "LIBX_1_0_0")
+    releases.append(new)
+    new.add_symbols("global", ["c", "a"])
+    assert releases.find_symbol("c") == [(new, "global")]
+    assert releases.find_symbol("a") == [(base, "global"), (new, "global")]
+    assert releases.global_symbols() == set(["a", "b", "c"])
+
+    # Removing the first occurrence keeps the others
+    base.remove_symbols("global", ["a"])
+    assert releases.find_symbol("a") == [(new, "global")]
+
+    # Removing a release removes its symbols
+    releases.remove(new)
+    assert releases.find_symbol("a") == []
+    assert releases.find_symbol("c") == []
+    assert releases.global_symbols() == set(["b"])
+
+
+def test_duplicated_symbols_order():
+    def build(edited):
+        releases = symver.ReleaseList()
+        base = make_release("LIBX_1_0_0")
+        new = make_release("LIBX_1_1_0", "LIBX_1_0_0")
+        releases.append(base)
+        releases.append(new)
+        if edited:
+            # The same symbols, indexed in another order
+            new.add_symbols("global", ["b", "a"])
+            base.add_symbols("global", ["a", "b"])
+            base.remove_symbols("global", ["a", "b"])
+            base.add_symbols("global", ["b", "a"])
+        else:
+            base.add_symbols("global", ["b", "a"])
+            new.add_symbols("global", ["b", "a"])
+        return releases
+
+    found = [(symbol, [(r.name, scope) for r, scope in places])
+             for symbol, places in build(True).duplicated_symbols()]
+    assert found == [(symbol, [(r.name, scope) for r, scope in places])
+                     for symbol, places in build(False).duplicated_symbols()]
+    assert found == [("a", [("LIBX_1_0_0", "global"),
+                            ("LIBX_1_1_0", "global")]),
+                     ("b", [("LIBX_1_0_0", "global"),
+                            ("LIBX_1_1_0", "global")])]
+
+
+def test_map_find_symbol():
+    m = symver.Map()
+
+    base = make_release("LIBX_1_0_0")
+    base.add_symbols("global", ["a"])
+    new = make_release("LIBX_1_1_0", "LIBX_1_0_0")
+    new.add_symbols("global", ["b", "a"])
+    m.releases = [new, base]
+    m.check(log=False)
+
+    assert m.find_symbol("b") == [("LIBX_1_1_0", "global")]
+    assert sorted(m.find_symbol("a")) == [("LIBX_1_0_0", "global"),
+                                          ("LIBX_1_1_0", "global")]
+    assert m.introduced_in("a") == "LIBX_1_0_0"
+    assert m.introduced_in("b") == "LIBX_1_1_0"
+    assert m.introduced_in("c") is None
+
+    # The returned set is a copy
+    symbols = m.all_global_symbols()
+    symbols.add("c")
+    assert m.all_global_symbols() == set(["a", "b"])
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the server mode"""
+
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+from conftest import cd
+
+import abimap
+from abimap import symver
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 4) or
+                                not hasattr(socket, "AF_UNIX"),
+                                reason="The server requires Python 3.4 and"
+                                " Unix sockets")
+
+
+@pytest.fixture
+def server(tmpdir):
+    """
+    Start a server in a new process, and stop it when done
+
+    :returns: The path of the socket
+    """
+
+    path = str(tmpdir.join("abimap.sock"))
+
+    env = dict(os.environ)
+    src = os.path.dirname(os.path.dirname(abimap.__file__))
+    env["PYTHONPATH"] = os.pathsep.join([src, env.get("PYTHONPATH", "")])
+
+    process = subprocess.Popen([sys.executable, "-c",
+                                "from abimap.main import main; main()",
+                                "serve", "--socket", path, "--jobs", "2"],
+                               env=env)
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(0.05)
+    else:
+        process.kill()
+        pytest.fail("The server did not start")
+
+    yield path
+
+    if process.poll() is None:
+        process.terminate()
+        process.wait()
+
+
+def run_client(path, *command):
+    args = symver.get_arg_parser().parse_args(["client", "--socket", path,
+                                               "--"] + list(command))
+    args.program = "abimap"
+    args.func(args)
+
+
+def test_map_store(datadir):
+    from abimap.server import MapStore
+
+    logger = symver.Single_Logger.getLogger(symver.__name__)
+    store = MapStore(size=1)
+
+    with cd(datadir):
+        m = store.get("base.map", logger)
+        assert store.get("base.map", logger) is m
+
+        # The map is read again if the file changes
+        with open("base.map", "a") as f:
+            f.write("\n")
+        changed = store.get("base.map", logger)
+        assert changed is not m
+        assert str(changed) == str(m)
+
+        # The map taken to be modified is not kept
+        assert store.take("base.map", logger) is changed
+        assert not len(store)
+
+        with open("other.map", "w") as f:
+            f.write(str(m))
+        store.get("base.map", logger)
+        store.get("other.map", logger)
+        assert len(store) == 1
+
+
+def test_serve(datadir, server, capsys, caplog, monkeypatch):
+    caplog.set_level(logging.DEBUG, logger=symver.__name__)
+
+    with cd(datadir):
+        run_client(server, "check", "--debug", "base.map")
+        assert "kept in memory" not in caplog.text
+        run_client(server, "check", "--debug", "base.map")
+        assert "Using the map \'base.map\' kept in memory" in caplog.text
+
+        # The symbols are read from stdin and sent to the server
+        monkeypatch.setattr(sys, "stdin", symver.StringIO("new_symbol\n"))
+        run_client(server, "update", "--add", "-o", "out.map", "base.map")
+        out, _ = capsys.readouterr()
+        assert "Added:\n    new_symbol\n" in out
+
+        m = symver.Map(filename="out.map")
+        assert m.find_symbol("new_symbol") == [("BASE_1_1_0", "global")]
+
+        with pytest.raises(Exception) as e:
+            run_client(server, "update", "--remove", "-i", "out.map",
+                       "base.map")
+        assert "ABI break detected" in str(e.value)
+
+        with pytest.raises(Exception) as e:
+            run_client(server, "serve")
+        assert "cannot be run by the server" in str(e.value)
+
+    args = symver.get_arg_parser().parse_args(["client", "--socket", server,
+                                               "--stop"])
+    args.func(args)
+    for _ in range(100):
+        if not os.path.exists(server):
+            break
+        time.sleep(0.05)
+    assert not os.path.exists(server)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the modules imported when the command line application starts"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import abimap
+
+# The modules which should only be imported by the commands using them
+LAZY_MODULES = ["abimap.demangle", "abimap.elf", "argparse", "filecmp",
+                "hashlib", "json", "shutil", "subprocess", "tempfile", "zlib"]
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason="-X importtime requires Python 3.7")
+
+
+def imported_modules(code, *args):
+    """
+    Get the modules imported by running the code in a new interpreter
+
+    The modules imported by the interpreter itself (e.g. by ``site``) are not
+    included.
+
+    :param code: The python code to run
+    :param args: The arguments given to the code
+    :returns:    A tuple (the set of the names of the modules imported, the
+                 output in stdout)
+    """
+
+    env = dict(os.environ)
+    path = os.path.dirname(os.path.dirname(abimap.__file__))
+    env["PYTHONPATH"] = os.pathsep.join([path, env.get("PYTHONPATH", "")])
+
+    def run(code, *args):
+        process = subprocess.Popen([sys.executable, "-X", "importtime", "-c",
+                                    code] + list(args), env=env,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+        out, err = process.communicate()
+        assert process.returncode == 0, err
+
+        modules = set()
+        for line in err.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if line.startswith("import time:") and "|" in line:
+                name = line.split("|")[-1].strip()
+                if name != "imported package":
+                    modules.add(name)
+        return modules, out
+
+    baseline, _ = run("pass")
+    modules, out = run(code, *args)
+    return modules - baseline, out
+
+
+def test_import_symver():
+    modules, _ = imported_modules("import abimap.symver")
+
+    assert "abimap.symver" in modules
+    assert not modules.intersection(LAZY_MODULES)
+
+
+def test_version_fast_path():
+    modules, out = imported_modules("from abimap.main import main; main()",
+                                    "version")
+
+    assert out == "-c-{0}\n".format(abimap.__version__)
+    assert "abimap.symver" not in modules
+    assert "logging" not in modules
+    assert not modules.intersection(LAZY_MODULES)
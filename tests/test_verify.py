@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for verify command"""
+
+import pytest
+from conftest import cd
+from conftest import make_elf
+
+from abimap import symver
+
+VERSIONS = [("LIBX_1_0_0", []),
+            ("LIBX_1_1_0", ["LIBX_1_0_0"])]
+
+
+def run_verify(options):
+    class C(object):
+        """
+        Empty class used as a namespace
+        """
+        pass
+
+    parser = symver.get_arg_parser()
+    ns = C()
+    ns.program = 'abimap'
+    args = parser.parse_args(["verify"] + options, namespace=ns)
+    args.func(args)
+
+
+def test_verify_match(datadir, capsys):
+    with cd(datadir):
+        make_elf("libx.so", [("one_symbol", "LIBX_1_0_0"),
+                             ("two_symbol", "LIBX_1_0_0"),
+                             ("three_symbol", "LIBX_1_1_0")], VERSIONS)
+
+        run_verify(["libx.so", "libx.map"])
+
+        out, err = capsys.readouterr()
+        assert not out
+
+
+def test_verify_mismatch(datadir, capsys):
+    with cd(datadir):
+        make_elf("libx.so", [("one_symbol", "LIBX_1_0_0"),
+                             ("three_symbol", "LIBX_1_0_0"),
+                             ("four_symbol", "LIBX_2_0_0")],
+                 [("LIBX_1_0_0", []), ("LIBX_2_0_0", [])])
+
+        expected = "The binary 'libx.so' does not match the map 'libx.map'"
+
+        with pytest.raises(Exception) as e:
+            run_verify(["libx.so", "libx.map"])
+        assert expected in str(e.value)
+
+        out, err = capsys.readouterr()
+        with open("mismatch.stdout") as tcout:
+            assert out == tcout.read()
+
+
+def test_verify_unversioned(datadir):
+    with cd(datadir):
+        make_elf("libx.so", [("one_symbol", None),
+                             ("two_symbol", None),
+                             ("three_symbol", None)])
+
+        m = symver.Map(filename="libx.map")
+        result = m.verify("libx.so")
+
+        assert not result["unlisted"]
+        assert not result["missing"]
+        assert [symbol for symbol, _, _ in result["wrong_version"]] == \
+            ["one_symbol", "three_symbol", "two_symbol"]
+        assert result["missing_versions"] == ["LIBX_1_0_0", "LIBX_1_1_0"]
+
+
+def test_verify_symbol_named_as_version(datadir):
+    with cd(datadir):
+        # A function named as a version node is not its absolute symbol
+        make_elf("libx.so", [("one_symbol", "LIBX_1_0_0"),
+                             ("two_symbol", "LIBX_1_0_0"),
+                             ("three_symbol", "LIBX_1_1_0"),
+                             ("LIBX_1_0_0", "LIBX_1_0_0")], VERSIONS)
+
+        m = symver.Map(filename="libx.map")
+        result = m.verify("libx.so")
+
+        assert result["unlisted"] == ["LIBX_1_0_0"]
+        assert not result["missing"]
+        assert not result["wrong_version"]
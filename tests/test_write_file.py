@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the atomic writing of the output files"""
+
+import os
+
+import pytest
+
+from abimap import symver
+
+
+def test_write_new_file(tmpdir):
+    path = str(tmpdir.join("new.map"))
+
+    assert symver.write_file(path, ["a\n", "b\n"])
+
+    with open(path) as f:
+        assert f.read() == "a\nb\n"
+
+    # Created with the permissions given by the umask
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+
+    # No temporary file is left
+    assert os.listdir(str(tmpdir)) == ["new.map"]
+
+
+def test_write_unchanged(tmpdir):
+    path = str(tmpdir.join("same.map"))
+    with open(path, "w") as f:
+        f.write("a\nb\n")
+    os.utime(path, (1000000000, 1000000000))
+    inode = os.stat(path).st_ino
+
+    # The file is not modified
+    assert not symver.write_file(path, ["a\n", "b\n"])
+    assert os.stat(path).st_mtime == 1000000000
+    assert os.stat(path).st_ino == inode
+    assert os.listdir(str(tmpdir)) == ["same.map"]
+
+
+def test_write_replace(tmpdir):
+    path = str(tmpdir.join("old.map"))
+    with open(path, "w") as f:
+        f.write("old\n")
+    os.chmod(path, 0o640)
+
+    link = str(tmpdir.join("link.map"))
+    os.link(path, link)
+
+    assert symver.write_file(path, ["new\n"], sync=True)
+
+    with open(path) as f:
+        assert f.read() == "new\n"
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+    # The file was replaced, not modified in place
+    with open(link) as f:
+        assert f.read() == "old\n"
+
+
+def test_write_failure(tmpdir):
+    path = str(tmpdir.join("old.map"))
+    with open(path, "w") as f:
+        f.write("old\n")
+
+    def lines():
+        yield "partial\n"
+        raise ValueError("Failed")
+
+    with pytest.raises(ValueError):
+        symver.write_file(path, lines())
+
+    # The original file is untouched and the temporary file is removed
+    with open(path) as f:
+        assert f.read() == "old\n"
+    assert os.listdir(str(tmpdir)) == ["old.map"]
+
+
+def test_write_device():
+    # Other files than regular files are written in place
+    assert symver.write_file(os.devnull, ["a\n"])
+    assert not os.path.isfile(os.devnull)
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0,
+                    reason="Changing the owner requires root")
+def test_write_other_owner(tmpdir):
+    path = str(tmpdir.join("other.map"))
+    with open(path, "w") as f:
+        f.write("old\n")
+    os.chown(path, 12345, 12345)
+    inode = os.stat(path).st_ino
+
+    assert symver.write_file(path, ["new\n"])
+
+    # The file is written in place, keeping its owner
+    with open(path) as f:
+        assert f.read() == "new\n"
+    assert os.stat(path).st_ino == inode
+    assert os.stat(path).st_uid == 12345
+    assert os.listdir(str(tmpdir)) == ["other.map"]
+
+
+@pytest.mark.skipif(not hasattr(os, "setxattr"),
+                    reason="Extended attributes not supported")
+def test_write_xattr(tmpdir):
+    path = str(tmpdir.join("xattr.map"))
+    with open(path, "w") as f:
+        f.write("old\n")
+    try:
+        os.setxattr(path, "user.abimap", b"kept")
+    except OSError:
+        pytest.skip("Extended attributes not supported by the file system")
+
+    assert symver.write_file(path, ["new\n"])
+
+    # The file is written in place, keeping its extended attributes
+    with open(path) as f:
+        assert f.read() == "new\n"
+    assert os.getxattr(path, "user.abimap") == b"kept"